@@ -7,8 +7,20 @@
     :copyright: (c) 2015-2017 by Onni Software Ltd.
     :license: New BSD License
 """
+import functools
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
 import pyexcel as pe
 
+from pyexcel_webio import (
+    admission, cache, cancellation, columns, ndjson, paging, pipeline,
+    profiling, receiving, rows, schema as schemas, sinks, xlsx, zipstream)
+from pyexcel_webio import parallel as parallel_parse
+from pyexcel_webio._closing import is_lazy
+from pyexcel_webio._params import map_upload
+
 _XLSX_MIME = (
     "application/" +
     "vnd.openxmlformats-officedocument.spreadsheetml.sheet")
@@ -23,6 +35,7 @@ FILE_TYPE_MIME_TABLE = {
     "xlsx": _XLSX_MIME,
     "xlsm": "application/vnd.ms-excel.sheet.macroenabled.12",
     "json": "application/json",
+    ndjson.FILE_TYPE: ndjson.MIME_TYPE,
     "plain": "text/plain",
     "simple": "text/plain",
     "grid": "text/plain",
@@ -38,12 +51,20 @@ FILE_TYPE_MIME_TABLE = {
     "png": "image/png"
 }
 
+#: the response header carrying the watermark of a delta export
+WATERMARK_HEADER = "X-Export-Watermark"
+
 
 class ExcelInput(object):
     """A generic interface for an excel file input
 
     The source could be from anywhere, memory or file system
     """
+    #: a :class:`~pyexcel_webio.cache.ParseCache` to reuse the results
+    #: of :meth:`get_array`, :meth:`get_dict`, :meth:`get_records` and
+    #: :meth:`get_book_dict` for identical uploads
+    parse_cache = None
+
     def get_params(self, sheet_name=None, **keywords):
         """Abstract method
 
@@ -56,6 +77,27 @@ class ExcelInput(object):
         """
         raise NotImplementedError("Please implement this function")
 
+    def _get_params(self, **keywords):
+        params = self.get_params(**keywords)
+        profiling.tag(file_type=params.get('file_type'))
+        admission.admit_upload(params)
+        return params
+
+    def _cached_parse(self, name, params, parse):
+        parse_cache = self.parse_cache
+        if parse_cache is None:
+            return parse()
+        key = parse_cache.make_key(name, params)
+        if key is None:
+            return parse()
+        result = parse_cache.get(key)
+        if result is None:
+            result = parse()
+            parse_cache.put(key, result)
+        return result
+
+    @admission.admitted()
+    @profiling.profiled()
     def get_sheet(self, **keywords):
         """
         Get a :class:`Sheet` instance from the file
@@ -67,10 +109,12 @@ class ExcelInput(object):
         :param keywords: additional key words
         :returns: A sheet object
         """
-        params = self.get_params(**keywords)
+        params = self._get_params(**keywords)
         return pe.get_sheet(**params)
 
-    def get_array(self, **keywords):
+    @admission.admitted()
+    @profiling.profiled()
+    def get_array(self, parallel=None, **keywords):
         """
         Get a list of lists from the file
 
@@ -78,16 +122,30 @@ class ExcelInput(object):
                            sheets. If it is left unspecified, the
                            sheet at index 0 is loaded. For 'csv',
                            'tsv' file, *sheet_name* should be None anyway.
+        :param parallel: the number of processes to parse a 'csv' or
+                         'tsv' file with, or True for all cores. Other
+                         file types are parsed in-process regardless.
         :param keywords: additional key words
         :returns: A list of lists
         """
-        params = self.get_params(**keywords)
-        return pe.get_array(**params)
+        params = self._get_params(**keywords)
+
+        def parse():
+            if parallel and parallel_parse.is_supported(params):
+                return parallel_parse.get_array(params, parallel)
+            return pe.get_array(**params)
+        return self._cached_parse('get_array', params, parse)
 
+    @admission.admitted()
     def iget_array(self, **keywords):
         """
         Get a generator for a list of lists from the file
 
+        A 'csv', 'tsv' or 'ndjson' stream that cannot seek, such as a
+        request body, is parsed while it is still being received.
+        Under admission control, the upload is admitted until the
+        generator is exhausted or closed.
+
         :param sheet_name: For an excel book, there could be multiple
                            sheets. If it is left unspecified, the
                            sheet at index 0 is loaded. For 'csv',
@@ -95,9 +153,11 @@ class ExcelInput(object):
         :param keywords: additional key words
         :returns: A generator for a list of lists
         """
-        params = self.get_params(**keywords)
-        return pe.iget_array(**params)
+        params = self._get_params(**keywords)
+        return admission.defer(_iget_array(params))
 
+    @admission.admitted()
+    @profiling.profiled()
     def get_dict(self, **keywords):
         """Get a dictionary from the file
 
@@ -108,42 +168,107 @@ class ExcelInput(object):
         :param keywords: additional key words
         :returns: A dictionary
         """
-        params = self.get_params(**keywords)
+        params = self._get_params(**keywords)
         if 'name_columns_by_row' not in params:
             params['name_columns_by_row'] = 0
-        return pe.get_dict(**params)
+        return self._cached_parse(
+            'get_dict', params, lambda: pe.get_dict(**params))
 
-    def get_records(self, **keywords):
+    @admission.admitted()
+    @profiling.profiled()
+    def get_records(self, parallel=None, row_type="dict", **keywords):
         """Get a list of records from the file
 
         :param sheet_name: For an excel book, there could be multiple
                            sheets. If it is left unspecified, the
                            sheet at index 0 is loaded. For 'csv',
                            'tsv' file, *sheet_name* should be None anyway.
+        :param parallel: same as :meth:`~ExcelInput.get_array`
+        :param row_type: 'dict' for a dictionary per record, or
+                         'record' or 'namedtuple' for compact records
+                         that share the header row. See
+                         :func:`pyexcel_webio.rows.make_row_class`.
         :param keywords: additional key words
         :returns: A list of records
         """
-        params = self.get_params(**keywords)
-        if 'name_columns_by_row' not in params:
-            params['name_columns_by_row'] = 0
-        return pe.get_records(**params)
-
-    def iget_records(self, **keywords):
+        params = self._get_params(**keywords)
+        if row_type != "dict":
+            if parallel and parallel_parse.is_supported(params):
+                array = parallel_parse.get_array(params, parallel)
+                return list(rows.iget_rows(array, row_type))
+            try:
+                return list(rows.iget_rows(_iget_array(params), row_type))
+            finally:
+                pe.free_resources()
+
+        def parse():
+            if ndjson.is_ndjson(params):
+                return list(ndjson.iget_records(params))
+            if parallel and parallel_parse.is_supported(params):
+                return parallel_parse.get_records(params, parallel)
+            if 'name_columns_by_row' not in params:
+                params['name_columns_by_row'] = 0
+            return pe.get_records(**params)
+        return self._cached_parse('get_records', params, parse)
+
+    @admission.admitted()
+    def iget_records(self, row_type="dict", **keywords):
         """Get a generator of a list of records from the file
 
+        A stream is parsed, and the upload admitted, as
+        :meth:`~ExcelInput.iget_array` does.
+
         :param sheet_name: For an excel book, there could be multiple
                            sheets. If it is left unspecified, the
                            sheet at index 0 is loaded. For 'csv',
                            'tsv' file, *sheet_name* should be None anyway.
+        :param row_type: same as :meth:`~ExcelInput.get_records`
         :param keywords: additional key words
         :returns: A generator of alist of records
         """
-        params = self.get_params(**keywords)
-        return pe.iget_records(**params)
-
+        params = self._get_params(**keywords)
+        return admission.defer(_iget_records(params, row_type))
+
+    @admission.admitted()
+    @profiling.profiled()
+    def stream_to(self, sink, batch_size=None, max_in_flight=1,
+                  retries=0, retry_delay=0, cancel=None, row_type="dict",
+                  **keywords):
+        """
+        Feed the records of the file to a sink in batches, without
+        reading the whole file first
+
+        :param sink: a function or a coroutine function that takes a
+                     list of records, e.g. to publish them to a queue
+        :param batch_size: the number of records per batch
+        :param max_in_flight: the most batches the sink may be handling
+                              at the same time
+        :param retries: how many times to send a failing batch again
+        :param retry_delay: the seconds before the first retry, doubled
+                            for each next one
+        :param cancel: a :class:`~pyexcel_webio.cancellation.CancelToken`
+                       or a timeout in seconds. Once it is cancelled,
+                       no more batches are read and
+                       :class:`~pyexcel_webio.cancellation.Cancelled`
+                       is raised.
+        :param row_type: same as :meth:`~ExcelInput.get_records`
+        :param keywords: additional key words
+        :returns: a :class:`~pyexcel_webio.sinks.StreamSummary`
+        """
+        params = self._get_params(**keywords)
+        records = cancellation.iget_checked(
+            _iget_records(params, row_type), cancellation.get_token(cancel))
+        try:
+            return sinks.stream_to(records, sink, batch_size,
+                                   max_in_flight, retries, retry_delay)
+        finally:
+            self.free_resources()
+
+    @admission.admitted()
+    @profiling.profiled()
     def save_to_database(self, session=None, table=None,
                          initializer=None, mapdict=None,
-                         auto_commit=True,
+                         auto_commit=True, schema=None,
                          **keywords):
         """
         Save data from a sheet to database
@@ -154,10 +279,18 @@ class ExcelInput(object):
                             you have one
         :param mapdict: the explicit table column names if your excel
                         data do not have the exact column names
+        :param schema: a :class:`~pyexcel_webio.schema.Schema` of the
+                       columns to insert. If given, the rows are
+                       converted by it and inserted in batches, instead
+                       of going through *initializer* and *mapdict*.
         :param keywords: additional keywords to
                          :meth:`pyexcel.Sheet.save_to_database`
+        :returns: the number of rows inserted if *schema* is given
         """
-        params = self.get_params(**keywords)
+        params = self._get_params(**keywords)
+        if schema is not None:
+            return _insert(session, table, schema, _iget_array(params),
+                           auto_commit, False)
         if 'name_columns_by_row' not in params:
             params['name_columns_by_row'] = 0
         if 'name_rows_by_column' not in params:
@@ -169,10 +302,12 @@ class ExcelInput(object):
         params['dest_auto_commit'] = auto_commit
         pe.save_as(**params)
 
+    @admission.admitted()
+    @profiling.profiled()
     def isave_to_database(self, session=None, table=None,
                           initializer=None, mapdict=None,
-                          auto_commit=True,
-                          **keywords):
+                          auto_commit=True, parallel=None, cancel=None,
+                          schema=None, **keywords):
         """
         Save large data from a sheet to database
 
@@ -182,35 +317,70 @@ class ExcelInput(object):
                             you have one
         :param mapdict: the explicit table column names if your excel
                         data do not have the exact column names
+        :param parallel: same as :meth:`~ExcelInput.get_array`. The
+                         parsed rows are written in file order.
+        :param cancel: same as :meth:`~ExcelInput.stream_to`. The rows
+                       committed before it was cancelled are kept; the
+                       rest of the session is left to the caller.
+        :param schema: same as :meth:`~ExcelInput.save_to_database`
         :param keywords: additional keywords to
                          :meth:`pyexcel.Sheet.save_to_database`
+        :returns: the number of rows inserted if *schema* is given
         """
-        params = self.get_params(**keywords)
+        params = self._get_params(**keywords)
+        token = cancellation.get_token(cancel)
+        if ndjson.is_ndjson(params):
+            params = {'array': ndjson.iget_array(params)}
+        elif receiving.is_receiving(params):
+            params = {'array': receiving.iget_array(params)}
+        elif parallel and parallel_parse.is_supported(params):
+            params = {
+                'array': parallel_parse.iget_array(params, parallel)
+            }
+        elif token is not None or schema is not None:
+            params = {'array': pe.iget_array(**params)}
+        if token is not None:
+            params['array'] = cancellation.iget_checked(
+                params['array'], token)
+        if schema is not None:
+            return _insert(session, table, schema, params['array'],
+                           auto_commit, True)
         params['dest_session'] = session
         params['dest_table'] = table
         params['dest_initializer'] = initializer
         params['dest_mapdict'] = mapdict
         params['dest_auto_commit'] = auto_commit
-        pe.isave_as(**params)
-
+        try:
+            pe.isave_as(**params)
+        except cancellation.Cancelled:
+            pe.free_resources()
+            raise
+
+    @admission.admitted()
+    @profiling.profiled()
     def get_book(self, **keywords):
         """Get a instance of :class:`Book` from the file
 
         :param keywords: additional key words
         :returns: A instance of :class:`Book`
         """
-        params = self.get_params(**keywords)
+        params = self._get_params(**keywords)
         return pe.get_book(**params)
 
+    @admission.admitted()
+    @profiling.profiled()
     def get_book_dict(self, **keywords):
         """Get a dictionary of two dimensional array from the file
 
         :param keywords: additional key words
         :returns: A dictionary of two dimensional arrays
         """
-        params = self.get_params(**keywords)
-        return pe.get_book_dict(**params)
+        params = self._get_params(**keywords)
+        return self._cached_parse(
+            'get_book_dict', params, lambda: pe.get_book_dict(**params))
 
+    @admission.admitted()
+    @profiling.profiled()
     def save_book_to_database(self, session=None, tables=None,
                               initializers=None, mapdicts=None,
                               auto_commit=True, **keywords):
@@ -228,7 +398,7 @@ class ExcelInput(object):
                          :meth:`pyexcel.Book.save_to_database`
 
         """
-        params = self.get_params(**keywords)
+        params = self._get_params(**keywords)
         params['dest_session'] = session
         params['dest_tables'] = tables
         params['dest_initializers'] = initializers
@@ -236,6 +406,8 @@ class ExcelInput(object):
         params['dest_auto_commit'] = auto_commit
         pe.save_book_as(**params)
 
+    @admission.admitted()
+    @profiling.profiled()
     def isave_book_to_database(self, session=None, tables=None,
                                initializers=None, mapdicts=None,
                                auto_commit=True, **keywords):
@@ -253,7 +425,7 @@ class ExcelInput(object):
                          :meth:`pyexcel.Book.save_to_database`
 
         """
-        params = self.get_params(**keywords)
+        params = self._get_params(**keywords)
         params['dest_session'] = session
         params['dest_tables'] = tables
         params['dest_initializers'] = initializers
@@ -261,6 +433,22 @@ class ExcelInput(object):
         params['dest_auto_commit'] = auto_commit
         pe.isave_book_as(**params)
 
+    @admission.admitted()
+    @profiling.profiled()
+    def save_to_index(self, directory, **keywords):
+        """
+        Spool the file to a directory and index the offset of each
+        row, so that pages of rows can be read later without parsing
+        the whole file again
+
+        :param directory: where to keep the spooled file
+        :param keywords: additional key words
+        :returns: an :class:`~pyexcel_webio.paging.IndexedUpload`. Its
+                  *upload_id* opens it again in a later request.
+        """
+        params = self._get_params(**keywords)
+        return paging.IndexedUpload.create(directory, params)
+
     def free_resources(self):
         """
         After you have used iget_array and iget_records, it's
@@ -279,18 +467,24 @@ class ExcelInputInMultiDict(ExcelInput):
         Abstract method to get the file tuple
 
         It is expected to return file type and a file handle to the
-        uploaded file
+        uploaded file. The handle may also be the path of an upload
+        that was spooled to disk.
         """
         raise NotImplementedError("Please implement this function")
 
     def get_params(self, field_name=None, **keywords):
         """
         Load the single sheet from named form field
+
+        An upload that is on disk already, as a path or a file, is
+        memory mapped rather than read into memory.
         """
         file_type, file_handle = self.get_file_tuple(field_name)
         if file_type is not None and file_handle is not None:
-            file_handle.seek(0)
-            content = file_handle.read()
+            content = map_upload(file_handle)
+            if content is None and hasattr(file_handle, "read"):
+                file_handle.seek(0)
+                content = file_handle.read()
             if content:
                 params = {
                     'file_type': file_type,
@@ -309,12 +503,224 @@ def dummy_func(content, content_type=None, status=200, file_name=None):
 
 
 __excel_response_func__ = dummy_func
+_single_flight = cache.SingleFlight()
+_captured = threading.local()
+
+
+def _iget_array(params):
+    if ndjson.is_ndjson(params):
+        return ndjson.iget_array(params)
+    if receiving.is_receiving(params):
+        return receiving.iget_array(params)
+    return pe.iget_array(**params)
+
+
+def _iget_records(params, row_type):
+    if row_type != "dict":
+        return rows.iget_rows(_iget_array(params), row_type)
+    if ndjson.is_ndjson(params):
+        return ndjson.iget_records(params)
+    if receiving.is_receiving(params):
+        return receiving.iget_records(params)
+    return pe.iget_records(**params)
+
+
+def _insert(session, table, schema, array, auto_commit, commit_batches):
+    try:
+        return schemas.insert(session, table, schema, array, auto_commit,
+                              commit_batches=commit_batches)
+    finally:
+        pe.free_resources()
+
+
+def _render(render_func, file_type, export_key=None, snapshot=None):
+    """
+    Render the file content, sharing one rendering among concurrent
+    calls with the same export key and reusing a stored snapshot
+    while the data version is unchanged
+
+    :param snapshot: a (snapshot store, key, version) tuple
+    """
+    if export_key is None and snapshot is None:
+        return render_func()
+
+    def render_to_memory():
+        content = render_func()
+        if hasattr(content, "read"):
+            content = content.read()
+        elif not isinstance(content, (bytes, str)):
+            content = b"".join(content)
+        return content
+
+    render = render_to_memory
+    if snapshot is not None:
+        store, key, version = snapshot
+        render = functools.partial(store.render, key, version,
+                                   render_to_memory)
+    if export_key is None:
+        return render()
+    return _single_flight.do((export_key, file_type), render)
+
+
+def _table_snapshot(store, version_func, session, tables, file_type,
+                    keywords):
+    if store is None:
+        return None
+    if version_func is None:
+        version_func = cache.tables_version
+    names = tuple(_table_name(table) for table in tables)
+    key = (names, file_type, repr(sorted(keywords.items())))
+    return store, key, version_func(session, tables)
+
+
+def _table_name(table):
+    return getattr(table, "__tablename__", None) or getattr(table, "name")
+
+
+def _select(session, table, columns=None, filter=None, order_by=None):
+    """
+    Query the named columns of the table's rows that match the
+    filter, in the given order
+
+    :returns: the column names and the query
+    """
+    if columns is None:
+        columns = table.__table__.columns.keys()
+    query = session.query(*[getattr(table, name) for name in columns])
+    if filter is not None:
+        query = query.filter(filter)
+    if order_by is not None:
+        if not isinstance(order_by, (list, tuple)):
+            order_by = [order_by]
+        query = query.order_by(*order_by)
+    return list(columns), query
+
+
+def _fetch_table(session, table, options, token=None):
+    column_names, query = _select(session, table, *options)
+    return [column_names] + [
+        list(row) for row in cancellation.iget_checked(query, token)]
+
+
+def _iget_table_rows(session, tables, table_options, token=None):
+    """
+    Get a generator of (table name, rows) pairs. Each table is queried
+    when its rows are asked for.
+    """
+    for table, options in zip(tables, table_options):
+        yield _table_name(table), _iget_selection(session, table, options,
+                                                  token)
+
+
+def _iget_selection(session, table, options, token):
+    column_names, query = _select(session, table, *options)
+    yield column_names
+    for row in cancellation.iget_checked(query, token):
+        yield list(row)
+
+
+def _fetch_tables(session, tables, table_options,
+                  session_factory=None, max_workers=None, token=None):
+    """
+    Read the selected rows of each table. With a session factory,
+    the tables are read concurrently on sessions of their own. The
+    arrays are returned in the order of the tables.
+    """
+    if session_factory is None:
+        return [
+            _fetch_table(session, table, options, token)
+            for table, options in zip(tables, table_options)
+        ]
+
+    def fetch(table_and_options):
+        table_session = session_factory()
+        try:
+            return _fetch_table(table_session, *table_and_options,
+                                token=token)
+        finally:
+            table_session.close()
+
+    workers = max_workers or max(len(tables), 1)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(fetch, zip(tables, table_options)))
+
+
+def _delta_filter(session, table, column, since, filter=None):
+    """
+    Select the rows from the last watermark on, up to the greatest value
+    of the watermark column now. The rows at the last watermark are
+    selected again, since a column such as *updated_at* is not unique
+    and more rows may have been written at that value after the last
+    export read it.
+
+    :returns: the filter and the new watermark
+    """
+    from sqlalchemy import and_, false, func
+
+    conditions = [] if filter is None else [filter]
+    if since is not None:
+        conditions.append(column >= since)
+    query = session.query(func.max(column)).select_from(table)
+    if conditions:
+        query = query.filter(and_(*conditions))
+    new_watermark = query.scalar()
+    if new_watermark is None:
+        return false(), since
+    conditions.append(column <= new_watermark)
+    return and_(*conditions), new_watermark
+
+
+def _set_header(response, name, value):
+    """
+    Set a header on a response of any of the web frameworks, or record
+    it with a captured response, leaving responses without headers as
+    they are
+    """
+    if value is None:
+        value = ""
+    elif hasattr(value, "isoformat"):
+        value = value.isoformat()
+    else:
+        value = str(value)
+    if getattr(_captured, "active", False):
+        _captured.headers[name] = value
+    elif hasattr(response, "headers"):
+        response.headers[name] = value
+    elif hasattr(response, "__setitem__"):
+        response[name] = value
+
+
+def _split_dest(keywords):
+    """
+    Split the keywords of :meth:`pyexcel.save_as` into those of the
+    source and those of the destination, without their ``dest_``
+    prefix, as :meth:`pyexcel.Sheet.save_to_memory` takes them
+    """
+    source_keywords = {}
+    dest_keywords = {}
+    for key, value in keywords.items():
+        if key.startswith("dest_"):
+            dest_keywords[key[len("dest_"):]] = value
+        else:
+            source_keywords[key] = value
+    return source_keywords, dest_keywords
+
+
+def _selection_key(query):
+    statement = query.statement.compile()
+    return str(statement), repr(sorted(statement.params.items()))
 
 
 def _make_response(content, file_type,
                    status=200, file_name=None):
     if hasattr(content, "read"):
         content = content.read()
+    profiling.tag(file_type=file_type)
+    if is_lazy(content):
+        # hold the admission and the profile until it is rendered
+        content = admission.defer(profiling.defer(content))
+    if getattr(_captured, "active", False):
+        return content, file_type, file_name
     if file_name:
         if not file_name.endswith(file_type):
             file_name = "%s.%s" % (file_name, file_type)
@@ -324,14 +730,33 @@ def _make_response(content, file_type,
         status=status, file_name=file_name)
 
 
+def _capture_response(make_response_func, *args, **keywords):
+    """
+    Call a *make_response* function on this thread and get back its
+    (content, file_type, file_name, headers) instead of a http response
+    """
+    _captured.active = True
+    _captured.headers = {}
+    try:
+        content, file_type, file_name = make_response_func(
+            *args, **keywords)
+        return content, file_type, file_name, _captured.headers
+    finally:
+        _captured.active = False
+        _captured.headers = None
+
+
 def init_webio(response_function):
     global __excel_response_func__
     __excel_response_func__ = response_function
 
 
+@admission.admitted(rows_from=0)
+@profiling.profiled(rows_from=0)
 def make_response(pyexcel_instance, file_type,
                   status=200, file_name=None,
-                  sheet_name=None, **keywords):
+                  sheet_name=None, write_only=False, parallel=None,
+                  **keywords):
     """
     Make a http response from a pyexcel instance of
     :class:`~pyexcel.Sheet` or :class:`~pyexcel.Book`
@@ -349,14 +774,39 @@ def make_response(pyexcel_instance, file_type,
                       * 'ods'
 
     :param status: unless a different status is to be returned.
+    :param write_only: for 'xlsx', write the file a row at a time with
+                       :mod:`pyexcel_webio.xlsx` instead of building
+                       the whole workbook in memory. The content is a
+                       generator of bytes.
+    :param parallel: for a book in 'csvz', 'tsvz' or 'xlsx', the number
+                     of processes to render its sheets with, or True
+                     for all cores. 'xlsx' is then written as with
+                     *write_only*.
     :returns: http response
     """
     if hasattr(pyexcel_instance, 'name') and sheet_name is not None:
         pyexcel_instance.name = sheet_name
+    if (parallel and isinstance(pyexcel_instance, pe.Book) and
+            parallel_parse.is_render_supported(file_type, keywords)):
+        sheets = [(sheet.name, sheet.to_array())
+                  for sheet in pyexcel_instance]
+        file_content = parallel_parse.render_book(sheets, file_type,
+                                                  parallel, **keywords)
+        return _make_response(file_content, file_type, status, file_name)
+    if write_only and file_type == xlsx.FILE_TYPE:
+        if isinstance(pyexcel_instance, pe.Book):
+            sheets = [(sheet.name, sheet.to_array())
+                      for sheet in pyexcel_instance]
+        else:
+            sheets = [(pyexcel_instance.name, pyexcel_instance.to_array())]
+        return _make_response(xlsx.render(sheets), file_type,
+                              status, file_name)
     file_content = pyexcel_instance.save_to_memory(file_type, None, **keywords)
     return _make_response(file_content, file_type, status, file_name)
 
 
+@admission.admitted(rows_from=0)
+@profiling.profiled(rows_from=0)
 def make_response_from_array(array, file_type,
                              status=200, file_name=None, **keywords):
     """
@@ -371,37 +821,56 @@ def make_response_from_array(array, file_type,
     return _make_response(file_stream, file_type, status, file_name)
 
 
+@admission.admitted(rows_from=0)
+@profiling.profiled(rows_from=0)
 def make_response_from_dict(adict, file_type,
                             status=200, file_name=None, **keywords):
     """
     Make a http response from a dictionary of lists
 
     :param dict: a dictinary of lists
-    :param file_type: same as :meth:`~pyexcel_webio.make_response`
+    :param file_type: same as :meth:`~pyexcel_webio.make_response`.
+                      'csv', 'tsv' and 'ndjson' are written a row at a
+                      time straight from the columns, unless keywords
+                      other than the writer's ``dest_`` ones are given.
     :param status: same as :meth:`~pyexcel_webio.make_response`
     :returns: http response
     """
-    file_stream = pe.save_as(adict=adict, dest_file_type=file_type, **keywords)
+    if columns.is_supported(file_type, keywords):
+        file_stream = columns.render(adict, file_type, **keywords)
+    else:
+        file_stream = pe.save_as(adict=adict, dest_file_type=file_type,
+                                 **keywords)
     return _make_response(file_stream, file_type, status, file_name)
 
 
+@admission.admitted(rows_from=0)
+@profiling.profiled(rows_from=0)
 def make_response_from_records(records, file_type,
                                status=200, file_name=None, **keywords):
     """
     Make a http response from a list of dictionaries
 
     :param records: a list of dictionaries
-    :param file_type: same as :meth:`~pyexcel_webio.make_response`
+    :param file_type: same as :meth:`~pyexcel_webio.make_response`.
+                      For 'ndjson', the content is a generator of
+                      lines, one record each.
     :param status: same as :meth:`~pyexcel_webio.make_response`
     :returns: http response
     """
-    file_stream = pe.save_as(records=records,
-                             dest_file_type=file_type, **keywords)
+    if file_type == ndjson.FILE_TYPE:
+        file_stream = ndjson.render_records(records)
+    else:
+        file_stream = pe.save_as(records=records,
+                                 dest_file_type=file_type, **keywords)
     return _make_response(file_stream, file_type, status, file_name)
 
 
+@admission.admitted(rows_from=0)
+@profiling.profiled(rows_from=0)
 def make_response_from_book_dict(adict,
                                  file_type, status=200, file_name=None,
+                                 parallel=None, streamed=False,
                                  **keywords):
     """
     Make a http response from a dictionary of two dimensional
@@ -410,16 +879,38 @@ def make_response_from_book_dict(adict,
     :param book_dict: a dictionary of two dimensional arrays
     :param file_type: same as :meth:`~pyexcel_webio.make_response`
     :param status: same as :meth:`~pyexcel_webio.make_response`
+    :param parallel: same as :meth:`~pyexcel_webio.make_response`
+    :param streamed: for 'csvz' and 'tsvz', hand the archive to the
+                     response function as a generator of bytes,
+                     streamed as its sheets are compressed, unless
+                     keywords other than the
+                     :data:`~pyexcel_webio.zipstream.WRITER_OPTIONS`
+                     are given
     :returns: http response
     """
-    file_stream = pe.save_book_as(bookdict=adict,
-                                  dest_file_type=file_type, **keywords)
+    names = list(adict.keys())
+    if not isinstance(adict, OrderedDict):
+        # the order pyexcel writes the sheets of a plain dict in
+        names.sort()
+    sheets = [(name, adict[name]) for name in names]
+    if parallel and parallel_parse.is_render_supported(file_type, keywords):
+        file_stream = parallel_parse.render_book(sheets, file_type,
+                                                 parallel, **keywords)
+    elif streamed and zipstream.is_supported(file_type, keywords):
+        file_stream = zipstream.render(sheets, file_type, **keywords)
+    else:
+        file_stream = pe.save_book_as(bookdict=adict,
+                                      dest_file_type=file_type, **keywords)
     return _make_response(file_stream, file_type, status, file_name)
 
 
+@admission.admitted(rows_from=0)
+@profiling.profiled(rows_from=0)
 def make_response_from_query_sets(query_sets, column_names,
                                   file_type, status=200, file_name=None,
-                                  **keywords):
+                                  export_key=None, pipelined=False,
+                                  batch_size=None, cancel=None,
+                                  write_only=False, **keywords):
     """
     Make a http response from a dictionary of two dimensional
     arrays
@@ -427,17 +918,60 @@ def make_response_from_query_sets(query_sets, column_names,
     :param query_sets: a query set
     :param column_names: a nominated column names. It could not be N
                          one, otherwise no data is returned.
-    :param file_type: same as :meth:`~pyexcel_webio.make_response`
+    :param file_type: same as
+                      :meth:`~pyexcel_webio.make_response_from_records`
     :param status: same as :meth:`~pyexcel_webio.make_response`
+    :param export_key: a key that identifies identical exports. While
+                       one is being rendered, other requests with the
+                       same key and file type wait for it and share
+                       its content.
+    :param pipelined: fetch the rows on a background thread, a batch
+                      at a time, while the file is being rendered
+    :param batch_size: the number of rows per batch when pipelined
+    :param cancel: a :class:`~pyexcel_webio.cancellation.CancelToken`
+                   or a timeout in seconds, checked between batches of
+                   rows. Once it is cancelled, the rendering stops and
+                   :class:`~pyexcel_webio.cancellation.Cancelled` is
+                   raised. With an *export_key*, the token of the
+                   request that renders applies to all that share it.
+    :param write_only: same as :meth:`~pyexcel_webio.make_response`.
+                       The file is written while the rows are fetched.
     :returns: a http response
     """
-    file_stream = pe.save_as(query_sets=query_sets, column_names=column_names,
-                             dest_file_type=file_type, **keywords)
+    query_sets = cancellation.iget_checked(
+        query_sets, cancellation.get_token(cancel))
+
+    def render():
+        if file_type == ndjson.FILE_TYPE:
+            return ndjson.render_query_sets(query_sets, column_names)
+        if write_only and file_type == xlsx.FILE_TYPE:
+            rows = pipeline.query_set_rows(query_sets, column_names)
+            if pipelined:
+                rows = pipeline.iget_rows(rows, batch_size)
+            sheet_name = keywords.get('sheet_name', 'pyexcel_sheet1')
+            return xlsx.render([(sheet_name, rows)])
+        if pipelined:
+            rows = pipeline.iget_rows(
+                pipeline.query_set_rows(query_sets, column_names),
+                batch_size)
+            file_stream = pe.isave_as(array=rows, dest_file_type=file_type,
+                                      **keywords)
+            file_stream.seek(0)
+            return file_stream
+        return pe.save_as(query_sets=query_sets, column_names=column_names,
+                          dest_file_type=file_type, **keywords)
+    file_stream = _render(render, file_type, export_key)
     return _make_response(file_stream, file_type, status, file_name)
 
 
+@admission.admitted(rows_from=0)
+@profiling.profiled(rows_from=0)
 def make_response_from_a_table(session, table,
                                file_type, status=200, file_name=None,
+                               export_key=None, snapshot_store=None,
+                               snapshot_version=None, columns=None,
+                               filter=None, order_by=None, cancel=None,
+                               watermark=None, since=None,
                                **keywords):
     """
     Make a http response from sqlalchmey table
@@ -446,15 +980,81 @@ def make_response_from_a_table(session, table,
     :param table: a SQLAlchemy table
     :param file_type: same as :meth:`~pyexcel_webio.make_response`
     :param status: same as :meth:`~pyexcel_webio.make_response`
+    :param columns: the names of the columns to export. All columns
+                    are exported if None.
+    :param filter: a SQLAlchemy filter expression, such as
+                   ``Table.amount > 100``, selecting the rows to export
+    :param order_by: a SQLAlchemy column or expression, or a list of
+                     them, to sort the rows by
+    :param export_key: same as
+                       :meth:`~pyexcel_webio.make_response_from_query_sets`
+    :param snapshot_store: same as
+                           :meth:`~pyexcel_webio.make_response_from_tables`
+    :param snapshot_version: same as
+                             :meth:`~pyexcel_webio.make_response_from_tables`
+    :param cancel: same as
+                   :meth:`~pyexcel_webio.make_response_from_query_sets`
+    :param watermark: the name of a column whose values only grow, such
+                      as an auto-increment id or *updated_at*, to make a
+                      delta export. Only the rows at or above *since*
+                      are exported, sorted by it unless *order_by* is
+                      given, and the greatest value exported is set as
+                      the :data:`WATERMARK_HEADER` of the response, to
+                      be passed as *since* next time. The rows at
+                      *since* are exported again, so the rows sharing a
+                      non-unique watermark are not missed; the caller
+                      should deduplicate them, for example by upserting
+                      on the primary key.
+    :param since: the watermark of the previous delta export. All rows
+                  are exported if None.
     :returns: a http response
     """
-    file_stream = pe.save_as(session=session, table=table,
-                             dest_file_type=file_type, **keywords)
-    return _make_response(file_stream, file_type, status, file_name)
-
-
+    key_keywords = keywords
+    token = cancellation.get_token(cancel)
+    new_watermark = None
+    if watermark is not None:
+        column = getattr(table, watermark)
+        filter, new_watermark = _delta_filter(session, table, column,
+                                              since, filter)
+        if order_by is None:
+            order_by = column
+    if (columns is None and filter is None and order_by is None and
+            token is None):
+        def render():
+            return pe.save_as(session=session, table=table,
+                              dest_file_type=file_type, **keywords)
+    else:
+        column_names, query = _select(session, table, columns,
+                                      filter, order_by)
+        key_keywords = dict(keywords, selection=_selection_key(query))
+        sheet_name = keywords.pop('sheet_name', _table_name(table))
+
+        source_keywords, dest_keywords = _split_dest(keywords)
+
+        def render():
+            sheet = pe.get_sheet(
+                query_sets=cancellation.iget_checked(query, token),
+                column_names=column_names, **source_keywords)
+            sheet.name = sheet_name
+            return sheet.save_to_memory(file_type, None, **dest_keywords)
+    snapshot = _table_snapshot(snapshot_store, snapshot_version,
+                               session, [table], file_type, key_keywords)
+    file_stream = _render(render, file_type, export_key, snapshot)
+    response = _make_response(file_stream, file_type, status, file_name)
+    if watermark is not None:
+        _set_header(response, WATERMARK_HEADER, new_watermark)
+    return response
+
+
+@admission.admitted(rows_from=0)
+@profiling.profiled(rows_from=0)
 def make_response_from_tables(session, tables,
                               file_type, status=200, file_name=None,
+                              export_key=None, snapshot_store=None,
+                              snapshot_version=None, columns=None,
+                              filters=None, order_bys=None,
+                              session_factory=None, max_workers=None,
+                              cancel=None, streamed=False, parallel=None,
                               **keywords):
     """
     Make a http response from sqlalchmy tables
@@ -463,8 +1063,78 @@ def make_response_from_tables(session, tables,
     :param tables: SQLAlchemy tables
     :param file_type: same as :meth:`~pyexcel_webio.make_response`
     :param status: same as :meth:`~pyexcel_webio.make_response`
+    :param export_key: same as
+                       :meth:`~pyexcel_webio.make_response_from_query_sets`
+    :param snapshot_store: a :class:`~pyexcel_webio.cache.SnapshotStore`
+                           or :class:`~pyexcel_webio.cache.FileSnapshotStore`.
+                           The last rendered content is served again for
+                           as long as the tables' version is unchanged.
+    :param snapshot_version: a function that takes the session and the
+                             list of tables and returns their version.
+                             Defaults to
+                             :func:`~pyexcel_webio.cache.tables_version`
+    :param columns: a list with the *columns* of
+                    :meth:`~pyexcel_webio.make_response_from_a_table`
+                    for each table, None to export all columns of it
+    :param filters: a list with the *filter* of each table
+    :param order_bys: a list with the *order_by* of each table
+    :param session_factory: a function returning a new SQLAlchemy
+                            session, such as a *sessionmaker*. If
+                            given, the tables are queried concurrently,
+                            each on a session of its own, and *session*
+                            is only used for the version probe.
+    :param max_workers: the most tables to query at the same time.
+                        Defaults to one per table. Keep it within the
+                        size of the engine's connection pool.
+    :param cancel: same as
+                   :meth:`~pyexcel_webio.make_response_from_query_sets`
+    :param streamed: for 'csvz' and 'tsvz', read the tables one after
+                     the other on *session* while the archive is being
+                     sent, as :meth:`make_response_from_book_dict`
+                     streams it. The session must stay open until the
+                     response is sent, and *session_factory* is not
+                     used. With an *export_key* or a *snapshot_store*,
+                     the archive is gathered before it is sent.
+    :param parallel: same as :meth:`~pyexcel_webio.make_response`. The
+                     tables are read first, as without it.
     :returns: a http response
     """
-    file_stream = pe.save_book_as(session=session, tables=tables,
-                                  dest_file_type=file_type, **keywords)
+    key_keywords = keywords
+    token = cancellation.get_token(cancel)
+    if (columns is None and filters is None and order_bys is None and
+            session_factory is None and token is None and not streamed and
+            not parallel):
+        def render():
+            return pe.save_book_as(session=session, tables=tables,
+                                   dest_file_type=file_type, **keywords)
+    else:
+        no_options = [None] * len(tables)
+        table_options = list(zip(
+            columns or no_options, filters or no_options,
+            order_bys or no_options))
+        key_keywords = dict(keywords, selections=[
+            _selection_key(_select(session, table, *options)[1])
+            for table, options in zip(tables, table_options)])
+
+        def render():
+            if streamed and zipstream.is_supported(file_type, keywords):
+                return zipstream.render(
+                    _iget_table_rows(session, tables, table_options, token),
+                    file_type, **keywords)
+            arrays = _fetch_tables(session, tables, table_options,
+                                   session_factory, max_workers, token)
+            if parallel and parallel_parse.is_render_supported(file_type,
+                                                               keywords):
+                return parallel_parse.render_book(
+                    [(_table_name(table), array)
+                     for table, array in zip(tables, arrays)],
+                    file_type, parallel, **keywords)
+            book = OrderedDict(
+                (_table_name(table), array)
+                for table, array in zip(tables, arrays))
+            return pe.save_book_as(bookdict=book,
+                                   dest_file_type=file_type, **keywords)
+    snapshot = _table_snapshot(snapshot_store, snapshot_version,
+                               session, tables, file_type, key_keywords)
+    file_stream = _render(render, file_type, export_key, snapshot)
     return _make_response(file_stream, file_type, status, file_name)
@@ -0,0 +1,56 @@
+"""
+    pyexcel_webio._closing
+    ~~~~~~~~~~~~~~~~~~~
+
+    Work that lasts as long as a lazily rendered response
+
+    :copyright: (c) 2015-2017 by Onni Software Ltd.
+    :license: New BSD License
+"""
+
+
+def is_lazy(content):
+    """Tell if response content is rendered as it is iterated over"""
+    return (not isinstance(content, (bytes, str)) and
+            hasattr(content, "__iter__") and not hasattr(content, "read"))
+
+
+class ClosingIterator(object):
+    """
+    Iterate over response content and call back once it is exhausted,
+    fails, is closed by the web server or is garbage collected,
+    whichever comes first
+
+    :param content: an iterable of the chunks of the response
+    :param callback: a function without arguments
+    """
+    def __init__(self, content, callback):
+        self._content = content
+        self._iterator = iter(content)
+        self._callback = callback
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._iterator)
+        except BaseException:
+            self.close()
+            raise
+
+    next = __next__
+
+    def close(self):
+        callback, self._callback = self._callback, None
+        if callback is None:
+            return
+        try:
+            close = getattr(self._content, "close", None)
+            if close is not None:
+                close()
+        finally:
+            callback()
+
+    def __del__(self):
+        self.close()
@@ -0,0 +1,206 @@
+"""
+    pyexcel_webio._params
+    ~~~~~~~~~~~~~~~~~~~
+
+    Helpers for the parameters returned by :meth:`ExcelInput.get_params`
+
+    :copyright: (c) 2015-2017 by Onni Software Ltd.
+    :license: New BSD License
+"""
+import io
+import os
+import mmap
+import stat
+import tempfile
+
+import pyexcel_io
+from pyexcel_io.sheet import SheetReader
+
+DELIMITED_FILE_TYPES = ("csv", "tsv")
+SOURCE_KEYS = ("file_content", "file_stream", "file_name")
+# the reader keywords that pick rows and columns of the whole sheet,
+# as opposed to the ones on how to read a single record
+WINDOW_KEYS = (
+    "start_row", "row_limit", "start_column", "column_limit",
+    "skip_row_func", "skip_column_func", "skip_empty_rows", "row_renderer")
+
+
+def get_file_type(params):
+    """The file type, from the file name if not given"""
+    file_type = params.get("file_type")
+    if file_type is None and params.get("file_name"):
+        file_type = os.path.splitext(params["file_name"])[1][1:]
+    return file_type.lower() if file_type else None
+
+
+def is_delimited(params):
+    """Tell if the parameters point at 'csv' or 'tsv' content"""
+    if get_file_type(params) not in DELIMITED_FILE_TYPES:
+        return False
+    return any(params.get(key) is not None for key in SOURCE_KEYS)
+
+
+def is_ascii_compatible(params):
+    """
+    Tell if the line breaks and quotes of delimited content are single
+    ascii bytes in its *encoding*, so that its bytes can be split on
+    them before they are decoded. They are not in 'utf-16', for one.
+    """
+    encoding = params.get("encoding")
+    if not encoding:
+        return True
+    marks = "\n" + params.get("quotechar", '"')
+    try:
+        return marks.encode(encoding) == marks.encode("ascii")
+    except (LookupError, UnicodeError):
+        return False
+
+
+def is_seekable(stream):
+    """Tell if a stream can be read again, unlike a request body"""
+    seekable = getattr(stream, "seekable", None)
+    if seekable is None:
+        return hasattr(stream, "seek")
+    return seekable()
+
+
+def get_size(params):
+    """The size in bytes of the source, None if it cannot be told"""
+    content, stream, file_name = [params.get(key) for key in SOURCE_KEYS]
+    try:
+        if content is not None:
+            return len(content)
+        if stream is not None:
+            if isinstance(stream, mmap.mmap):
+                return len(stream)
+            position = stream.tell()
+            size = stream.seek(0, io.SEEK_END)
+            stream.seek(position)
+            return size
+        if file_name is not None:
+            return os.path.getsize(file_name)
+    except (IOError, OSError, ValueError, AttributeError):
+        pass
+    return None
+
+
+def pop_window(params):
+    """
+    Take the row and column window keywords out of the parameters
+
+    :returns: the keywords for :func:`iget_window`
+    """
+    window = dict((key, params.pop(key)) for key in WINDOW_KEYS
+                  if key in params)
+    if window:
+        window["keep_trailing_empty_cells"] = params.get(
+            "keep_trailing_empty_cells", False)
+    return window
+
+
+def iget_window(rows, window):
+    """
+    Pick the rows and columns of a whole sheet, parsed a part at a
+    time, as pyexcel-io would have if it had read the sheet at once
+
+    :param rows: the rows of the sheet, read without the window
+    :param window: the keywords from :func:`pop_window`
+    """
+    if not window:
+        return rows
+    return _Rows(rows, **window).to_array()
+
+
+def parse_delimited(file_type, content, keywords):
+    """
+    Parse part of a 'csv' or 'tsv' file into rows as
+    :meth:`pyexcel.iget_array` does, without the row and column window
+
+    :param content: whole records of the file, as bytes or text
+    :param keywords: the reader keywords other than the window ones
+    :returns: a list of lists
+    """
+    if not content:
+        return []
+    sheets = pyexcel_io.get_data(content, file_type=file_type, **keywords)
+    return list(sheets.values())[0] if sheets else []
+
+
+def pad_rows(rows):
+    """Pad the rows to the width of the widest, as :class:`Sheet` does"""
+    width = max([len(row) for row in rows] or [0])
+    return [row + [""] * (width - len(row)) for row in rows]
+
+
+def pop_source(params):
+    """
+    Take the file content, stream or name out of the parameters
+
+    :returns: a (file_content, file_stream, file_name) tuple
+    """
+    return tuple(params.pop(key, None) for key in SOURCE_KEYS)
+
+
+def read_content(params):
+    """Take the source out of the parameters and read all of it"""
+    content, stream, file_name = pop_source(params)
+    if content is not None:
+        return content
+    if stream is not None:
+        stream.seek(0)
+        return stream.read()
+    with open(file_name, "rb") as f:
+        return f.read()
+
+
+def map_upload(upload):
+    """
+    Map an upload that is already on disk into memory, so that it is
+    read through the page cache instead of being copied
+
+    :param upload: a path, an object with Django's
+                   *temporary_file_path*, or a file handle. A handle,
+                   or the *stream* of one like werkzeug's FileStorage,
+                   is mapped when it has a file descriptor and is not
+                   in text mode.
+    :returns: a read only :class:`mmap.mmap`, or None if the upload
+              is not on disk or is empty
+    """
+    temporary_file_path = getattr(upload, "temporary_file_path", None)
+    if callable(temporary_file_path):
+        upload = temporary_file_path()
+    if isinstance(upload, (str, os.PathLike)):
+        with open(upload, "rb") as f:
+            return _map(f.fileno())
+    for handle in (upload, getattr(upload, "stream", None)):
+        if isinstance(handle, tempfile.SpooledTemporaryFile):
+            if not handle._rolled:
+                # asking an in-memory spool for its fileno writes it out
+                continue
+            handle = handle._file
+        if isinstance(handle, io.TextIOBase):
+            # its text is decoded by the handle, not in the bytes
+            continue
+        try:
+            fileno = handle.fileno()
+            if hasattr(handle, "flush"):
+                handle.flush()
+        except (AttributeError, OSError, ValueError):
+            continue
+        return _map(fileno)
+    return None
+
+
+def _map(fileno):
+    status = os.fstat(fileno)
+    if not stat.S_ISREG(status.st_mode) or status.st_size == 0:
+        return None
+    return mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+
+
+class _Rows(SheetReader):
+    def row_iterator(self):
+        return self._native_sheet
+
+    def column_iterator(self, row):
+        return row
@@ -0,0 +1,230 @@
+"""
+    pyexcel_webio.admission
+    ~~~~~~~~~~~~~~~~~~~
+
+    Opt-in admission control of uploads and downloads, weighted by
+    their estimated cost, so that a burst of heavy files does not
+    hold up the light ones
+
+    :copyright: (c) 2015-2017 by Onni Software Ltd.
+    :license: New BSD License
+"""
+import math
+import time
+import inspect
+import functools
+import threading
+
+from pyexcel_webio import profiling
+from pyexcel_webio._closing import ClosingIterator
+from pyexcel_webio._params import get_file_type, get_size
+
+#: the relative cost of a unit of each file type. Others cost 1.
+WEIGHTS = {
+    "csv": 1, "tsv": 1, "ndjson": 1, "json": 1,
+    "csvz": 2, "tsvz": 2,
+    "xls": 4, "xlsx": 4, "xlsm": 4, "ods": 6,
+}
+#: the bytes of an upload in a unit of cost
+BYTES_PER_UNIT = 1024 * 1024
+#: the rows of a download in a unit of cost
+ROWS_PER_UNIT = 10000
+#: the cost from which a job goes into the large lane
+LARGE_COST = 8
+
+_control = None
+_context = threading.local()
+
+
+class Overloaded(Exception):
+    """
+    Raised when a job was not admitted in time
+
+    :param retry_after: the seconds after which to try again, to be
+                        sent as the Retry-After header of a 503 response
+    """
+    def __init__(self, retry_after):
+        Exception.__init__(
+            self, "Too busy, retry after %d seconds" % retry_after)
+        self.retry_after = retry_after
+
+
+class AdmissionControl(object):
+    """
+    Admit jobs under a budget of cost in two lanes: the small jobs,
+    and the large ones, which cost :data:`LARGE_COST` or more, so that
+    large jobs never take the budget of the small ones
+
+    A job costs the weight of its file type times its size in units
+    of :data:`BYTES_PER_UNIT` or :data:`ROWS_PER_UNIT`, and at most
+    the budget of its lane. A job of unknown size, such as the export
+    of a database table, is a large job.
+
+    :param small_budget: the total cost of the small jobs run at once
+    :param large_budget: the total cost of the large jobs run at once
+    :param timeout: the seconds a job waits to be admitted before
+                    :class:`Overloaded` is raised. 0 fails fast and
+                    None waits for as long as it takes.
+    """
+    def __init__(self, small_budget=LARGE_COST, large_budget=LARGE_COST * 2,
+                 timeout=None):
+        self.small = _Lane(small_budget)
+        self.large = _Lane(large_budget)
+        self.timeout = timeout
+
+    def estimate(self, file_type, size=None, rows=None):
+        """
+        :param file_type: the excel file type read or written
+        :param size: the bytes read, if known
+        :param rows: the rows written, if known
+        :returns: the cost of the job
+        """
+        if size is not None:
+            units = math.ceil(size / float(BYTES_PER_UNIT))
+        elif rows is not None:
+            units = math.ceil(rows / float(ROWS_PER_UNIT))
+        else:
+            return LARGE_COST
+        return max(1, WEIGHTS.get(file_type, 1) * int(units))
+
+    def admit(self, file_type, size=None, rows=None):
+        """
+        Wait until a job fits in the budget of its lane
+
+        :returns: a ticket to :meth:`~_Ticket.release` when the job is
+                  done, which is also a context manager doing so
+        :raises Overloaded: if the job was not admitted in time
+        """
+        cost = self.estimate(file_type, size, rows)
+        lane = self.large if cost >= LARGE_COST else self.small
+        cost = min(cost, lane.budget)
+        lane.acquire(cost, self.timeout)
+        return _Ticket(lane, cost)
+
+
+class _Lane(object):
+    def __init__(self, budget):
+        self.budget = budget
+        self.used = 0
+        self.seconds = None
+        self._condition = threading.Condition()
+
+    def acquire(self, cost, timeout):
+        deadline = None if timeout is None else time.time() + timeout
+        with self._condition:
+            while self.used + cost > self.budget:
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise Overloaded(self.retry_after())
+                self._condition.wait(remaining)
+            self.used += cost
+
+    def release(self, cost, elapsed):
+        with self._condition:
+            self.used -= cost
+            if self.seconds is None:
+                self.seconds = elapsed
+            else:
+                self.seconds = 0.8 * self.seconds + 0.2 * elapsed
+            self._condition.notify_all()
+
+    def retry_after(self):
+        return max(1, int(math.ceil(self.seconds or 0)))
+
+
+class _Ticket(object):
+    def __init__(self, lane, cost):
+        self.lane = lane
+        self.cost = cost
+        self.started = time.time()
+
+    def release(self):
+        if self.lane is not None:
+            self.lane.release(self.cost, time.time() - self.started)
+            self.lane = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+def init_admission(control):
+    """
+    Start admission control of uploads and downloads
+
+    :param control: an :class:`AdmissionControl`. None stops it.
+    """
+    global _control
+    _control = control
+
+
+def admitted(rows_from=None):
+    """
+    Admit the decorated function under admission control while it is
+    on. A call made within an admitted call is not admitted again.
+
+    :param rows_from: the index of the positional argument whose rows
+                      are written. If None, the call reads an upload
+                      and is admitted by :func:`admit_upload`.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **keywords):
+            control = _control
+            if control is None or getattr(_context, "scope", None):
+                return func(*args, **keywords)
+            scope = _context.scope = [control]
+            try:
+                if rows_from is not None:
+                    arguments = signature.bind_partial(
+                        *args, **keywords).arguments
+                    rows = None
+                    if rows_from < len(args):
+                        rows = profiling.count_rows(args[rows_from])
+                    scope.append(control.admit(
+                        arguments.get("file_type"), rows=rows))
+                return func(*args, **keywords)
+            finally:
+                _context.scope = None
+                _release(scope[1:])
+        return wrapper
+    return decorator
+
+
+def defer(content):
+    """
+    Hold the tickets of the admitted call in this thread, if any,
+    until its lazily rendered content is iterated over or closed,
+    instead of releasing them when the call returns
+
+    :param content: an iterable of the chunks of a response
+    :returns: the content to respond with
+    """
+    scope = getattr(_context, "scope", None)
+    if not scope or len(scope) == 1:
+        return content
+    tickets = scope[1:]
+    del scope[1:]
+    return ClosingIterator(content, functools.partial(_release, tickets))
+
+
+def _release(tickets):
+    for ticket in tickets:
+        ticket.release()
+
+
+def admit_upload(params):
+    """
+    Admit the upload of the admitted call in this thread, if any, by
+    the file type and size in its parameters
+    """
+    scope = getattr(_context, "scope", None)
+    if scope and len(scope) == 1:
+        scope.append(scope[0].admit(get_file_type(params),
+                                    size=get_size(params)))
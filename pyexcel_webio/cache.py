@@ -0,0 +1,451 @@
+"""
+    pyexcel_webio.cache
+    ~~~~~~~~~~~~~~~~~~~
+
+    Sharing of rendered exports between requests
+
+    :copyright: (c) 2015-2017 by Onni Software Ltd.
+    :license: New BSD License
+"""
+import os
+import time
+import struct
+import hashlib
+import pickle
+import tempfile
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from pyexcel_webio._params import SOURCE_KEYS
+
+UPDATED_COLUMN = "updated_at"
+_HASH_BLOCK_SIZE = 1024 * 1024
+_LOCK_STRIPES = 64
+_HEADER = struct.Struct("<I")
+
+
+class SingleFlight(object):
+    """
+    Run one call per key at a time and hand its result to every
+    caller that asked for the same key while it was in flight
+
+    Nothing is kept once the call returns: a later call with the
+    same key runs again.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func):
+        """
+        Call *func* unless a call for *key* is already in flight, in
+        which case wait for that call and return its result
+
+        :param key: a hashable key identifying identical calls
+        :param func: a function without arguments
+        :returns: the return value of *func*
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = func()
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+class _Call(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def tables_version(session, tables):
+    """
+    A cheap version probe of database tables: the row count and, for
+    tables that have an *updated_at* column, its maximum value
+
+    :param session: SQLAlchemy session
+    :param tables: SQLAlchemy tables
+    :returns: a tuple that changes when the tables do
+    """
+    from sqlalchemy import func
+
+    version = []
+    for table in tables:
+        columns = [func.count()]
+        updated_at = getattr(table, UPDATED_COLUMN, None)
+        if updated_at is not None:
+            columns.append(func.max(updated_at))
+        row = session.query(*columns).select_from(table).one()
+        version.append(tuple(row))
+    return tuple(version)
+
+
+class SnapshotStore(object):
+    """
+    Keep the last rendered export per key in memory, together with
+    the version of the data it was rendered from
+
+    :param max_size: the most bytes of content kept. The least
+                     recently served snapshots are dropped first.
+    """
+    def __init__(self, max_size=256 * 1024 * 1024):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._snapshots = OrderedDict()
+        self._size = 0
+
+    def get(self, key):
+        """
+        :returns: a (version, content) tuple or None
+        """
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot is not None:
+                self._snapshots.move_to_end(key)
+            return snapshot
+
+    def put(self, key, version, content):
+        with self._lock:
+            if key in self._snapshots:
+                self._remove(key)
+            if len(content) > self.max_size:
+                return
+            self._snapshots[key] = (version, content)
+            self._size += len(content)
+            while self._size > self.max_size:
+                self._remove(next(iter(self._snapshots)))
+
+    def _remove(self, key):
+        _, content = self._snapshots.pop(key)
+        self._size -= len(content)
+
+    def render(self, key, version, render_func):
+        """
+        Return the stored content if it was rendered from *version*,
+        otherwise render, store and return new content
+
+        :param key: a hashable key of the export
+        :param version: the current version of the exported data
+        :param render_func: a function returning the file content
+        """
+        snapshot = self.get(key)
+        if snapshot is not None and snapshot[0] == version:
+            return snapshot[1]
+        content = render_func()
+        self.put(key, version, content)
+        return content
+
+
+class FileSnapshotStore(SnapshotStore):
+    """
+    Keep the last rendered export per key as files in a local
+    directory, so that snapshots survive a restart
+
+    :param directory: the directory
+    :param max_size: the most bytes of snapshots kept in *directory*.
+                     The least recently served ones are removed first.
+    """
+    # the files of a snapshot, the first holding its content
+    _EXTENSIONS = (".data", ".version")
+
+    def __init__(self, directory, max_size=1024 * 1024 * 1024):
+        SnapshotStore.__init__(self, max_size)
+        self.directory = directory
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path + ".version", "rb") as f:
+                version, is_text = pickle.load(f)
+            with open(path + ".data", "rb") as f:
+                content = f.read()
+            os.utime(path + ".data")
+        except (IOError, OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if is_text:
+            content = content.decode("utf-8")
+        return version, content
+
+    def put(self, key, version, content):
+        path = self._path(key)
+        is_text = not isinstance(content, bytes)
+        if is_text:
+            content = content.encode("utf-8")
+        self._write(path + ".data", content)
+        self._write(path + ".version", pickle.dumps((version, is_text)))
+        self._trim()
+
+    def _trim(self):
+        extension = self._EXTENSIONS[0]
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(extension):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size,
+                            name[:-len(extension)]))
+        total = sum(size for _, size, _ in entries)
+        for _, size, base in sorted(entries):
+            if total <= self.max_size:
+                break
+            for extension in self._EXTENSIONS:
+                try:
+                    os.unlink(os.path.join(self.directory, base + extension))
+                except OSError:
+                    pass
+            total -= size
+
+    def _path(self, key):
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest)
+
+    def _write(self, path, content):
+        handle, temp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(handle, "wb") as f:
+            f.write(content)
+        os.replace(temp_path, path)
+
+
+class SharedSnapshotStore(FileSnapshotStore):
+    """
+    Keep the last rendered export per key in a local directory that
+    the worker processes of a host share, so that an export rendered
+    by one of them is served by all of them
+
+    Each snapshot is a single file, replaced atomically, and is read
+    into the memory of the process serving it. A miss takes a file
+    lock for the key, so that one process renders it while the others
+    wait and then read what it wrote. Where file locks are not
+    available, every process that misses renders.
+
+    :param directory: the shared directory
+    :param max_size: same as :class:`FileSnapshotStore`
+    """
+    _EXTENSIONS = (".snapshot",)
+
+    def get(self, key):
+        path = self._path(key) + ".snapshot"
+        try:
+            with open(path, "rb") as f:
+                snapshot = _read_snapshot(f)
+            os.utime(path)
+        except (IOError, OSError, EOFError, ValueError, struct.error,
+                pickle.UnpicklingError):
+            return None
+        return snapshot
+
+    def put(self, key, version, content):
+        is_text = not isinstance(content, bytes)
+        if is_text:
+            content = content.encode("utf-8")
+        header = pickle.dumps((version, is_text), pickle.HIGHEST_PROTOCOL)
+        handle, temp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(handle, "wb") as f:
+            f.write(_HEADER.pack(len(header)))
+            f.write(header)
+            f.write(content)
+        os.replace(temp_path, self._path(key) + ".snapshot")
+        self._trim()
+
+    def render(self, key, version, render_func):
+        snapshot = self.get(key)
+        if snapshot is not None and snapshot[0] == version:
+            return snapshot[1]
+        with self._locked(key):
+            return SnapshotStore.render(self, key, version, render_func)
+
+    @contextmanager
+    def _locked(self, key):
+        if fcntl is None:
+            yield
+            return
+        stripe = int(hashlib.sha1(repr(key).encode("utf-8")).hexdigest(),
+                     16) % _LOCK_STRIPES
+        path = os.path.join(self.directory, "lock.%d" % stripe)
+        with open(path, "a") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class ParseCache(object):
+    """
+    Keep the parsed data of uploads, keyed by a hash of the uploaded
+    content and the parse parameters, so that an identical upload is
+    not parsed again
+
+    Recently used entries are kept in memory. Optionally, entries are
+    also written to a local directory, which outlives the process and
+    is shared by the processes using it.
+
+    :param max_size: the most bytes of pickled data kept in memory
+    :param ttl: the seconds an entry is kept
+    :param directory: a directory for the second tier, if any
+    :param max_disk_size: the most bytes kept in *directory*
+    """
+    def __init__(self, max_size=64 * 1024 * 1024, ttl=3600,
+                 directory=None, max_disk_size=1024 * 1024 * 1024):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.directory = directory
+        self.max_disk_size = max_disk_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._size = 0
+        if directory is not None and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def make_key(self, name, params):
+        """
+        :param name: the name of the parse, e.g. 'get_array'
+        :param params: the parameters from :meth:`ExcelInput.get_params`
+        :returns: the cache key, or None if there is no content to hash
+        """
+        digest = hashlib.blake2b(digest_size=20)
+        content, stream, file_name = [params.get(k) for k in SOURCE_KEYS]
+        if content is not None:
+            if isinstance(content, str):
+                content = content.encode("utf-8")
+            digest.update(content)
+        elif stream is not None:
+            stream.seek(0)
+            _hash_file(digest, stream)
+            stream.seek(0)
+        elif file_name is not None:
+            with open(file_name, "rb") as f:
+                _hash_file(digest, f)
+        else:
+            return None
+        others = sorted((key, repr(value)) for key, value in params.items()
+                        if key not in SOURCE_KEYS)
+        digest.update(repr((name, others)).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key):
+        """
+        :returns: the cached data, or None on a miss
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, data = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    return pickle.loads(data)
+                self._remove(key)
+        data = self._read_disk(key, now)
+        if data is None:
+            return None
+        self._remember(key, now + self.ttl, data)
+        return pickle.loads(data)
+
+    def put(self, key, value):
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        self._remember(key, time.time() + self.ttl, data)
+        if self.directory is not None:
+            self._write_disk(key, data)
+
+    def _remember(self, key, expires, data):
+        if len(data) > self.max_size:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires, data)
+            self._size += len(data)
+            while self._size > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        _, data = self._entries.pop(key)
+        self._size -= len(data)
+
+    def _read_disk(self, key, now):
+        if self.directory is None:
+            return None
+        path = os.path.join(self.directory, key + ".parse")
+        try:
+            if os.path.getmtime(path) + self.ttl <= now:
+                os.unlink(path)
+                return None
+            with open(path, "rb") as f:
+                return f.read()
+        except (IOError, OSError):
+            return None
+
+    def _write_disk(self, key, data):
+        handle, temp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(handle, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, os.path.join(self.directory, key + ".parse"))
+        self._trim_disk()
+
+    def _trim_disk(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".parse"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_disk_size:
+                break
+            try:
+                os.unlink(os.path.join(self.directory, name))
+            except OSError:
+                pass
+            total -= size
+
+
+def _read_snapshot(f):
+    header_size = _HEADER.unpack(f.read(_HEADER.size))[0]
+    version, is_text = pickle.loads(f.read(header_size))
+    content = f.read()
+    if is_text:
+        content = content.decode("utf-8")
+    return version, content
+
+
+def _hash_file(digest, f):
+    while True:
+        block = f.read(_HASH_BLOCK_SIZE)
+        if not block:
+            break
+        if not isinstance(block, bytes):
+            block = block.encode("utf-8")
+        digest.update(block)
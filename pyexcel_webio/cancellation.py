@@ -0,0 +1,104 @@
+"""
+    pyexcel_webio.cancellation
+    ~~~~~~~~~~~~~~~~~~~
+
+    Cooperative cancellation of long renders and ingests, checked
+    between batches of rows
+
+    :copyright: (c) 2015-2017 by Onni Software Ltd.
+    :license: New BSD License
+"""
+import time
+import threading
+
+CHECK_EVERY = 100
+
+
+class Cancelled(Exception):
+    """Raised when the work of a cancelled token is being done"""
+    pass
+
+
+class CancelToken(object):
+    """
+    Tells long running work to stop. It is cancelled when
+    :meth:`cancel` is called, when its timeout has passed or when
+    *is_disconnected* returns True, whichever comes first.
+
+    :param timeout: the seconds the work may take, counted from now
+    :param is_disconnected: a function that tells if the client has
+                            gone away. It is called on every check,
+                            so it should be cheap.
+
+    Its *rows* attribute counts the rows that went past a check, as
+    a rough measure of progress.
+    """
+    def __init__(self, timeout=None, is_disconnected=None):
+        self.deadline = None
+        if timeout is not None:
+            self.deadline = time.monotonic() + timeout
+        self.is_disconnected = is_disconnected
+        self.reason = None
+        self.rows = 0
+        self._cancelled = threading.Event()
+
+    def cancel(self, reason="cancelled"):
+        """Cancel the work from any thread"""
+        if not self._cancelled.is_set():
+            self.reason = reason
+            self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        if self._cancelled.is_set():
+            return True
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel("deadline exceeded")
+        elif self.is_disconnected is not None and self.is_disconnected():
+            self.cancel("client disconnected")
+        return self._cancelled.is_set()
+
+    def check(self):
+        """
+        :raises Cancelled: if the token is cancelled
+        """
+        if self.cancelled:
+            raise Cancelled(self.reason)
+
+
+def get_token(cancel):
+    """
+    :param cancel: a :class:`CancelToken`, a timeout in seconds or None
+    :returns: a :class:`CancelToken` or None
+    """
+    if cancel is None or isinstance(cancel, CancelToken):
+        return cancel
+    return CancelToken(timeout=cancel)
+
+
+def iget_checked(rows, token, check_every=None):
+    """
+    Get a generator of the rows that checks the token before the
+    first row and after every *check_every* rows
+
+    :param rows: an iterable
+    :param token: a :class:`CancelToken`, or None to not check, in
+                  which case *rows* is returned as it is
+    """
+    if token is None:
+        return rows
+    return _iget_checked(rows, token, check_every or CHECK_EVERY)
+
+
+def _iget_checked(rows, token, check_every):
+    token.check()
+    unchecked = 0
+    for row in rows:
+        yield row
+        unchecked += 1
+        if unchecked >= check_every:
+            token.rows += unchecked
+            unchecked = 0
+            token.check()
+    token.rows += unchecked
+    token.check()
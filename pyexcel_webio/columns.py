@@ -0,0 +1,86 @@
+"""
+    pyexcel_webio.columns
+    ~~~~~~~~~~~~~~~~~~~
+
+    Render a dictionary of columns a row at a time, without building
+    a row-major copy of it first
+
+    :copyright: (c) 2015-2017 by Onni Software Ltd.
+    :license: New BSD License
+"""
+import io
+from itertools import zip_longest
+from collections import OrderedDict
+
+import pyexcel_io
+
+from pyexcel_webio import ndjson
+from pyexcel_webio._params import DELIMITED_FILE_TYPES
+
+FILE_TYPES = DELIMITED_FILE_TYPES + (ndjson.FILE_TYPE,)
+_DEST_PREFIX = "dest_"
+
+
+def is_supported(file_type, keywords):
+    """
+    Tell if a dictionary of columns could be rendered a row at a time
+
+    :param file_type: the file type to render
+    :param keywords: the keywords for :meth:`pyexcel.save_as`. Only
+                     those of the writer, prefixed with ``dest_``, are
+                     supported.
+    """
+    if file_type not in FILE_TYPES:
+        return False
+    return all(key.startswith(_DEST_PREFIX) for key in keywords)
+
+
+def iget_rows(adict):
+    """
+    Get a generator of the header row and the rows of the columns,
+    taken across them in lockstep. Short columns are padded with "".
+
+    :param adict: a dictionary of lists. The columns of a plain dict
+                  are sorted by name, as :meth:`pyexcel.save_as` does.
+    """
+    header = column_names(adict)
+    yield header
+    for row in zip_longest(*[adict[name] for name in header],
+                           fillvalue=""):
+        yield ["" if value is None else value for value in row]
+
+
+def column_names(adict):
+    """
+    :returns: the names of the columns in the order pyexcel writes
+              them: as they are in an OrderedDict, otherwise sorted
+    """
+    names = list(adict.keys())
+    if not isinstance(adict, OrderedDict):
+        names.sort()
+    return names
+
+
+def render(adict, file_type, **keywords):
+    """
+    Render a dictionary of columns
+
+    :param adict: a dictionary of lists
+    :param file_type: 'csv', 'tsv' or 'ndjson'
+    :param keywords: the ``dest_`` keywords of :meth:`pyexcel.save_as`
+    :returns: a stream for 'csv' and 'tsv' and a generator of lines
+              for 'ndjson'
+    """
+    if file_type == ndjson.FILE_TYPE:
+        header = column_names(adict)
+        return ndjson.render_records(
+            dict(zip(header, row))
+            for row in zip_longest(*[adict[name] for name in header],
+                                   fillvalue=""))
+    stream = io.StringIO()
+    options = dict((key[len(_DEST_PREFIX):], value)
+                   for key, value in keywords.items())
+    pyexcel_io.save_data(stream, {"pyexcel_sheet1": iget_rows(adict)},
+                         file_type=file_type, **options)
+    stream.seek(0)
+    return stream
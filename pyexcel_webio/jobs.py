@@ -0,0 +1,266 @@
+"""
+    pyexcel_webio.jobs
+    ~~~~~~~~~~~~~~~~~~~
+
+    Render slow exports in the background and serve them when they
+    are done, keeping the files in a local directory for a while
+
+    :copyright: (c) 2015-2017 by Onni Software Ltd.
+    :license: New BSD License
+"""
+import os
+import json
+import codecs
+import time
+import uuid
+import inspect
+import functools
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pyexcel_webio as webio
+from pyexcel_webio import cancellation
+
+QUEUED = "queued"
+RUNNING = "running"
+FINISHED = "finished"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+CHUNK_SIZE = 64 * 1024
+
+
+class JobNotFinished(Exception):
+    """Raised when the export of an unfinished job is asked for"""
+    pass
+
+
+class ExportJobs(object):
+    """
+    A bounded pool of threads rendering exports, with their results
+    kept as files in a local directory
+
+    A job is any *make_response* function of :mod:`pyexcel_webio`
+    with its arguments, or a function that ends in a call to one.
+    It runs after the request that submitted it has finished, so it
+    must not use objects bound to that request, such as its database
+    session. Open a new one in the function instead.
+
+    :param directory: where to keep the rendered exports
+    :param max_workers: the most exports rendered at the same time
+    :param ttl: the seconds an export is kept once its job is done
+    """
+    def __init__(self, directory, max_workers=2, ttl=3600):
+        self.directory = directory
+        self.ttl = ttl
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._lock = threading.Lock()
+        self._jobs = {}
+
+    def submit(self, make_response_func, *args, **keywords):
+        """
+        Queue an export
+
+        A function that takes *cancel*, such as
+        :meth:`~pyexcel_webio.make_response_from_a_table`, is given the
+        job's :class:`~pyexcel_webio.cancellation.CancelToken` unless
+        one is passed, so that the job can be cancelled and its rows
+        counted.
+
+        :returns: the job id
+        """
+        self.purge()
+        job = _Job(uuid.uuid4().hex)
+        if "cancel" not in keywords and _takes_cancel(make_response_func):
+            keywords["cancel"] = job.token
+        job.future = self._executor.submit(
+            self._run, job, make_response_func, args, keywords)
+        with self._lock:
+            self._jobs[job.job_id] = job
+        return job.job_id
+
+    def status(self, job_id):
+        """
+        :returns: a dictionary of the job's *state*, one of 'queued',
+                  'running', 'finished', 'failed' and 'cancelled', the
+                  number of *rows* done so far if known and its
+                  *error*. A finished job also has the *file_type*,
+                  *file_name* and extra *headers*, such as the
+                  :data:`~pyexcel_webio.WATERMARK_HEADER`, of its
+                  export.
+        :raises KeyError: if the job is unknown or has expired
+        """
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.status()
+        meta = self._read_meta(job_id)
+        if meta is None:
+            raise KeyError(job_id)
+        return meta
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job"""
+        job = self._jobs.get(job_id)
+        if job is None:
+            raise KeyError(job_id)
+        if job.future.cancel():
+            job.state = CANCELLED
+            job.finished = time.time()
+        job.token.cancel()
+
+    def make_response(self, job_id, status=200, file_name=None):
+        """
+        Make a http response of a finished export through the function
+        given to :func:`~pyexcel_webio.init_webio`
+
+        The content is a generator of the chunks of the stored export,
+        read from its file as the response is sent.
+
+        :param file_name: the download name. Defaults to the one the
+                          job was submitted with.
+        :raises JobNotFinished: if the job is not finished yet
+        """
+        meta = self.status(job_id)
+        if meta["state"] != FINISHED:
+            raise JobNotFinished(meta["state"])
+        f = open(self._path(job_id, ".data"), "rb")
+        response = webio._make_response(
+            _iget_chunks(f, meta["is_text"]), meta["file_type"], status,
+            file_name or meta["file_name"])
+        for name, value in meta.get("headers", {}).items():
+            webio._set_header(response, name, value)
+        return response
+
+    def purge(self):
+        """Remove the exports of jobs that were done over *ttl* ago"""
+        expired = time.time() - self.ttl
+        with self._lock:
+            for job_id, job in list(self._jobs.items()):
+                if job.finished is not None and job.finished <= expired:
+                    del self._jobs[job_id]
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            job_id = name[:-len(".json")]
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) > expired:
+                    continue
+            except OSError:
+                continue
+            for extension in (".json", ".data"):
+                try:
+                    os.unlink(self._path(job_id, extension))
+                except OSError:
+                    pass
+
+    def shutdown(self, wait=True):
+        """Stop taking jobs, cancelling the ones not started yet"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            if job.future is not None and job.future.cancel():
+                job.state = CANCELLED
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, job, make_response_func, args, keywords):
+        job.state = RUNNING
+        meta = {}
+        try:
+            content, file_type, file_name, headers = (
+                webio._capture_response(
+                    make_response_func, *args, **keywords))
+            if isinstance(content, (bytes, str)):
+                content = [content]
+            is_text = self._write_chunks(self._path(job.job_id, ".data"),
+                                         content)
+            meta = {"file_type": file_type, "file_name": file_name,
+                    "is_text": is_text, "headers": headers}
+            job.state = FINISHED
+        except cancellation.Cancelled:
+            job.state = CANCELLED
+        except Exception as error:
+            job.state = FAILED
+            job.error = "%s: %s" % (type(error).__name__, error)
+        job.finished = time.time()
+        meta.update(job.status())
+        self._write(self._path(job.job_id, ".json"),
+                    json.dumps(meta).encode("utf-8"))
+        job.meta = meta
+
+    def _read_meta(self, job_id):
+        try:
+            with open(self._path(job_id, ".json"), "rb") as f:
+                return json.loads(f.read().decode("utf-8"))
+        except (IOError, OSError, ValueError):
+            return None
+
+    def _path(self, job_id, extension):
+        if not job_id.isalnum():
+            raise KeyError(job_id)
+        return os.path.join(self.directory, job_id + extension)
+
+    def _write(self, path, content):
+        self._write_chunks(path, [content])
+
+    def _write_chunks(self, path, chunks):
+        """
+        Write the chunks as they come, text as utf-8
+
+        :returns: whether the chunks were text
+        """
+        is_text = False
+        handle, temp_path = tempfile.mkstemp(dir=self.directory)
+        try:
+            with os.fdopen(handle, "wb") as f:
+                for chunk in chunks:
+                    if not isinstance(chunk, bytes):
+                        is_text = True
+                        chunk = chunk.encode("utf-8")
+                    f.write(chunk)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        os.replace(temp_path, path)
+        return is_text
+
+
+class _Job(object):
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.token = cancellation.CancelToken()
+        self.state = QUEUED
+        self.error = None
+        self.finished = None
+        self.future = None
+        self.meta = None
+
+    def status(self):
+        if self.meta is not None:
+            return dict(self.meta)
+        return {"job_id": self.job_id, "state": self.state,
+                "rows": self.token.rows, "error": self.error}
+
+
+def _iget_chunks(f, is_text):
+    decoder = None
+    if is_text:
+        decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        for chunk in iter(functools.partial(f.read, CHUNK_SIZE), b""):
+            if decoder is not None:
+                chunk = decoder.decode(chunk)
+            if chunk:
+                yield chunk
+    finally:
+        f.close()
+
+
+def _takes_cancel(func):
+    try:
+        return "cancel" in inspect.signature(func).parameters
+    except (TypeError, ValueError):
+        return False
@@ -0,0 +1,379 @@
+"""
+    pyexcel_webio.loadtest
+    ~~~~~~~~~~~~~~~~~~~
+
+    Load testing of excel file upload and download against a local
+    wsgiref server::
+
+        $ python -m pyexcel_webio.loadtest --file-types csv,xls \\
+              --concurrency 1,8,32 --requests 200 --rows 1000
+
+    :copyright: (c) 2015-2017 by Onni Software Ltd.
+    :license: New BSD License
+"""
+import io
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+from socketserver import ThreadingMixIn
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.simple_server import WSGIServer, WSGIRequestHandler, make_server
+from urllib.parse import parse_qs
+from urllib.request import Request, urlopen
+
+import pyexcel as pe
+import pyexcel_webio as webio
+
+DOWNLOADS = [
+    "make_response",
+    "make_response_from_array",
+    "make_response_from_dict",
+    "make_response_from_records",
+    "make_response_from_book_dict",
+    "make_response_from_query_sets",
+    "make_response_from_a_table",
+    "make_response_from_tables",
+]
+DATABASE_DOWNLOADS = DOWNLOADS[-3:]
+COLUMNS = ["id", "name", "quantity", "price"]
+PERCENTILES = (50, 95, 99)
+# seconds between samples of the resident memory
+RSS_INTERVAL = 0.01
+
+
+class UploadInput(webio.ExcelInputInMultiDict):
+    """Uploaded files, by field name, of one request"""
+    def __init__(self, files):
+        self.files = files
+
+    def get_file_tuple(self, field_name):
+        return self.files.get(field_name, (None, None))
+
+
+class LoadTest(object):
+    """
+    Serve a minimal wsgi application built on :mod:`wsgiref` and
+    drive concurrent clients against it
+
+    The application registers its own response function through
+    :func:`~pyexcel_webio.init_webio` while the load test runs.
+
+    :param rows: the number of data rows of each upload and download
+    :param file_types: the file types to upload and download
+    :param downloads: the names of the *make_response* functions to
+                      download through. The ones reading a database
+                      need SQLAlchemy.
+    """
+    def __init__(self, rows=1000, file_types=("csv",), downloads=None):
+        self.rows = rows
+        self.file_types = list(file_types)
+        self.downloads = list(downloads or DOWNLOADS)
+        self.array = [COLUMNS] + [
+            [index, "item %d" % index, index % 7, index * 0.5]
+            for index in range(rows)
+        ]
+        # pyexcel may take rows out of an array it is given
+        self.adict = pe.Sheet(list(self.array),
+                              name_columns_by_row=0).to_dict()
+        self.records = [dict(zip(COLUMNS, row)) for row in self.array[1:]]
+        self.uploads = dict(
+            (file_type, _to_bytes(pe.save_as(
+                array=self.array, dest_file_type=file_type).read()))
+            for file_type in self.file_types)
+        self.directory = None
+        self.database = None
+        self.server = None
+
+    def run(self, concurrency_levels=(1, 8), requests=100):
+        """
+        Run every scenario at every level of concurrency
+
+        :param concurrency_levels: the numbers of concurrent clients
+        :param requests: the number of requests per scenario
+        :returns: a list of result dictionaries, one per scenario
+        """
+        results = []
+        self.start()
+        try:
+            for concurrency in concurrency_levels:
+                for file_type in self.file_types:
+                    results.append(self.measure(
+                        "upload", file_type, concurrency, requests))
+                    for download in self.downloads:
+                        results.append(self.measure(
+                            download, file_type, concurrency, requests))
+        finally:
+            self.stop()
+        return results
+
+    def start(self):
+        self.directory = tempfile.mkdtemp()
+        if set(self.downloads) & set(DATABASE_DOWNLOADS):
+            self.database = _Database(
+                os.path.join(self.directory, "loadtest.db"), self.array)
+        self._response_func = webio.__excel_response_func__
+        webio.init_webio(_wsgi_response)
+        self.server = make_server(
+            "127.0.0.1", 0, self.application,
+            server_class=_ThreadingWSGIServer,
+            handler_class=_QuietHandler)
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        webio.init_webio(self._response_func)
+        if self.database is not None:
+            self.database.close()
+            self.database = None
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def measure(self, operation, file_type, concurrency, requests):
+        """
+        Send *requests* requests from *concurrency* clients
+
+        :returns: a dictionary of throughput, latency percentiles in
+                  seconds and the peak resident memory in bytes,
+                  sampled while the requests of this scenario ran
+        """
+        url = "http://127.0.0.1:%d/%s?file_type=%s" % (
+            self.server.server_port, operation, file_type)
+        body = None
+        if operation == "upload":
+            body = self.uploads[file_type]
+
+        def send(_):
+            started = time.time()
+            response = urlopen(Request(url, data=body))
+            response.read()
+            response.close()
+            return time.time() - started
+
+        sampler = _RssSampler()
+        started = time.time()
+        try:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                latencies = sorted(executor.map(send, range(requests)))
+        finally:
+            sampler.stop()
+        elapsed = time.time() - started
+        result = {
+            "operation": operation,
+            "file_type": file_type,
+            "concurrency": concurrency,
+            "requests": requests,
+            "throughput": requests / elapsed,
+            "peak_rss": sampler.peak,
+        }
+        for percentile in PERCENTILES:
+            result["p%d" % percentile] = _percentile(latencies, percentile)
+        return result
+
+    def application(self, environ, start_response):
+        operation = environ["PATH_INFO"].strip("/")
+        query = parse_qs(environ.get("QUERY_STRING", ""))
+        file_type = query.get("file_type", ["csv"])[0]
+        if operation == "upload":
+            length = int(environ.get("CONTENT_LENGTH") or 0)
+            upload = io.BytesIO(environ["wsgi.input"].read(length))
+            records = UploadInput({"file": (file_type, upload)}).get_records(
+                field_name="file")
+            status, headers, body = _wsgi_response(
+                str(len(records)), "text/plain")
+        elif operation in self.downloads:
+            status, headers, body = self.download(operation, file_type)
+        else:
+            status, headers, body = _wsgi_response(
+                "Not found", "text/plain", status=404)
+        start_response(status, headers)
+        return body
+
+    def download(self, operation, file_type):
+        if operation in DATABASE_DOWNLOADS:
+            session = self.database.session()
+            try:
+                return self._download_from_database(
+                    operation, file_type, session)
+            finally:
+                session.close()
+        if operation == "make_response":
+            return webio.make_response(pe.Sheet(list(self.array)),
+                                       file_type)
+        if operation == "make_response_from_array":
+            return webio.make_response_from_array(list(self.array),
+                                                  file_type)
+        if operation == "make_response_from_dict":
+            return webio.make_response_from_dict(self.adict, file_type)
+        if operation == "make_response_from_records":
+            return webio.make_response_from_records(self.records, file_type)
+        return webio.make_response_from_book_dict(
+            {"loadtest": list(self.array)}, file_type)
+
+    def _download_from_database(self, operation, file_type, session):
+        table = self.database.table
+        if operation == "make_response_from_query_sets":
+            return webio.make_response_from_query_sets(
+                session.query(table).all(), COLUMNS, file_type)
+        if operation == "make_response_from_a_table":
+            return webio.make_response_from_a_table(
+                session, table, file_type)
+        return webio.make_response_from_tables(session, [table], file_type)
+
+
+def rss():
+    """
+    :returns: the resident memory of this process in bytes now, or
+              None where it cannot be read from /proc
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (IOError, OSError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE")
+
+
+def format_results(results):
+    """Format the results of :meth:`LoadTest.run` as a text table"""
+    header = "%-32s %-6s %5s %10s %9s %9s %9s %10s" % (
+        "operation", "type", "conc", "req/s",
+        "p50 ms", "p95 ms", "p99 ms", "rss MB")
+    lines = [header, "-" * len(header)]
+    for result in results:
+        rss = result["peak_rss"]
+        lines.append("%-32s %-6s %5d %10.1f %9.1f %9.1f %9.1f %10s" % (
+            result["operation"], result["file_type"],
+            result["concurrency"], result["throughput"],
+            result["p50"] * 1000, result["p95"] * 1000,
+            result["p99"] * 1000,
+            "-" if rss is None else "%.1f" % (rss / 1024.0 / 1024.0)))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Load test pyexcel-webio upload and download")
+    parser.add_argument("--file-types", default="csv",
+                        help="comma separated file types")
+    parser.add_argument("--concurrency", default="1,8",
+                        help="comma separated numbers of clients")
+    parser.add_argument("--requests", type=int, default=100,
+                        help="requests per scenario")
+    parser.add_argument("--rows", type=int, default=1000,
+                        help="data rows per file")
+    parser.add_argument("--downloads", default=",".join(DOWNLOADS),
+                        help="comma separated make_response functions")
+    options = parser.parse_args(argv)
+    load_test = LoadTest(rows=options.rows,
+                         file_types=options.file_types.split(","),
+                         downloads=options.downloads.split(","))
+    results = load_test.run(
+        [int(level) for level in options.concurrency.split(",")],
+        options.requests)
+    print(format_results(results))
+
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class _RssSampler(object):
+    """
+    Sample the resident memory until stopped, since the peak that
+    :mod:`resource` reports is the highest of the whole process life
+    """
+    def __init__(self, interval=RSS_INTERVAL):
+        self.interval = interval
+        self.peak = rss()
+        self._stopped = threading.Event()
+        self._thread = None
+        if self.peak is not None:
+            self._thread = threading.Thread(target=self._sample)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _sample(self):
+        while not self._stopped.wait(self.interval):
+            self.peak = max(self.peak, rss() or 0)
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self.peak = max(self.peak, rss() or 0)
+
+
+class _Database(object):
+    def __init__(self, path, array):
+        from sqlalchemy import Column, Float, Integer, String, create_engine
+        from sqlalchemy.orm import sessionmaker
+        try:
+            from sqlalchemy.orm import declarative_base
+        except ImportError:
+            from sqlalchemy.ext.declarative import declarative_base
+
+        base = declarative_base()
+
+        class Item(base):
+            __tablename__ = "loadtest"
+            id = Column(Integer, primary_key=True)
+            name = Column(String(100))
+            quantity = Column(Integer)
+            price = Column(Float)
+
+        self.table = Item
+        self.engine = create_engine(
+            "sqlite:///%s" % path,
+            connect_args={"check_same_thread": False})
+        base.metadata.create_all(self.engine)
+        self.session = sessionmaker(bind=self.engine)
+        session = self.session()
+        session.add_all(Item(**dict(zip(COLUMNS, row))) for row in array[1:])
+        session.commit()
+        session.close()
+
+    def close(self):
+        self.engine.dispose()
+
+
+def _wsgi_response(content, content_type=None, status=200, file_name=None):
+    content = _to_bytes(content)
+    headers = [("Content-Type", content_type or "application/octet-stream"),
+               ("Content-Length", str(len(content)))]
+    if file_name:
+        headers.append(("Content-Disposition",
+                        "attachment; filename=%s" % file_name))
+    reason = "OK" if status == 200 else "Error"
+    return "%d %s" % (status, reason), headers, [content]
+
+
+def _to_bytes(content):
+    if isinstance(content, bytes):
+        return content
+    if isinstance(content, str):
+        return content.encode("utf-8")
+    return b"".join(_to_bytes(chunk) for chunk in content)
+
+
+def _percentile(ordered, percentile):
+    if not ordered:
+        return 0.0
+    index = max(int(round(percentile / 100.0 * len(ordered))) - 1, 0)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+    pyexcel_webio.ndjson
+    ~~~~~~~~~~~~~~~~~~~
+
+    Newline delimited json, one record per line, read and written
+    a line at a time
+
+    :copyright: (c) 2015-2017 by Onni Software Ltd.
+    :license: New BSD License
+"""
+import io
+import json
+
+from pyexcel_webio._params import get_file_type, is_seekable, pop_source
+
+FILE_TYPE = "ndjson"
+MIME_TYPE = "application/x-ndjson"
+
+
+def is_ndjson(params):
+    """Tell if the parameters point at ndjson content"""
+    return get_file_type(params) == FILE_TYPE
+
+
+def render_records(records):
+    """
+    Render records a line at a time
+
+    :param records: an iterable of dictionaries
+    :returns: a generator of utf-8 encoded lines
+    """
+    for record in records:
+        yield _dump(record)
+
+
+def render_query_sets(query_sets, column_names):
+    """
+    Render query sets a line at a time
+
+    :param query_sets: an iterable of objects
+    :param column_names: the attributes to render of each object
+    :returns: a generator of utf-8 encoded lines
+    """
+    for row in query_sets:
+        yield _dump(dict(
+            (name, getattr(row, name)) for name in column_names))
+
+
+def iget_records(params):
+    """
+    Get a generator of records, parsed a line at a time. Blank lines
+    are skipped. A stream that cannot seek, such as a request body,
+    is parsed as its lines arrive.
+
+    :param params: the parameters from :meth:`ExcelInput.get_params`
+    :returns: A generator of dictionaries
+    """
+    params = dict(params)
+    content, stream, file_name = pop_source(params)
+    opened = content is None and stream is None
+    if content is not None:
+        if isinstance(content, str):
+            lines = io.StringIO(content)
+        elif isinstance(content, bytes):
+            lines = io.BytesIO(content)
+        else:
+            content.seek(0)
+            lines = iter(content.readline, b"")
+    elif stream is not None:
+        if is_seekable(stream):
+            stream.seek(0)
+        lines = stream
+    else:
+        lines = open(file_name, "rb")
+    try:
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError(
+                    "Line %d is not a json object" % number)
+            yield record
+    finally:
+        if opened:
+            lines.close()
+
+
+def iget_array(params):
+    """
+    Get a generator for a list of lists. The keys of the first
+    record make the header row; keys that first appear later are
+    left out.
+
+    :param params: the parameters from :meth:`ExcelInput.get_params`
+    :returns: A generator for a list of lists
+    """
+    records = iget_records(params)
+    first = next(records, None)
+    if first is None:
+        return
+    header = list(first.keys())
+    yield header
+    yield [first[key] for key in header]
+    for record in records:
+        yield [record.get(key, "") for key in header]
+
+
+def _dump(record):
+    line = json.dumps(record, default=str, ensure_ascii=False)
+    return (line + "\n").encode("utf-8")
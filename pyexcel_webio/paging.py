@@ -0,0 +1,204 @@
+"""
+    pyexcel_webio.paging
+    ~~~~~~~~~~~~~~~~~~~
+
+    Random access to the rows of an upload through a row-offset index
+
+    :copyright: (c) 2015-2017 by Onni Software Ltd.
+    :license: New BSD License
+"""
+import os
+import re
+import sys
+import json
+import uuid
+import shutil
+import struct
+from array import array
+
+import pyexcel as pe
+from pyexcel_webio._params import (
+    SOURCE_KEYS, DELIMITED_FILE_TYPES, WINDOW_KEYS, get_file_type,
+    is_ascii_compatible, pop_source)
+
+_OFFSET = struct.Struct("<q")
+_UPLOAD_ID = re.compile(r"^[0-9a-f]{32}$")
+_BUFFERED_OFFSETS = 8192
+
+
+class IndexedUpload(object):
+    """
+    An upload spooled to disk as a delimited file, with the byte
+    offset of each of its rows in an index file
+
+    A page of rows is read by seeking straight to it, so it costs
+    the size of the page rather than the size of the upload.
+
+    :param directory: where the upload was spooled
+    :param upload_id: the id given by :meth:`IndexedUpload.create`
+    :raises KeyError: if *upload_id* is not such an id
+    """
+    def __init__(self, directory, upload_id):
+        if not _UPLOAD_ID.match(str(upload_id)):
+            raise KeyError(upload_id)
+        self.directory = directory
+        self.upload_id = upload_id
+        with open(self._path(".json"), "r") as f:
+            meta = json.load(f)
+        self.file_type = meta["file_type"]
+        self.keywords = meta["keywords"]
+        self._header = None
+
+    @classmethod
+    def create(cls, directory, params):
+        """
+        Spool and index an upload
+
+        'csv' and 'tsv' uploads are copied as they are. Other file
+        types, uploads with a row or column window such as
+        *start_row*, and uploads in an encoding such as 'utf-16' whose
+        line breaks are not single bytes, are converted to 'csv' first,
+        so that the window is applied once rather than to every page.
+
+        :param directory: where to keep the spooled upload
+        :param params: the parameters from :meth:`ExcelInput.get_params`
+        :returns: an :class:`IndexedUpload`
+        """
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        upload_id = uuid.uuid4().hex
+        base = os.path.join(directory, upload_id)
+        params = dict(params)
+        file_type = get_file_type(params)
+        windowed = any(key in params for key in WINDOW_KEYS)
+        if (file_type in DELIMITED_FILE_TYPES and not windowed and
+                is_ascii_compatible(params)):
+            _spool(params, base + ".data")
+            keywords = dict(
+                (key, value) for key, value in params.items()
+                if key not in SOURCE_KEYS + ("file_type",))
+        else:
+            pe.isave_as(dest_file_name=base + ".csv", **params)
+            pe.free_resources()
+            os.rename(base + ".csv", base + ".data")
+            file_type, keywords = "csv", {}
+        quotechar = keywords.get("quotechar", '"')
+        _build_index(base + ".data", base + ".index", quotechar)
+        with open(base + ".json", "w") as f:
+            json.dump({"file_type": file_type, "keywords": keywords}, f)
+        return cls(directory, upload_id)
+
+    def number_of_rows(self):
+        """The number of rows, excluding the header row"""
+        size = os.path.getsize(self._path(".index"))
+        return max(size // _OFFSET.size - 2, 0)
+
+    def get_array_page(self, offset, limit):
+        """
+        Get a page of rows as a list of lists. The header row is not
+        counted: offset 0 is the first row after it.
+
+        :param offset: the index of the first row of the page
+        :param limit: the most rows to return
+        :returns: A list of lists
+        """
+        return self._read_rows(offset + 1, offset + 1 + limit)
+
+    def get_records_page(self, offset, limit):
+        """
+        Get a page of records, keyed by the header row
+
+        :param offset: same as :meth:`get_array_page`
+        :param limit: same as :meth:`get_array_page`
+        :returns: A list of records
+        """
+        if self._header is None:
+            header = self._read_rows(0, 1)
+            self._header = header[0] if header else []
+        width = len(self._header)
+        return [
+            dict(zip(self._header, row + [""] * (width - len(row))))
+            for row in self.get_array_page(offset, limit)
+        ]
+
+    def delete(self):
+        """Remove the spooled upload and its index"""
+        for extension in (".data", ".index", ".json"):
+            path = self._path(extension)
+            if os.path.exists(path):
+                os.unlink(path)
+
+    def _read_rows(self, start, end):
+        count = os.path.getsize(self._path(".index")) // _OFFSET.size - 1
+        start, end = max(start, 0), min(end, count)
+        if start >= end:
+            return []
+        with open(self._path(".index"), "rb") as f:
+            f.seek(start * _OFFSET.size)
+            begin = _OFFSET.unpack(f.read(_OFFSET.size))[0]
+            f.seek(end * _OFFSET.size)
+            finish = _OFFSET.unpack(f.read(_OFFSET.size))[0]
+        with open(self._path(".data"), "rb") as f:
+            f.seek(begin)
+            content = f.read(finish - begin)
+        return pe.get_array(file_type=self.file_type, file_content=content,
+                            **self.keywords)
+
+    def _path(self, extension):
+        return os.path.join(self.directory, self.upload_id + extension)
+
+
+def _build_index(data_path, index_path, quotechar):
+    """
+    Record the start of every row and the end of the file. A line
+    break inside a quoted field does not start a row.
+    """
+    quote = quotechar.encode("ascii")
+    offsets = array("q", [0])
+    position = 0
+    last_offset = 0
+    quotes = 0
+    with open(data_path, "rb") as data, open(index_path, "wb") as index:
+        for line in data:
+            position += len(line)
+            quotes += line.count(quote)
+            if quotes % 2 == 0:
+                offsets.append(position)
+                last_offset = position
+                if len(offsets) >= _BUFFERED_OFFSETS:
+                    _write_offsets(index, offsets)
+                    offsets = array("q")
+        if position != last_offset:
+            offsets.append(position)
+        _write_offsets(index, offsets)
+
+
+def _write_offsets(index, offsets):
+    if sys.byteorder == "big":
+        offsets.byteswap()
+    index.write(offsets.tobytes())
+
+
+def _spool(params, path):
+    content, stream, file_name = pop_source(params)
+    with open(path, "wb") as f:
+        if content is not None:
+            if isinstance(content, str):
+                content = content.encode(params.get("encoding", "utf-8"))
+            f.write(content)
+        elif stream is not None:
+            stream.seek(0)
+            _copy(stream, f, params.get("encoding", "utf-8"))
+        else:
+            with open(file_name, "rb") as source:
+                shutil.copyfileobj(source, f)
+
+
+def _copy(stream, f, encoding):
+    while True:
+        chunk = stream.read(1024 * 1024)
+        if not chunk:
+            break
+        if not isinstance(chunk, bytes):
+            chunk = chunk.encode(encoding)
+        f.write(chunk)
@@ -0,0 +1,216 @@
+"""
+    pyexcel_webio.parallel
+    ~~~~~~~~~~~~~~~~~~~
+
+    Multi-process parsing of large delimited uploads and rendering
+    of multi-sheet books
+
+    :copyright: (c) 2015-2017 by Onni Software Ltd.
+    :license: New BSD License
+"""
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from pyexcel_webio import xlsx, zipstream
+from pyexcel_webio._params import (
+    get_file_type, is_ascii_compatible, is_delimited, iget_window, pad_rows,
+    parse_delimited, pop_window, read_content)
+
+# below this size per worker, the pool costs more than it saves
+MIN_CHUNK_SIZE = 1024 * 1024
+
+
+def is_supported(params):
+    """
+    Tell if the parameters from :meth:`ExcelInput.get_params` could
+    be parsed in parallel: 'csv' or 'tsv' content whose encoding
+    keeps line breaks and quotes as ascii bytes
+    """
+    return is_delimited(params) and is_ascii_compatible(params)
+
+
+def split_records(content, chunk_size, quotechar='"'):
+    """
+    Split delimited content into ranges of whole records
+
+    Each range starts after a line break that is not inside a
+    quoted field, so a record never spans two ranges.
+
+    :param content: bytes, a memory map or text of a csv/tsv file
+    :param chunk_size: the minimum length of each range
+    :param quotechar: the quote character of the file
+    :returns: a list of (start, end) offsets
+    """
+    newline, quote = b"\n", quotechar.encode("ascii")
+    if isinstance(content, str):
+        newline, quote = "\n", quotechar
+    length = len(content)
+    chunk_size = max(chunk_size, 1)
+    ranges = []
+    start = 0
+    counted_to = 0
+    quotes = 0
+    while start < length:
+        cut = length
+        position = content.find(newline, start + chunk_size - 1)
+        while position != -1:
+            quotes += _count(content, quote, counted_to, position)
+            counted_to = position
+            if quotes % 2 == 0:
+                cut = position + 1
+                break
+            position = content.find(newline, position + 1)
+        ranges.append((start, cut))
+        start = cut
+    return ranges
+
+
+def iget_array(params, workers=None):
+    """
+    Get a generator for a list of lists, parsed in a process pool
+
+    Rows are yielded in file order. At most twice as many ranges as
+    there are workers are parsed ahead of the consumer. The ranges are
+    parsed without the row and column window, such as *start_row* and
+    *row_limit*, which is applied once to the rows of the whole file.
+    Content too small to split is parsed in this process.
+
+    :param params: the parameters from :meth:`ExcelInput.get_params`
+    :param workers: the number of processes, defaults to cpu count
+    :returns: A generator for a list of lists
+    """
+    workers = _get_workers(workers)
+    params = dict(params)
+    file_type = get_file_type(params)
+    params.pop("file_type", None)
+    window = pop_window(params)
+    content = read_content(params)
+    chunk_size = max(len(content) // workers + 1, MIN_CHUNK_SIZE)
+    ranges = split_records(content, chunk_size,
+                           params.get("quotechar", '"'))
+    return iget_window(
+        _iget_ranges(file_type, content, ranges, params, workers), window)
+
+
+def _iget_ranges(file_type, content, ranges, keywords, workers):
+    if len(ranges) < 2:
+        for start, end in ranges:
+            for row in parse_delimited(file_type, content[start:end],
+                                       keywords):
+                yield row
+        return
+    workers = min(workers, len(ranges))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for start, end in ranges:
+            pending.append(executor.submit(
+                parse_delimited, file_type, content[start:end], keywords))
+            if len(pending) >= 2 * workers:
+                for row in pending.popleft().result():
+                    yield row
+        while pending:
+            for row in pending.popleft().result():
+                yield row
+
+
+def get_array(params, workers=None):
+    """
+    Get a list of lists, parsed in a process pool
+
+    :param params: the parameters from :meth:`ExcelInput.get_params`
+    :param workers: the number of processes, defaults to cpu count
+    :returns: A list of lists
+    """
+    return pad_rows(list(iget_array(params, workers)))
+
+
+def get_records(params, workers=None):
+    """
+    Get a list of records, parsed in a process pool. The first row
+    is taken as the header, whose cells are made strings as
+    :meth:`pyexcel.get_records` makes them.
+
+    :param params: the parameters from :meth:`ExcelInput.get_params`
+    :param workers: the number of processes, defaults to cpu count
+    :returns: A list of records
+    """
+    rows = iget_array(params, workers)
+    header = next(rows, None)
+    if header is None:
+        return []
+    header = [str(name) for name in header]
+    width = len(header)
+    return [
+        dict(zip(header, row + [""] * (width - len(row))))
+        for row in rows
+    ]
+
+
+def _count(content, quote, start, end):
+    if isinstance(content, (bytes, str)):
+        return content.count(quote, start, end)
+    # a memory map has no count
+    return content[start:end].count(quote)
+
+
+def is_render_supported(file_type, keywords):
+    """
+    Tell if a book of the file type could be rendered a sheet per
+    process. 'csvz' and 'tsvz' are, and so is 'xlsx' through
+    :mod:`pyexcel_webio.xlsx`.
+
+    :param keywords: same as :func:`pyexcel_webio.zipstream.is_supported`
+    """
+    if file_type == xlsx.FILE_TYPE:
+        return not keywords
+    return zipstream.is_supported(file_type, keywords)
+
+
+def render_book(sheets, file_type, workers=None, **keywords):
+    """
+    Render the sheets of a book in a process pool, each as an entry
+    of a zip file, and put the entries together
+
+    :param sheets: an iterable of (sheet name, list of rows) pairs
+    :param file_type: 'csvz', 'tsvz' or 'xlsx'
+    :param workers: the number of processes, defaults to cpu count
+    :param keywords: the ``dest_`` keywords of :meth:`pyexcel.save_as`
+    :returns: the bytes of the file
+    """
+    workers = _get_workers(workers)
+    if file_type == xlsx.FILE_TYPE:
+        sheets = xlsx.split_sheets(sheets) or [("pyexcel_sheet1", [])]
+        jobs = [
+            (xlsx.sheet_part_name(number), rows, None)
+            for number, (_, rows) in enumerate(sheets, 1)
+        ]
+    else:
+        options = zipstream.csv_options(file_type, keywords)
+        jobs = [
+            ("%s.%s" % (name, file_type[:3]), rows, options)
+            for name, rows in sheets
+        ]
+    entries = []
+    if jobs:
+        workers = min(workers, len(jobs))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            entries = list(executor.map(_render_entry, *zip(*jobs)))
+    if file_type == xlsx.FILE_TYPE:
+        entries.extend(
+            zipstream.deflate(name, [xml])
+            for name, xml in xlsx.package_parts(
+                [name for name, _ in sheets]))
+    return zipstream.assemble(entries)
+
+
+def _render_entry(name, rows, options):
+    if options is None:
+        return zipstream.deflate(name, xlsx.iget_sheet_xml(rows))
+    return zipstream.deflate(name, zipstream.iget_csv(rows, options))
+
+
+def _get_workers(workers):
+    if workers is None or workers is True:
+        workers = os.cpu_count() or 1
+    return max(int(workers), 1)
@@ -0,0 +1,94 @@
+"""
+    pyexcel_webio.pipeline
+    ~~~~~~~~~~~~~~~~~~~
+
+    Fetch rows on a background thread while they are being rendered
+
+    :copyright: (c) 2015-2017 by Onni Software Ltd.
+    :license: New BSD License
+"""
+import queue
+import threading
+
+BATCH_SIZE = 1000
+MAX_BATCHES = 4
+_PUT_TIMEOUT = 0.1
+_DONE = object()
+
+
+def iget_rows(rows, batch_size=None, max_batches=None):
+    """
+    Get a generator of the rows that a background thread fetches
+
+    The thread hands over the rows in batches through a queue of at
+    most *max_batches* batches, so it waits whenever the consumer
+    falls behind. An error in the thread is raised in the consumer.
+    If the consumer stops early, the thread stops too.
+
+    :param rows: an iterable of rows, read on the background thread
+    :param batch_size: the number of rows per batch
+    :param max_batches: the most batches fetched ahead
+    :returns: a generator of the rows, in order
+    """
+    batches = queue.Queue(max_batches or MAX_BATCHES)
+    stopped = threading.Event()
+    thread = threading.Thread(
+        target=_fetch,
+        args=(rows, batch_size or BATCH_SIZE, batches, stopped))
+    thread.daemon = True
+    thread.start()
+    try:
+        while True:
+            batch = batches.get()
+            if batch is _DONE:
+                break
+            if isinstance(batch, _Failure):
+                raise batch.error
+            for row in batch:
+                yield row
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def query_set_rows(query_sets, column_names):
+    """
+    Get a generator of the header row and one row per object
+
+    :param query_sets: an iterable of objects
+    :param column_names: the attributes to read from each object
+    """
+    yield list(column_names)
+    for query_set in query_sets:
+        yield [getattr(query_set, name) for name in column_names]
+
+
+def _fetch(rows, batch_size, batches, stopped):
+    try:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                if not _put(batches, batch, stopped):
+                    return
+                batch = []
+        if batch and not _put(batches, batch, stopped):
+            return
+        _put(batches, _DONE, stopped)
+    except Exception as error:
+        _put(batches, _Failure(error), stopped)
+
+
+def _put(batches, item, stopped):
+    while not stopped.is_set():
+        try:
+            batches.put(item, timeout=_PUT_TIMEOUT)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+class _Failure(object):
+    def __init__(self, error):
+        self.error = error
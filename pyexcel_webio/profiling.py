@@ -0,0 +1,266 @@
+"""
+    pyexcel_webio.profiling
+    ~~~~~~~~~~~~~~~~~~~
+
+    Opt-in memory and cpu profiling of uploads and downloads
+
+    :copyright: (c) 2015-2017 by Onni Software Ltd.
+    :license: New BSD License
+"""
+import io
+import time
+import pstats
+import random
+import cProfile
+import logging
+import functools
+import threading
+import tracemalloc
+from collections import namedtuple
+
+from pyexcel_webio._closing import ClosingIterator
+
+log = logging.getLogger(__name__)
+
+Capture = namedtuple("Capture", [
+    "name", "file_type", "field_name", "rows",
+    "elapsed", "peak_memory", "profile"
+])
+Capture.__doc__ = """
+A profile of one call
+
+:param name: the name of the profiled function
+:param file_type: the excel file type read or written
+:param field_name: the form field of the upload, if any
+:param rows: the number of rows read or written, None if unknown
+:param elapsed: the wall time in seconds. For a response rendered
+                as it is sent, the time until it was sent.
+:param peak_memory: the peak memory in bytes traced by
+                    :mod:`tracemalloc` during the call, or None if
+                    tracing was already on and its peak cannot be
+                    reset, as before Python 3.9
+:param profile: the :mod:`cProfile` statistics as text, or None
+                if the call was not sampled for it
+"""
+
+PROFILE_LINES = 30
+
+_END = object()
+
+_profiler = None
+_tracing_lock = threading.Lock()
+_context = threading.local()
+
+
+def init_profiling(sink, sample_rate=1.0, profile_rate=0.0):
+    """
+    Start profiling uploads and downloads
+
+    Only one call is traced at a time, since :mod:`tracemalloc` is
+    process wide. Calls made while another is being traced are not
+    captured.
+
+    :param sink: a function receiving a :class:`Capture` per
+                 profiled call. None stops profiling.
+    :param sample_rate: the fraction of calls to trace memory of
+    :param profile_rate: the fraction of traced calls to also run
+                         under :mod:`cProfile`
+    """
+    global _profiler
+    if sink is None:
+        _profiler = None
+    else:
+        _profiler = _Profiler(sink, sample_rate, profile_rate)
+
+
+def profiled(rows_from=None):
+    """
+    Profile the decorated function while profiling is on
+
+    :param rows_from: the index of the positional argument to count
+                      rows of. The return value is counted if None.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **keywords):
+            profiler = _profiler
+            if profiler is None:
+                return func(*args, **keywords)
+            return profiler.run(func, args, keywords, rows_from)
+        return wrapper
+    return decorator
+
+
+def tag(**tags):
+    """
+    Add tags to the capture of the call being profiled in this
+    thread, if any
+    """
+    trace = getattr(_context, "trace", None)
+    if trace is not None:
+        trace.tags.update(tags)
+
+
+def defer(content):
+    """
+    Go on profiling the call being profiled in this thread, if any,
+    while its lazily rendered content is iterated over, and capture
+    it once the content is done with
+
+    :param content: an iterable of the chunks of a response
+    :returns: the content to respond with
+    """
+    trace = getattr(_context, "trace", None)
+    if trace is None:
+        return content
+    trace.deferred = True
+    if trace.profile is not None:
+        content = _iget_profiled(content, trace.profile)
+    return ClosingIterator(content, trace.finish)
+
+
+def count_rows(value):
+    """
+    Count the rows of an array, records, a dict, a book dict,
+    a :class:`pyexcel.Sheet` or a :class:`pyexcel.Book`
+
+    :returns: the number of rows or None
+    """
+    if hasattr(value, "number_of_rows"):
+        return value.number_of_rows()
+    if hasattr(value, "number_of_sheets"):
+        return sum(sheet.number_of_rows() for sheet in value)
+    if isinstance(value, dict):
+        columns = list(value.values())
+        if columns and all(_is_array(column) for column in columns):
+            return sum(len(column) for column in columns)
+        if columns and isinstance(columns[0], (list, tuple)):
+            return len(columns[0])
+        return None
+    if isinstance(value, (list, tuple)):
+        return len(value)
+    return None
+
+
+class _Profiler(object):
+    def __init__(self, sink, sample_rate, profile_rate):
+        self.sink = sink
+        self.sample_rate = sample_rate
+        self.profile_rate = profile_rate
+
+    def run(self, func, args, keywords, rows_from):
+        if random.random() >= self.sample_rate:
+            return func(*args, **keywords)
+        if not _tracing_lock.acquire(False):
+            return func(*args, **keywords)
+        profile = None
+        if random.random() < self.profile_rate:
+            profile = cProfile.Profile()
+        trace = _context.trace = _Trace(
+            self, func.__name__, keywords.get("field_name"), profile)
+        if rows_from is not None and rows_from < len(args):
+            trace.rows = count_rows(args[rows_from])
+        try:
+            if profile is None:
+                result = func(*args, **keywords)
+            else:
+                result = profile.runcall(func, *args, **keywords)
+        except BaseException:
+            trace.stop()
+            raise
+        finally:
+            _context.trace = None
+        if rows_from is None:
+            trace.rows = count_rows(result)
+        if not trace.deferred:
+            trace.finish()
+        return result
+
+    def _send(self, capture):
+        try:
+            self.sink(capture)
+        except Exception:
+            log.exception("Profiling sink failed")
+
+
+class _Trace(object):
+    """
+    The tracing of one call, and of the rendering of its content if
+    that was deferred to the iteration over it
+    """
+    def __init__(self, profiler, name, field_name, profile):
+        self.profiler = profiler
+        self.name = name
+        self.tags = {"field_name": field_name}
+        self.profile = profile
+        self.rows = None
+        self.deferred = False
+        self.stopped = False
+        self.was_tracing = tracemalloc.is_tracing()
+        # the peak of a trace started elsewhere can only be reset on 3.9+
+        self.measured = (not self.was_tracing or
+                         hasattr(tracemalloc, "reset_peak"))
+        if not self.was_tracing:
+            tracemalloc.start()
+        elif self.measured:
+            tracemalloc.reset_peak()
+        self.started = time.time()
+
+    def stop(self):
+        if self.stopped:
+            return
+        self.stopped = True
+        try:
+            self.elapsed = time.time() - self.started
+            self.peak_memory = None
+            if self.measured:
+                self.peak_memory = tracemalloc.get_traced_memory()[1]
+            if not self.was_tracing:
+                tracemalloc.stop()
+        finally:
+            _tracing_lock.release()
+
+    def finish(self):
+        if self.stopped:
+            return
+        self.stop()
+        self.profiler._send(Capture(
+            name=self.name,
+            file_type=self.tags.get("file_type"),
+            field_name=self.tags.get("field_name"),
+            rows=self.rows,
+            elapsed=self.elapsed,
+            peak_memory=self.peak_memory,
+            profile=_format_profile(self.profile)))
+
+
+def _iget_profiled(content, profile):
+    iterator = iter(content)
+    try:
+        while True:
+            profile.enable()
+            try:
+                chunk = next(iterator, _END)
+            finally:
+                profile.disable()
+            if chunk is _END:
+                return
+            yield chunk
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            close()
+
+
+def _is_array(value):
+    return (isinstance(value, (list, tuple)) and
+            all(isinstance(row, (list, tuple)) for row in value))
+
+
+def _format_profile(profile):
+    if profile is None:
+        return None
+    text = io.StringIO()
+    stats = pstats.Stats(profile, stream=text)
+    stats.sort_stats("cumulative").print_stats(PROFILE_LINES)
+    return text.getvalue()
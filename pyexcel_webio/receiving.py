@@ -0,0 +1,125 @@
+"""
+    pyexcel_webio.receiving
+    ~~~~~~~~~~~~~~~~~~~
+
+    Parsing of 'csv' and 'tsv' request bodies while they are still
+    being received
+
+    :copyright: (c) 2015-2017 by Onni Software Ltd.
+    :license: New BSD License
+"""
+from pyexcel_webio._params import (
+    get_file_type, is_ascii_compatible, is_delimited, is_seekable,
+    iget_window, parse_delimited, pop_window)
+
+CHUNK_SIZE = 64 * 1024
+
+
+def is_receiving(params):
+    """
+    Tell if the parameters from :meth:`ExcelInput.get_params` point at
+    a 'csv' or 'tsv' stream that cannot seek, such as a request body,
+    in an encoding that keeps line breaks and quotes as ascii bytes
+    """
+    stream = params.get("file_stream")
+    return (stream is not None and is_delimited(params) and
+            not is_seekable(stream) and is_ascii_compatible(params))
+
+
+def iget_blocks(stream, chunk_size=None, quotechar='"'):
+    """
+    Get a generator of the whole records of delimited content as they
+    are read. Each block ends after a line break that is not inside a
+    quoted field, except the last one, which ends with the stream.
+
+    :param stream: a readable stream of bytes or text
+    :param chunk_size: the most to read at a time
+    :param quotechar: the quote character of the content
+    """
+    read = getattr(stream, "read1", stream.read)
+    pending = None
+    scanned = 0
+    quotes = 0
+    while True:
+        chunk = read(chunk_size or CHUNK_SIZE)
+        if not chunk:
+            break
+        if pending is None:
+            pending = chunk
+            newline, quote = b"\n", quotechar.encode("ascii")
+            if isinstance(chunk, str):
+                newline, quote = "\n", quotechar
+        else:
+            pending += chunk
+        cut, scanned, quotes = _find_cut(pending, scanned, quotes,
+                                         newline, quote)
+        if cut:
+            yield pending[:cut]
+            pending = pending[cut:]
+            scanned -= cut
+    if pending:
+        yield pending
+
+
+def iget_array(params, chunk_size=None):
+    """
+    Get a generator for a list of lists, parsed a block of whole
+    records at a time as the stream is read. The row and column
+    window, such as *start_row* and *row_limit*, is applied once to
+    the rows of the whole stream.
+
+    :param params: the parameters from :meth:`ExcelInput.get_params`
+    :param chunk_size: the most to read from the stream at a time
+    :returns: A generator for a list of lists
+    """
+    params = dict(params)
+    file_type = get_file_type(params)
+    params.pop("file_type", None)
+    window = pop_window(params)
+    stream = params.pop("file_stream")
+    blocks = iget_blocks(stream, chunk_size, params.get("quotechar", '"'))
+    return iget_window(_iget_rows(file_type, blocks, params), window)
+
+
+def _iget_rows(file_type, blocks, keywords):
+    for block in blocks:
+        for row in parse_delimited(file_type, block, keywords):
+            yield row
+
+
+def iget_records(params, chunk_size=None):
+    """
+    Get a generator of records, parsed as :func:`iget_array` does.
+    The first row is taken as the header.
+
+    :param params: the parameters from :meth:`ExcelInput.get_params`
+    :param chunk_size: the most to read from the stream at a time
+    :returns: A generator of dictionaries
+    """
+    rows = iget_array(params, chunk_size)
+    header = next(rows, None)
+    if header is None:
+        return
+    width = len(header)
+    for row in rows:
+        yield dict(zip(header, row + [""] * (width - len(row))))
+
+
+def _find_cut(content, start, quotes, newline, quote):
+    """
+    Scan the line breaks from *start*, counting the quotes before
+    them, for the last one outside quotes
+
+    :returns: the offset after that line break, or 0 if there is
+              none, the offset scanned to and the parity of the
+              quotes counted
+    """
+    cut = 0
+    position = content.find(newline, start)
+    while position != -1:
+        quotes = (quotes + content.count(quote, start, position)) % 2
+        start = position + 1
+        if quotes == 0:
+            cut = start
+        position = content.find(newline, start)
+    return cut, start, quotes
@@ -0,0 +1,107 @@
+"""
+    pyexcel_webio.rows
+    ~~~~~~~~~~~~~~~~~~~
+
+    Compact records that share one header instead of repeating it in
+    a dictionary per row
+
+    :copyright: (c) 2015-2017 by Onni Software Ltd.
+    :license: New BSD License
+"""
+from collections import namedtuple
+
+ROW_TYPES = ("dict", "record", "namedtuple")
+
+
+class Record(tuple):
+    """
+    The values of a row, which can also be read by column name:
+
+        >>> Row = make_row_class(["X", 2019], "record")
+        >>> row = Row._make([1, 2])
+        >>> row[0], row["2019"], row.get("Z", 0)
+        (1, 2, 0)
+
+    Each header gets its own subclass from :func:`make_row_class`, so
+    the column names are stored once for all of its rows.
+    """
+    __slots__ = ()
+    _fields = ()
+    _index = {}
+
+    @classmethod
+    def _make(cls, values):
+        return tuple.__new__(cls, values)
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, slice)):
+            return tuple.__getitem__(self, key)
+        return tuple.__getitem__(self, self._index[key])
+
+    def get(self, key, default=None):
+        index = self._index.get(key)
+        if index is None:
+            return default
+        return tuple.__getitem__(self, index)
+
+    def keys(self):
+        return list(self._fields)
+
+    def values(self):
+        return list(self)
+
+    def items(self):
+        return list(zip(self._fields, self))
+
+    def _asdict(self):
+        return dict(zip(self._fields, self))
+
+    def __repr__(self):
+        return "Record(%s)" % ", ".join(
+            "%r: %r" % item for item in self.items())
+
+
+def make_row_class(header, row_type):
+    """
+    Make the class of the rows under *header*
+
+    :param header: the column names, which are made strings as
+                   :meth:`pyexcel.get_records` makes them
+    :param row_type: 'record' for a :class:`Record` or 'namedtuple'
+                     for a namedtuple. Column names that are not valid
+                     attribute names are renamed to _0, _1 and so on.
+    """
+    header = tuple(str(name) for name in header)
+    if row_type == "record":
+        return type("Record", (Record,), {
+            "__slots__": (),
+            "_fields": header,
+            "_index": dict(
+                (name, index) for index, name in enumerate(header)),
+        })
+    if row_type == "namedtuple":
+        return namedtuple("Row", header, rename=True)
+    raise ValueError("Unknown row type %r, expected one of %s" % (
+        row_type, ", ".join(ROW_TYPES)))
+
+
+def iget_rows(array, row_type):
+    """
+    Get a generator of compact rows out of a list of lists whose
+    first row is the header. Short rows are padded with "" and long
+    ones are cut to the width of the header.
+
+    :param array: an iterable of lists
+    :param row_type: same as :func:`make_row_class`
+    """
+    array = iter(array)
+    header = next(array, None)
+    if header is None:
+        return
+    row_class = make_row_class(header, row_type)
+    width = len(header)
+    for row in array:
+        row = list(row[:width])
+        if len(row) < width:
+            row.extend([""] * (width - len(row)))
+        yield row_class._make(row)
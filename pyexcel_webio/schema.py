@@ -0,0 +1,169 @@
+"""
+    pyexcel_webio.schema
+    ~~~~~~~~~~~~~~~~~~~
+
+    Declared columns, compiled once per upload into a function that
+    turns each row into a tuple of typed values
+
+    :copyright: (c) 2015-2017 by Onni Software Ltd.
+    :license: New BSD License
+"""
+BATCH_SIZE = 1000
+
+
+class Column(object):
+    """
+    A column to be read from an upload
+
+    :param name: the name of the column in the table
+    :param type: a function converting a value, such as int, float or
+                 a date parser. A value that is already of this class
+                 is not converted again. None keeps the value as read.
+    :param source: the name of the column in the header row of the
+                   upload. Defaults to *name*.
+    :param default: the value of an empty cell, or of every row when
+                    the upload does not have the column
+    :param nullable: if False, an empty cell with no *default* is an
+                     error rather than None
+    """
+    def __init__(self, name, type=None, source=None, default=None,
+                 nullable=True):
+        self.name = name
+        self.type = type
+        self.source = name if source is None else source
+        self.default = default
+        self.nullable = nullable
+
+
+class Schema(object):
+    """
+    The columns to read from an upload, in the order of the tuples
+    that :meth:`compile` converts rows to
+
+    :param columns: a list of :class:`Column`
+    """
+    def __init__(self, columns):
+        self.columns = list(columns)
+
+    @property
+    def names(self):
+        return [column.name for column in self.columns]
+
+    def compile(self, header):
+        """
+        Build the converter of the rows under a header row
+
+        The lookup of each column in the header, and the choice of
+        conversion, are made here once, so that converting a row is
+        a single call of a function written for this header.
+
+        :param header: the header row of the upload
+        :returns: a function that takes a row and returns a tuple
+        :raises ValueError: if a column that may not be empty is not
+                            in the header
+        """
+        positions = dict(
+            (name, index) for index, name in reversed(list(
+                enumerate(header))))
+        namespace = {}
+        lines = ["def convert(row):", "    n = len(row)"]
+        for number, column in enumerate(self.columns):
+            value = "c%d" % number
+            namespace["D%d" % number] = column.default
+            namespace["T%d" % number] = column.type
+            namespace["M%d" % number] = "%r may not be empty" % column.name
+            index = positions.get(column.source)
+            if index is None:
+                if column.default is None and not column.nullable:
+                    raise ValueError("The upload has no column %r" %
+                                     column.source)
+                lines.append("    %s = D%d" % (value, number))
+                continue
+            lines.append("    v = row[%d] if n > %d else None" % (
+                index, index))
+            lines.append('    if v is None or v == "":')
+            if column.default is None and not column.nullable:
+                lines.append("        raise ValueError(M%d)" % number)
+            else:
+                lines.append("        %s = D%d" % (value, number))
+            lines.append("    else:")
+            if column.type is None:
+                lines.append("        %s = v" % value)
+            elif isinstance(column.type, type):
+                lines.append(
+                    "        %s = v if v.__class__ is T%d else T%d(v)" % (
+                        value, number, number))
+            else:
+                lines.append("        %s = T%d(v)" % (value, number))
+        lines.append("    return (%s)" % "".join(
+            "c%d, " % number for number in range(len(self.columns))))
+        exec("\n".join(lines), namespace)
+        return _Converter(namespace["convert"], self.columns, positions)
+
+
+def insert(session, table, schema, rows, auto_commit=True,
+           batch_size=None, commit_batches=False):
+    """
+    Insert converted rows in batches of one multi-row insert each
+
+    :param session: a SQLAlchemy session
+    :param table: a SQLAlchemy table, or a mapped class
+    :param schema: a :class:`Schema` whose names are columns of it
+    :param rows: an iterable of rows, the header row first
+    :param auto_commit: commit the inserted rows
+    :param batch_size: the number of rows per insert
+    :param commit_batches: commit after every batch instead of once
+                           all rows are inserted, if *auto_commit*
+    :returns: the number of rows inserted
+    """
+    rows = iter(rows)
+    header = next(rows, None)
+    if header is None:
+        return 0
+    convert = schema.compile(header)
+    statement = getattr(table, "__table__", table).insert()
+    names = schema.names
+    batch_size = batch_size or BATCH_SIZE
+    count = 0
+    batch = []
+    for count, row in enumerate(rows, 1):
+        try:
+            batch.append(dict(zip(names, convert(row))))
+        except (ValueError, TypeError) as error:
+            raise ValueError("Row %d: %s" % (count, convert.explain(
+                row, error)))
+        if len(batch) >= batch_size:
+            session.execute(statement, batch)
+            if auto_commit and commit_batches:
+                session.commit()
+            batch = []
+    if batch:
+        session.execute(statement, batch)
+    if auto_commit:
+        session.commit()
+    return count
+
+
+class _Converter(object):
+    def __init__(self, convert, columns, positions):
+        self.convert = convert
+        self.columns = columns
+        self.positions = positions
+
+    def __call__(self, row):
+        return self.convert(row)
+
+    def explain(self, row, error):
+        """Tell which column the error of a row came from"""
+        for column in self.columns:
+            index = self.positions.get(column.source)
+            if index is None or index >= len(row):
+                continue
+            value = row[index]
+            if value is None or value == "" or column.type is None:
+                continue
+            try:
+                column.type(value)
+            except (ValueError, TypeError) as column_error:
+                return "column %r: %s" % (column.name, column_error)
+        return str(error)
@@ -0,0 +1,149 @@
+"""
+    pyexcel_webio.sinks
+    ~~~~~~~~~~~~~~~~~~~
+
+    Feed uploaded rows in batches to message queues, search indexes,
+    bulk endpoints and the like
+
+    :copyright: (c) 2015-2017 by Onni Software Ltd.
+    :license: New BSD License
+"""
+import time
+import asyncio
+from itertools import islice
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+BATCH_SIZE = 500
+
+StreamSummary = namedtuple("StreamSummary", ["rows", "batches", "retries"])
+StreamSummary.__doc__ = """
+What :meth:`ExcelInput.stream_to` has done
+
+:param rows: the number of rows the sink accepted
+:param batches: the number of batches the sink accepted
+:param retries: the number of times a batch was sent again
+"""
+
+
+def iget_batches(rows, batch_size=None):
+    """
+    Get a generator of lists of at most *batch_size* rows
+    """
+    rows = iter(rows)
+    batch_size = batch_size or BATCH_SIZE
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def stream_to(rows, sink, batch_size=None, max_in_flight=1,
+              retries=0, retry_delay=0):
+    """
+    Send rows in batches to a sink
+
+    :param rows: an iterable of rows
+    :param sink: a function or a coroutine function taking a list
+                 of rows. Coroutine functions run on a new event
+                 loop, so this must not be called from a running one.
+    :param batch_size: the number of rows per batch
+    :param max_in_flight: the most batches the sink may be handling
+                          at the same time. Above 1, a function sink
+                          is called from a thread pool.
+    :param retries: how many times to send a failing batch again
+                    before giving up and raising its error
+    :param retry_delay: the seconds to wait before the first retry,
+                        doubled for each next one
+    :returns: a :class:`StreamSummary`
+    """
+    batches = iget_batches(rows, batch_size)
+    if asyncio.iscoroutinefunction(sink):
+        send = _AsyncSender(sink, retries, retry_delay)
+        return asyncio.run(_stream_async(batches, send, max_in_flight))
+    send = _Sender(sink, retries, retry_delay)
+    if max_in_flight <= 1:
+        return _summarize(send(batch) for batch in batches)
+    return _stream_threaded(batches, send, max_in_flight)
+
+
+def _stream_threaded(batches, send, max_in_flight):
+    results = []
+    pending = set()
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        try:
+            for batch in batches:
+                if len(pending) >= max_in_flight:
+                    done, pending = wait(pending,
+                                         return_when=FIRST_COMPLETED)
+                    results.extend(future.result() for future in done)
+                pending.add(executor.submit(send, batch))
+            results.extend(future.result() for future in pending)
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+    return _summarize(results)
+
+
+async def _stream_async(batches, send, max_in_flight):
+    results = []
+    pending = set()
+    try:
+        for batch in batches:
+            if len(pending) >= max_in_flight:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED)
+                results.extend(task.result() for task in done)
+            pending.add(asyncio.ensure_future(send(batch)))
+        if pending:
+            done, pending = await asyncio.wait(pending)
+            results.extend(task.result() for task in done)
+    except BaseException:
+        for task in pending:
+            task.cancel()
+        raise
+    return _summarize(results)
+
+
+def _summarize(results):
+    rows = batches = retries = 0
+    for batch_rows, batch_retries in results:
+        rows += batch_rows
+        batches += 1
+        retries += batch_retries
+    return StreamSummary(rows=rows, batches=batches, retries=retries)
+
+
+class _Sender(object):
+    def __init__(self, sink, retries, retry_delay):
+        self.sink = sink
+        self.retries = retries
+        self.retry_delay = retry_delay
+
+    def __call__(self, batch):
+        attempt = 0
+        while True:
+            try:
+                self.sink(batch)
+                return len(batch), attempt
+            except Exception:
+                if attempt >= self.retries:
+                    raise
+            time.sleep(self.retry_delay * 2 ** attempt)
+            attempt += 1
+
+
+class _AsyncSender(_Sender):
+    async def __call__(self, batch):
+        attempt = 0
+        while True:
+            try:
+                await self.sink(batch)
+                return len(batch), attempt
+            except Exception:
+                if attempt >= self.retries:
+                    raise
+            await asyncio.sleep(self.retry_delay * 2 ** attempt)
+            attempt += 1
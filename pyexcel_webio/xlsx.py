@@ -0,0 +1,303 @@
+"""
+    pyexcel_webio.xlsx
+    ~~~~~~~~~~~~~~~~~~~
+
+    Write-only xlsx files, written a row at a time into a zip file
+    that is spooled to disk, so that memory use does not grow with
+    the number of rows
+
+    :copyright: (c) 2015-2017 by Onni Software Ltd.
+    :license: New BSD License
+"""
+import re
+import math
+import functools
+import zipfile
+import datetime
+import tempfile
+from decimal import Decimal
+from itertools import chain, islice
+from xml.sax.saxutils import escape, quoteattr
+
+FILE_TYPE = "xlsx"
+MAX_ROWS = 1048576
+SPOOL_SIZE = 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+_BUFFERED_ROWS = 1000
+_END = object()
+_EPOCH = datetime.datetime(1899, 12, 30)
+_ILLEGAL_CHARACTERS = re.compile(u"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_ILLEGAL_SHEET_CHARACTERS = re.compile(r"[\[\]:*?/\\]")
+
+_DATE_STYLE = 1
+_DATETIME_STYLE = 2
+_TIME_STYLE = 3
+
+_XML = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_PACKAGE_RELATIONSHIPS = (
+    "http://schemas.openxmlformats.org/package/2006/relationships")
+_RELATIONSHIPS = (
+    "http://schemas.openxmlformats.org/officeDocument/2006/relationships")
+_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.%s+xml"
+_STYLES = _XML + (
+    '<styleSheet xmlns="%s">'
+    '<numFmts count="1">'
+    '<numFmt numFmtId="164" formatCode="yyyy-mm-dd hh:mm:ss"/>'
+    '</numFmts>'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font>'
+    '</fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/>'
+    '<diagonal/></border></borders>'
+    '<cellStyleXfs count="1">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="4">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0"'
+    ' applyNumberFormat="1"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0"'
+    ' applyNumberFormat="1"/>'
+    '<xf numFmtId="21" fontId="0" fillId="0" borderId="0" xfId="0"'
+    ' applyNumberFormat="1"/>'
+    '</cellXfs>'
+    '<cellStyles count="1">'
+    '<cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>') % _MAIN
+
+
+def save_to_file(sheets, spool_size=None):
+    """
+    Write an xlsx file of one or more sheets
+
+    Strings are written inline rather than into a shared string
+    table, so nothing is kept per row. A sheet with more rows than
+    an xlsx sheet can hold goes on in another sheet, named after it
+    with " (2)", " (3)" and so on.
+
+    :param sheets: an iterable of (sheet name, rows) pairs. The rows
+                   may be any iterable of lists, such as a generator.
+    :param spool_size: the size above which the file is spooled to
+                       disk rather than kept in memory
+    :returns: the file, positioned at its start
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=spool_size or SPOOL_SIZE)
+    try:
+        with zipfile.ZipFile(spool, "w", zipfile.ZIP_DEFLATED) as xlsx:
+            names = []
+            for name, rows in sheets:
+                rows = iter(rows)
+                part = 1
+                while True:
+                    names.append(_sheet_name(name, part, names))
+                    _write_sheet(xlsx, len(names), islice(rows, MAX_ROWS))
+                    following = next(rows, _END)
+                    if following is _END:
+                        break
+                    rows = chain([following], rows)
+                    part += 1
+            if not names:
+                names.append(_sheet_name("pyexcel_sheet1", 1, names))
+                _write_sheet(xlsx, 1, [])
+            _write_package(xlsx, names)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+
+def iget_chunks(f, chunk_size=None):
+    """
+    Get a generator of the content of a file, closing it at the end
+    """
+    try:
+        while True:
+            chunk = f.read(chunk_size or CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        f.close()
+
+
+def render(sheets, spool_size=None):
+    """
+    Write an xlsx file as :func:`save_to_file` does
+
+    :returns: a generator of the bytes of the file
+    """
+    return iget_chunks(save_to_file(sheets, spool_size))
+
+
+def sheet_part_name(number):
+    """The name in the zip file of the *number*-th worksheet"""
+    return "xl/worksheets/sheet%d.xml" % number
+
+
+def split_sheets(sheets):
+    """
+    Name the sheets of an xlsx file, splitting the ones with more
+    rows than a sheet can hold as :func:`save_to_file` does
+
+    :param sheets: an iterable of (sheet name, list of rows) pairs
+    :returns: a list of (xlsx sheet name, list of rows) pairs
+    """
+    names = []
+    parts = []
+    for name, rows in sheets:
+        starts = range(0, len(rows), MAX_ROWS) or [0]
+        for part, start in enumerate(starts, 1):
+            names.append(_sheet_name(name, part, names))
+            parts.append((names[-1], rows[start:start + MAX_ROWS]))
+    return parts
+
+
+def iget_sheet_xml(rows):
+    """
+    Get a generator of the utf-8 encoded xml of a worksheet
+
+    :param rows: an iterable of at most :data:`MAX_ROWS` rows
+    """
+    yield (_XML + '<worksheet xmlns="%s"><sheetData>' % _MAIN).encode(
+        "utf-8")
+    buffered = []
+    for row_number, row in enumerate(rows, 1):
+        buffered.append(_row(row_number, row))
+        if len(buffered) >= _BUFFERED_ROWS:
+            yield "".join(buffered).encode("utf-8")
+            buffered = []
+    yield ("".join(buffered) + "</sheetData></worksheet>").encode("utf-8")
+
+
+def package_parts(names):
+    """
+    :param names: the names of the sheets
+    :returns: a list of (part name, utf-8 encoded xml) pairs of the
+              parts of an xlsx file other than its worksheets
+    """
+    sheets = range(1, len(names) + 1)
+    parts = [
+        ("[Content_Types].xml", _XML + (
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/'
+            'content-types">'
+            '<Default Extension="rels" ContentType="application/'
+            'vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" ContentType="%s"/>'
+            '<Override PartName="/xl/styles.xml" ContentType="%s"/>'
+            '%s</Types>') % (
+                _CONTENT_TYPE % "spreadsheetml.sheet.main",
+                _CONTENT_TYPE % "spreadsheetml.styles",
+                "".join(
+                    '<Override PartName="/%s" ContentType="%s"/>' % (
+                        sheet_part_name(number),
+                        _CONTENT_TYPE % "spreadsheetml.worksheet")
+                    for number in sheets))),
+        ("_rels/.rels", _XML + (
+            '<Relationships xmlns="%s">'
+            '<Relationship Id="rId1" Type="%s/officeDocument"'
+            ' Target="xl/workbook.xml"/></Relationships>') % (
+                _PACKAGE_RELATIONSHIPS, _RELATIONSHIPS)),
+        ("xl/workbook.xml", _XML + (
+            '<workbook xmlns="%s" xmlns:r="%s"><sheets>%s</sheets>'
+            '</workbook>') % (_MAIN, _RELATIONSHIPS, "".join(
+                '<sheet name=%s sheetId="%d" r:id="rId%d"/>' % (
+                    quoteattr(name), number, number)
+                for number, name in zip(sheets, names)))),
+        ("xl/_rels/workbook.xml.rels", _XML + (
+            '<Relationships xmlns="%s">%s'
+            '<Relationship Id="rId%d" Type="%s/styles"'
+            ' Target="styles.xml"/></Relationships>') % (
+                _PACKAGE_RELATIONSHIPS,
+                "".join(
+                    '<Relationship Id="rId%d" Type="%s/worksheet"'
+                    ' Target="worksheets/sheet%d.xml"/>' % (
+                        number, _RELATIONSHIPS, number)
+                    for number in sheets),
+                len(names) + 1, _RELATIONSHIPS)),
+        ("xl/styles.xml", _STYLES),
+    ]
+    return [(name, xml.encode("utf-8")) for name, xml in parts]
+
+
+def _write_sheet(xlsx, number, rows):
+    info = zipfile.ZipInfo(sheet_part_name(number))
+    info.compress_type = zipfile.ZIP_DEFLATED
+    with xlsx.open(info, "w", force_zip64=True) as part:
+        for chunk in iget_sheet_xml(rows):
+            part.write(chunk)
+
+
+def _row(row_number, row):
+    cells = [
+        _cell("%s%d" % (_column_name(column), row_number), value)
+        for column, value in enumerate(row)
+        if value is not None and value != ""
+    ]
+    return '<row r="%d">%s</row>' % (row_number, "".join(cells))
+
+
+def _cell(reference, value):
+    if isinstance(value, bool):
+        return '<c r="%s" t="b"><v>%d</v></c>' % (reference, value)
+    if isinstance(value, (int, float, Decimal)):
+        if isinstance(value, float) and (math.isnan(value) or
+                                         math.isinf(value)):
+            return _string_cell(reference, str(value))
+        return '<c r="%s"><v>%s</v></c>' % (reference, _number(value))
+    if isinstance(value, datetime.datetime):
+        days = (value.replace(tzinfo=None) - _EPOCH).total_seconds() / 86400
+        return '<c r="%s" s="%d"><v>%r</v></c>' % (
+            reference, _DATETIME_STYLE, days)
+    if isinstance(value, datetime.date):
+        return '<c r="%s" s="%d"><v>%d</v></c>' % (
+            reference, _DATE_STYLE, (value - _EPOCH.date()).days)
+    if isinstance(value, datetime.time):
+        seconds = (value.hour * 3600 + value.minute * 60 + value.second +
+                   value.microsecond / 1000000.0)
+        return '<c r="%s" s="%d"><v>%r</v></c>' % (
+            reference, _TIME_STYLE, seconds / 86400)
+    if isinstance(value, bytes):
+        value = value.decode("utf-8", "replace")
+    return _string_cell(reference, str(value))
+
+
+def _string_cell(reference, text):
+    return ('<c r="%s" t="inlineStr"><is><t xml:space="preserve">%s'
+            '</t></is></c>' % (
+                reference, escape(_ILLEGAL_CHARACTERS.sub("", text))))
+
+
+def _number(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+@functools.lru_cache(maxsize=None)
+def _column_name(index):
+    name = ""
+    number = index + 1
+    while number:
+        number, remainder = divmod(number - 1, 26)
+        name = chr(65 + remainder) + name
+    return name
+
+
+def _sheet_name(name, part, taken):
+    name = _ILLEGAL_SHEET_CHARACTERS.sub("_", str(name or "")) or "Sheet"
+    suffix = "" if part == 1 else " (%d)" % part
+    candidate = name[:31 - len(suffix)] + suffix
+    number = 1
+    while candidate.lower() in [sheet.lower() for sheet in taken]:
+        number += 1
+        suffix = " (%d)" % number
+        candidate = name[:31 - len(suffix)] + suffix
+    return candidate
+
+
+def _write_package(xlsx, names):
+    for name, xml in package_parts(names):
+        xlsx.writestr(name, xml)
@@ -0,0 +1,201 @@
+"""
+    pyexcel_webio.zipstream
+    ~~~~~~~~~~~~~~~~~~~
+
+    Stream 'csvz' and 'tsvz' archives, a sheet per entry, while the
+    rows of each sheet are being written
+
+    :copyright: (c) 2015-2017 by Onni Software Ltd.
+    :license: New BSD License
+"""
+import io
+import csv
+import time
+import zlib
+import struct
+import zipfile
+from collections import namedtuple
+
+FILE_TYPES = ("csvz", "tsvz")
+#: the ``dest_`` keywords that are streamed: the options of
+#: :func:`csv.writer` and the encoding of the entries
+WRITER_OPTIONS = (
+    "dialect", "delimiter", "quotechar", "escapechar", "doublequote",
+    "skipinitialspace", "lineterminator", "quoting", "strict", "encoding")
+CHUNK_SIZE = 64 * 1024
+_BUFFERED_ROWS = 1000
+_ZIP_LIMIT = 0xFFFFFFFF
+_UTF8_NAME = 0x800
+_MADE_ON_UNIX = 3 << 8 | 20
+
+DeflatedEntry = namedtuple("DeflatedEntry", ["name", "crc", "size", "data"])
+DeflatedEntry.__doc__ = """
+A zip entry compressed ahead of being put in an archive by
+:func:`assemble`
+"""
+
+
+def is_supported(file_type, keywords):
+    """
+    Tell if an archive of the file type could be streamed
+
+    :param keywords: the keywords for :meth:`pyexcel.save_book_as`.
+                     Only the :data:`WRITER_OPTIONS`, prefixed with
+                     ``dest_``, are supported.
+    """
+    if file_type not in FILE_TYPES:
+        return False
+    return all(key.startswith("dest_") and
+               key[len("dest_"):] in WRITER_OPTIONS for key in keywords)
+
+
+def render(sheets, file_type, chunk_size=None, **keywords):
+    """
+    Write each sheet as a zip entry, compressing its rows as they
+    come, and hand out the bytes of the archive as they are ready
+
+    The archive is written without seeking back, so the size of each
+    entry goes in a data descriptor after it.
+
+    :param sheets: an iterable of (sheet name, rows) pairs. The rows
+                   may be any iterable of lists, such as a generator.
+    :param file_type: 'csvz' or 'tsvz'
+    :param chunk_size: the bytes to gather before handing them out
+    :param keywords: the ``dest_`` keywords of :meth:`pyexcel.save_as`
+                     that are :data:`WRITER_OPTIONS`
+    :returns: a generator of the bytes of the archive
+    """
+    chunk_size = chunk_size or CHUNK_SIZE
+    options = csv_options(file_type, keywords)
+    extension = file_type[:3]
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, rows in sheets:
+            info = zipfile.ZipInfo("%s.%s" % (name, extension),
+                                   date_time=time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with archive.open(info, "w", force_zip64=True) as entry:
+                for chunk in iget_csv(rows, options):
+                    entry.write(chunk)
+                    if sink.size >= chunk_size:
+                        yield sink.take()
+            if sink.size >= chunk_size:
+                yield sink.take()
+    if sink.size:
+        yield sink.take()
+
+
+def csv_options(file_type, keywords):
+    """
+    The options of :func:`iget_csv` from the ``dest_`` keywords: those
+    of :func:`csv.writer`, and the encoding
+    """
+    options = dict((key[len("dest_"):], value)
+                   for key, value in keywords.items())
+    if file_type == "tsvz":
+        options.setdefault("dialect", "excel-tab")
+    return options
+
+
+def iget_csv(rows, options):
+    """
+    Get a generator of the encoded csv of the rows, a batch of rows
+    at a time
+
+    :param options: the options of :func:`csv.writer`, and the
+                    encoding, which defaults to utf-8
+    """
+    options = dict(options)
+    encoding = options.pop("encoding", None) or "utf-8"
+    text = io.StringIO()
+    writer = csv.writer(text, **options)
+    for index, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if index % _BUFFERED_ROWS == 0:
+            yield text.getvalue().encode(encoding)
+            text.seek(0)
+            text.truncate()
+    yield text.getvalue().encode(encoding)
+
+
+def deflate(name, chunks):
+    """
+    Compress the content of a zip entry
+
+    :param name: the name of the entry
+    :param chunks: an iterable of the bytes of its content
+    :returns: a :class:`DeflatedEntry`
+    """
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION,
+                                  zlib.DEFLATED, -15)
+    crc = size = 0
+    data = []
+    for chunk in chunks:
+        crc = zlib.crc32(chunk, crc)
+        size += len(chunk)
+        data.append(compressor.compress(chunk))
+    data.append(compressor.flush())
+    return DeflatedEntry(name, crc, size, b"".join(data))
+
+
+def assemble(entries):
+    """
+    Put compressed entries in a zip archive, in the given order
+
+    :param entries: an iterable of :class:`DeflatedEntry`
+    :returns: the bytes of the archive
+    """
+    entries = list(entries)
+    now = time.localtime()
+    dos_time = now.tm_hour << 11 | now.tm_min << 5 | now.tm_sec // 2
+    dos_date = (now.tm_year - 1980) << 9 | now.tm_mon << 5 | now.tm_mday
+    archive = []
+    directory = []
+    offset = 0
+    for entry in entries:
+        if max(entry.size, len(entry.data), offset) >= _ZIP_LIMIT:
+            raise ValueError("The archive is too large to be assembled")
+        name = entry.name.encode("utf-8")
+        flags = 0 if name.isascii() else _UTF8_NAME
+        fields = (flags, zipfile.ZIP_DEFLATED, dos_time, dos_date,
+                  entry.crc, len(entry.data), entry.size, len(name))
+        header = struct.pack("<IHHHHHIIIHH", 0x04034b50, 20, *fields + (0,))
+        directory.append(struct.pack(
+            "<IHHHHHHIIIHHHHHII", 0x02014b50, _MADE_ON_UNIX, 20,
+            *fields + (0, 0, 0, 0, 0o600 << 16, offset)) + name)
+        archive.extend((header, name, entry.data))
+        offset += len(header) + len(name) + len(entry.data)
+    directory = b"".join(directory)
+    archive.append(directory)
+    archive.append(struct.pack("<IHHHHIIH", 0x06054b50, 0, 0,
+                               len(entries), len(entries),
+                               len(directory), offset, 0))
+    return b"".join(archive)
+
+
+class _Sink(io.RawIOBase):
+    """A write-only stream that cannot seek, which zipfile notices"""
+    def __init__(self):
+        io.RawIOBase.__init__(self)
+        self._chunks = []
+        self._position = 0
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        self.size += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def take(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        self.size = 0
+        return data
@@ -60,16 +60,15 @@ CLASSIFIERS = [
     'Topic :: Internet :: WWW/HTTP',
     'Topic :: Software Development :: Libraries :: Python Modules',
     'Development Status :: 3 - Alpha',
-    'Programming Language :: Python :: 2',
-    'Programming Language :: Python :: 2.6',
-    'Programming Language :: Python :: 2.7',
     'Programming Language :: Python :: 3',
-    'Programming Language :: Python :: 3.3',
-    'Programming Language :: Python :: 3.4',
-    'Programming Language :: Python :: 3.5',
+    'Programming Language :: Python :: 3 :: Only',
+    'Programming Language :: Python :: 3.7',
+    'Programming Language :: Python :: 3.8',
     'Programming Language :: Python :: Implementation :: PyPy'
 ]
 
+PYTHON_REQUIRES = ">=3.7"
+
 
 INSTALL_REQUIRES = [
     "pyexcel>=0.5.6",
@@ -205,6 +204,7 @@ if __name__ == "__main__":
         extras_require=EXTRAS_REQUIRE,
         tests_require=["nose"],
         install_requires=INSTALL_REQUIRES,
+        python_requires=PYTHON_REQUIRES,
         packages=PACKAGES,
         include_package_data=True,
         zip_safe=False,
@@ -0,0 +1,168 @@
+import shutil
+import tempfile
+import threading
+
+import pyexcel_webio as webio
+from pyexcel_webio import admission
+from pyexcel_webio.admission import AdmissionControl, Overloaded, LARGE_COST
+from common import TestInput
+from nose.tools import raises, eq_
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+CONTENT = b"X,Y\n1,2\n3,4\n"
+
+
+class TestAdmissionControl:
+    def setUp(self):
+        self.control = AdmissionControl(small_budget=2, large_budget=8,
+                                        timeout=0)
+
+    def test_estimate(self):
+        eq_(self.control.estimate("csv", size=10), 1)
+        eq_(self.control.estimate("xlsx", size=2 * 1024 * 1024), 8)
+        eq_(self.control.estimate("csv", rows=25000), 3)
+        eq_(self.control.estimate("ods", rows=1), 6)
+        eq_(self.control.estimate("csv"), LARGE_COST)
+
+    def test_lanes(self):
+        large = self.control.admit("xlsx", size=2 * 1024 * 1024)
+        eq_(self.control.large.used, 8)
+        with self.control.admit("csv", size=10):
+            eq_(self.control.small.used, 1)
+        eq_(self.control.small.used, 0)
+        large.release()
+        large.release()
+        eq_(self.control.large.used, 0)
+
+    def test_cost_is_capped_by_the_lane(self):
+        with self.control.admit("xlsx", size=100 * 1024 * 1024):
+            eq_(self.control.large.used, 8)
+
+    @raises(Overloaded)
+    def test_fail_fast(self):
+        self.control.admit("csv", size=10)
+        self.control.admit("csv", size=10)
+        self.control.admit("csv", size=10)
+
+    def test_retry_after(self):
+        self.control.small.seconds = 2.5
+        self.control.admit("csv", size=1024 * 1024 * 2)
+        try:
+            self.control.admit("csv", size=10)
+        except Overloaded as error:
+            eq_(error.retry_after, 3)
+        else:
+            assert False, "Overloaded expected"
+
+    def test_queueing(self):
+        control = AdmissionControl(small_budget=1)
+        ticket = control.admit("csv", size=10)
+        admitted = []
+
+        def queued():
+            with control.admit("csv", size=10):
+                admitted.append(True)
+
+        thread = threading.Thread(target=queued)
+        thread.start()
+        thread.join(0.1)
+        eq_(admitted, [])
+        ticket.release()
+        thread.join()
+        eq_(admitted, [True])
+
+
+class TestAdmitted:
+    def setUp(self):
+        self.control = AdmissionControl()
+        self.response_func = webio.__excel_response_func__
+        webio.init_webio(lambda content, **keywords: content)
+        admission.init_admission(self.control)
+
+    def tearDown(self):
+        admission.init_admission(None)
+        webio.init_webio(self.response_func)
+
+    def test_upload(self):
+        with mock.patch.object(self.control, "admit",
+                               wraps=self.control.admit) as admit:
+            TestInput().get_records(file_type="csv", file_content=CONTENT)
+        admit.assert_called_once_with("csv", size=len(CONTENT))
+        eq_(self.control.small.used, 0)
+
+    def test_download(self):
+        with mock.patch.object(self.control, "admit",
+                               wraps=self.control.admit) as admit:
+            webio.make_response_from_array([[1, 2], [3, 4]], "xls")
+        admit.assert_called_once_with("xls", rows=2)
+        eq_(self.control.small.used, 0)
+
+    def test_nested_calls_are_admitted_once(self):
+        sheet = TestInput().get_sheet(file_type="csv", file_content=CONTENT)
+        with mock.patch.object(self.control, "admit",
+                               wraps=self.control.admit) as admit:
+            webio.make_response(sheet, "csv")
+        eq_(admit.call_count, 1)
+
+    @raises(Overloaded)
+    def test_overloaded(self):
+        control = AdmissionControl(small_budget=1, timeout=0)
+        admission.init_admission(control)
+        control.admit("csv", size=10)
+        TestInput().get_array(file_type="csv", file_content=CONTENT)
+
+    def test_released_after_failure(self):
+        try:
+            TestInput().get_array(file_type="unknown", file_content=CONTENT)
+        except Exception:
+            pass
+        eq_(self.control.small.used, 0)
+        eq_(self.control.large.used, 0)
+
+    def test_held_while_lazy_content_is_rendered(self):
+        content = webio.make_response_from_records(
+            [{"X": 1}, {"X": 2}], "ndjson")
+        eq_(self.control.small.used, 1)
+        eq_(b"".join(content), b'{"X": 1}\n{"X": 2}\n')
+        eq_(self.control.small.used, 0)
+
+    def test_released_when_lazy_content_is_closed(self):
+        content = webio.make_response_from_records(
+            [{"X": 1}, {"X": 2}], "ndjson")
+        next(content)
+        content.close()
+        eq_(self.control.small.used, 0)
+
+    def test_held_while_records_are_iterated(self):
+        records = TestInput().iget_records(file_type="csv",
+                                           file_content=CONTENT)
+        eq_(self.control.small.used, 1)
+        eq_(len(list(records)), 2)
+        eq_(self.control.small.used, 0)
+
+    def test_stream_to(self):
+        used = []
+
+        def sink(batch):
+            used.append(self.control.small.used)
+        summary = TestInput().stream_to(sink, file_type="csv",
+                                        file_content=CONTENT)
+        eq_(summary.rows, 2)
+        eq_(used, [1])
+        eq_(self.control.small.used, 0)
+
+    def test_save_to_index(self):
+        directory = tempfile.mkdtemp()
+        try:
+            with mock.patch.object(self.control, "admit",
+                                   wraps=self.control.admit) as admit:
+                TestInput().save_to_index(directory, file_type="csv",
+                                          file_content=CONTENT)
+        finally:
+            shutil.rmtree(directory)
+        admit.assert_called_once_with("csv", size=len(CONTENT))
+        eq_(self.control.small.used, 0)
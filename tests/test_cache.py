@@ -0,0 +1,309 @@
+import io
+import os
+import time
+import shutil
+import multiprocessing
+import tempfile
+import threading
+
+import pyexcel as pe
+import pyexcel_webio as webio
+from pyexcel_webio import cache
+from common import TestExtendedInput
+from db import Session, Base, Signature, engine
+from nose.tools import raises, eq_
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+class TestSingleFlight:
+    def setUp(self):
+        self.single_flight = cache.SingleFlight()
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def render(self):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        return b"content"
+
+    def test_concurrent_calls_share_one_result(self):
+        results = []
+
+        def request():
+            results.append(self.single_flight.do("key", self.render))
+
+        leader = threading.Thread(target=request)
+        leader.start()
+        self.started.wait(5)
+        followers = [threading.Thread(target=request) for _ in range(5)]
+        for follower in followers:
+            follower.start()
+        self.release.set()
+        for thread in [leader] + followers:
+            thread.join(5)
+        eq_(self.calls, 1)
+        eq_(results, [b"content"] * 6)
+
+    def test_sequential_calls_run_again(self):
+        self.release.set()
+        self.single_flight.do("key", self.render)
+        self.single_flight.do("key", self.render)
+        eq_(self.calls, 2)
+
+    @raises(ValueError)
+    def test_error_is_raised(self):
+        def broken():
+            raise ValueError("boom")
+        self.single_flight.do("key", broken)
+
+
+class TestExportKey:
+    def setUp(self):
+        self.responses = []
+        self.response_func = webio.__excel_response_func__
+        webio.init_webio(self.collect_response)
+        Base.metadata.drop_all(engine)
+        Base.metadata.create_all(engine)
+        self.session = Session()
+        self.session.add(Signature(X=1, Y=2, Z=3))
+        self.session.commit()
+
+    def collect_response(self, content, content_type=None, status=200,
+                         file_name=None):
+        self.responses.append(content)
+
+    def test_make_response_from_a_table(self):
+        webio.make_response_from_a_table(
+            self.session, Signature, "csv", export_key="report")
+        eq_(self.responses, ["X,Y,Z\r\n1,2,3\r\n"])
+
+    def test_make_response_from_tables(self):
+        webio.make_response_from_tables(
+            self.session, [Signature], "xls", export_key="report")
+        book = pe.get_book(file_type="xls", file_content=self.responses[0])
+        eq_(book.signature.to_array(), [["X", "Y", "Z"], [1, 2, 3]])
+
+    def tearDown(self):
+        self.session.close()
+        webio.init_webio(self.response_func)
+
+
+class TestSnapshots:
+    def setUp(self):
+        self.responses = []
+        self.response_func = webio.__excel_response_func__
+        webio.init_webio(self.collect_response)
+        Base.metadata.drop_all(engine)
+        Base.metadata.create_all(engine)
+        self.session = Session()
+        self.session.add(Signature(X=1, Y=2, Z=3))
+        self.session.commit()
+        self.directory = tempfile.mkdtemp()
+
+    def collect_response(self, content, content_type=None, status=200,
+                         file_name=None):
+        self.responses.append(content)
+
+    def test_tables_version(self):
+        version = cache.tables_version(self.session, [Signature])
+        eq_(version, ((1,),))
+
+    def test_memory_snapshot(self):
+        self.verify_snapshots(cache.SnapshotStore())
+
+    def test_memory_snapshot_size_limit(self):
+        store = cache.SnapshotStore(max_size=250)
+        store.put("a", 1, b"x" * 100)
+        store.put("b", 1, b"y" * 100)
+        store.get("a")
+        store.put("c", 1, u"z" * 100)
+        eq_(store.get("b"), None)
+        eq_(store.get("a"), (1, b"x" * 100))
+        eq_(store.get("c"), (1, u"z" * 100))
+        store.put("a", 2, b"x" * 300)
+        eq_(store.get("a"), None)
+        eq_(store._size, 100)
+
+    def test_file_snapshot(self):
+        self.verify_snapshots(cache.FileSnapshotStore(self.directory))
+
+    def test_file_snapshot_is_persistent(self):
+        cache.FileSnapshotStore(self.directory).put("key", 1, u"a,b")
+        store = cache.FileSnapshotStore(self.directory)
+        eq_(store.get("key"), (1, u"a,b"))
+        eq_(store.get("unknown"), None)
+
+    def test_file_snapshot_size_limit(self):
+        store = cache.FileSnapshotStore(self.directory, max_size=250)
+        store.put("a", 1, b"x" * 100)
+        past = time.time() - 60
+        os.utime(store._path("a") + ".data", (past, past))
+        store.put("b", 1, b"y" * 100)
+        os.utime(store._path("b") + ".data", (past + 1, past + 1))
+        store.get("a")
+        store.put("c", 1, b"z" * 100)
+        eq_(store.get("b"), None)
+        assert not os.path.exists(store._path("b") + ".version")
+        eq_(store.get("a"), (1, b"x" * 100))
+        eq_(store.get("c"), (1, b"z" * 100))
+
+    def test_shared_snapshot(self):
+        self.verify_snapshots(cache.SharedSnapshotStore(self.directory))
+
+    def test_shared_snapshot_is_seen_by_other_stores(self):
+        cache.SharedSnapshotStore(self.directory).put("key", 1, b"a,b")
+        store = cache.SharedSnapshotStore(self.directory)
+        eq_(store.get("key"), (1, b"a,b"))
+        store.put("key", 2, u"c,d")
+        eq_(cache.SharedSnapshotStore(self.directory).get("key"),
+            (2, u"c,d"))
+        eq_(store.get("unknown"), None)
+
+    def test_truncated_shared_snapshot_is_a_miss(self):
+        store = cache.SharedSnapshotStore(self.directory)
+        with open(store._path("key") + ".snapshot", "wb") as f:
+            f.write(b"\x00")
+        eq_(store.get("key"), None)
+
+    def test_shared_snapshot_size_limit(self):
+        store = cache.SharedSnapshotStore(self.directory, max_size=250)
+        store.put("a", 1, b"x" * 100)
+        past = time.time() - 60
+        os.utime(store._path("a") + ".snapshot", (past, past))
+        store.put("b", 1, b"y" * 100)
+        os.utime(store._path("b") + ".snapshot", (past + 1, past + 1))
+        store.get("a")
+        store.put("c", 1, b"z" * 100)
+        eq_(store.get("b"), None)
+        eq_(store.get("a"), (1, b"x" * 100))
+        eq_(store.get("c"), (1, b"z" * 100))
+
+    def test_shared_snapshot_is_rendered_once_per_host(self):
+        if cache.fcntl is None:
+            return
+        context = multiprocessing.get_context("fork")
+        processes = [
+            context.Process(target=_render_shared, args=(self.directory,))
+            for _ in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        with open(os.path.join(self.directory, "renders")) as f:
+            eq_(f.read(), "x")
+        eq_(cache.SharedSnapshotStore(self.directory).get("key"),
+            (1, b"content"))
+
+    def test_snapshot_of_a_table(self):
+        store = cache.SnapshotStore()
+        for _ in range(2):
+            webio.make_response_from_a_table(
+                self.session, Signature, "csv", snapshot_store=store,
+                snapshot_version=self.fixed_version)
+        eq_(len(store._snapshots), 1)
+
+    def fixed_version(self, session, tables):
+        return 1
+
+    def verify_snapshots(self, store):
+        def respond():
+            webio.make_response_from_tables(
+                self.session, [Signature], "csv", snapshot_store=store,
+                snapshot_version=self.fixed_version)
+
+        respond()
+        self.session.add(Signature(X=4, Y=5, Z=6))
+        self.session.commit()
+        respond()
+        eq_(self.responses[1], self.responses[0])
+        self.fixed_version = cache.tables_version
+        respond()
+        assert "4,5,6" in self.responses[2]
+
+    def tearDown(self):
+        self.session.close()
+        webio.init_webio(self.response_func)
+        shutil.rmtree(self.directory)
+
+
+def _render_shared(directory):
+    def render():
+        with open(os.path.join(directory, "renders"), "a") as f:
+            f.write("x")
+        time.sleep(0.2)
+        return b"content"
+
+    cache.SharedSnapshotStore(directory).render("key", 1, render)
+
+
+class CachedInput(TestExtendedInput):
+    parse_cache = None
+
+
+class TestParseCache:
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.content = b"X,Y\n1,2\n3,4\n"
+
+    def tearDown(self):
+        CachedInput.parse_cache = None
+        shutil.rmtree(self.directory)
+
+    def upload(self, content=None):
+        return ("csv", io.BytesIO(content or self.content))
+
+    def test_repeat_upload_is_not_parsed(self):
+        CachedInput.parse_cache = cache.ParseCache()
+        myinput = CachedInput()
+        first = myinput.get_records(field_name=self.upload())
+        with mock.patch("pyexcel.get_records") as get_records:
+            second = myinput.get_records(field_name=self.upload())
+            assert not get_records.called
+        eq_(second, first)
+        second.append("changed")
+        eq_(myinput.get_records(field_name=self.upload()), first)
+
+    def test_key_covers_content_and_keywords(self):
+        parse_cache = cache.ParseCache()
+        params = {"file_type": "csv", "file_content": self.content}
+        key = parse_cache.make_key("get_array", params)
+        eq_(key, parse_cache.make_key("get_array", dict(params)))
+        assert key != parse_cache.make_key(
+            "get_array", dict(params, file_content=b"X\n"))
+        assert key != parse_cache.make_key(
+            "get_array", dict(params, delimiter=";"))
+        assert key != parse_cache.make_key("get_records", params)
+        eq_(parse_cache.make_key("get_array", {"array": []}), None)
+
+    def test_size_limit(self):
+        parse_cache = cache.ParseCache(max_size=200)
+        parse_cache.put("a", "x" * 100)
+        parse_cache.put("b", "y" * 100)
+        eq_(parse_cache.get("a"), None)
+        eq_(parse_cache.get("b"), "y" * 100)
+
+    def test_ttl(self):
+        parse_cache = cache.ParseCache(ttl=-1)
+        parse_cache.put("a", [1])
+        eq_(parse_cache.get("a"), None)
+
+    def test_disk_tier(self):
+        CachedInput.parse_cache = cache.ParseCache(directory=self.directory)
+        array = CachedInput().get_array(field_name=self.upload())
+        CachedInput.parse_cache = cache.ParseCache(directory=self.directory)
+        with mock.patch("pyexcel.get_array") as get_array:
+            eq_(CachedInput().get_array(field_name=self.upload()), array)
+            assert not get_array.called
+
+    def test_disk_size_limit(self):
+        parse_cache = cache.ParseCache(directory=self.directory,
+                                       max_disk_size=150)
+        parse_cache.put("a", "x" * 100)
+        parse_cache.put("b", "y" * 100)
+        eq_(os.listdir(self.directory), ["b.parse"])
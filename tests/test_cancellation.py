@@ -0,0 +1,144 @@
+import pyexcel as pe
+import pyexcel_webio as webio
+from pyexcel_webio import cancellation
+from pyexcel_webio.cancellation import CancelToken, Cancelled
+from common import TestInput
+from db import Session, Base, Signature, Signature2, engine
+from nose.tools import raises, eq_
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+CONTENT = b"X,Y,Z\n1,2,3\n4,5,6\n7,8,9\n"
+
+
+class TestCancelToken:
+    def test_cancel(self):
+        token = CancelToken()
+        assert not token.cancelled
+        token.cancel()
+        assert token.cancelled
+        eq_(token.reason, "cancelled")
+
+    def test_deadline(self):
+        token = cancellation.get_token(0)
+        assert token.cancelled
+        eq_(token.reason, "deadline exceeded")
+        assert not CancelToken(timeout=60).cancelled
+
+    def test_disconnected(self):
+        disconnected = []
+        token = CancelToken(is_disconnected=lambda: bool(disconnected))
+        assert not token.cancelled
+        disconnected.append(True)
+        assert token.cancelled
+        eq_(token.reason, "client disconnected")
+
+    def test_iget_checked(self):
+        token = CancelToken()
+        seen = []
+        rows = cancellation.iget_checked(range(10), token, check_every=2)
+        try:
+            for row in rows:
+                seen.append(row)
+                if row == 2:
+                    token.cancel()
+        except Cancelled:
+            pass
+        eq_(seen, [0, 1, 2, 3])
+
+    def test_no_token(self):
+        rows = [1, 2]
+        assert cancellation.iget_checked(rows, None) is rows
+
+
+class TestCancelledIngest:
+    def setUp(self):
+        Base.metadata.drop_all(engine)
+        Base.metadata.create_all(engine)
+        self.session = Session()
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_isave_to_database(self):
+        TestInput().isave_to_database(
+            session=self.session, table=Signature, file_type="csv",
+            file_content=CONTENT, cancel=CancelToken())
+        eq_(self.session.query(Signature).count(), 3)
+
+    @raises(Cancelled)
+    def test_cancelled_isave_to_database(self):
+        token = CancelToken()
+        token.cancel()
+        TestInput().isave_to_database(
+            session=self.session, table=Signature, file_type="csv",
+            file_content=CONTENT, cancel=token)
+
+    def test_cancelled_stream_to(self):
+        token = CancelToken()
+        batches = []
+
+        def sink(batch):
+            batches.append(batch)
+            token.cancel()
+
+        with mock.patch.object(cancellation, "CHECK_EVERY", 1):
+            try:
+                TestInput().stream_to(sink, batch_size=1, cancel=token,
+                                      file_type="csv",
+                                      file_content=CONTENT)
+                assert False, "not cancelled"
+            except Cancelled:
+                pass
+        eq_(len(batches), 1)
+
+
+class TestCancelledExport:
+    def setUp(self):
+        self.response_func = webio.__excel_response_func__
+        webio.init_webio(lambda content, **keywords: content)
+        Base.metadata.drop_all(engine)
+        Base.metadata.create_all(engine)
+        self.session = Session()
+        self.session.add_all([
+            Signature(X=1, Y=2, Z=3), Signature(X=4, Y=5, Z=6),
+            Signature2(A=1, B=2, C=3)])
+        self.session.commit()
+        self.cancelled = CancelToken()
+        self.cancelled.cancel()
+
+    def tearDown(self):
+        self.session.close()
+        webio.init_webio(self.response_func)
+
+    def test_a_table(self):
+        content = webio.make_response_from_a_table(
+            self.session, Signature, "csv", cancel=CancelToken())
+        eq_(pe.get_array(file_type="csv", file_content=content),
+            [["X", "Y", "Z"], [1, 2, 3], [4, 5, 6]])
+
+    @raises(Cancelled)
+    def test_cancelled_a_table(self):
+        webio.make_response_from_a_table(
+            self.session, Signature, "csv", cancel=self.cancelled)
+
+    @raises(Cancelled)
+    def test_cancelled_tables(self):
+        webio.make_response_from_tables(
+            self.session, [Signature, Signature2], "xls",
+            cancel=self.cancelled)
+
+    @raises(Cancelled)
+    def test_cancelled_concurrent_tables(self):
+        webio.make_response_from_tables(
+            self.session, [Signature, Signature2], "xls",
+            session_factory=Session, cancel=self.cancelled)
+
+    @raises(Cancelled)
+    def test_query_sets_past_deadline(self):
+        webio.make_response_from_query_sets(
+            self.session.query(Signature).all(), ["X", "Y"], "csv",
+            cancel=0)
@@ -0,0 +1,70 @@
+import json
+import datetime
+from collections import OrderedDict
+
+import pyexcel as pe
+import pyexcel_webio as webio
+from pyexcel_webio import columns
+from nose.tools import eq_
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+ADICT = OrderedDict([
+    ("X", [1, 4, 7]),
+    ("Y", ["a", None, "c,d"]),
+    ("Z", [1.5, datetime.date(2017, 1, 2)]),
+])
+
+
+class TestColumnRendering:
+    def setUp(self):
+        self.response_func = webio.__excel_response_func__
+        webio.init_webio(lambda content, **keywords: content)
+
+    def tearDown(self):
+        webio.init_webio(self.response_func)
+
+    def test_same_as_pyexcel(self):
+        for file_type in ("csv", "tsv"):
+            expected = pe.save_as(adict=ADICT,
+                                  dest_file_type=file_type).getvalue()
+            eq_(webio.make_response_from_dict(ADICT, file_type), expected)
+
+    def test_plain_dict_columns_are_sorted(self):
+        adict = {"B": [1], "A": [2, 3]}
+        expected = pe.save_as(adict=adict, dest_file_type="csv").getvalue()
+        eq_(webio.make_response_from_dict(adict, "csv"), expected)
+        eq_(expected.splitlines()[0], "A,B")
+
+    def test_ordered_dict_columns_keep_their_order(self):
+        adict = OrderedDict([("B", [1]), ("A", [2])])
+        expected = pe.save_as(adict=adict, dest_file_type="csv").getvalue()
+        eq_(webio.make_response_from_dict(adict, "csv"), expected)
+        eq_(expected.splitlines()[0], "B,A")
+
+    def test_no_transposed_copy(self):
+        with mock.patch("pyexcel.save_as") as save_as:
+            webio.make_response_from_dict(ADICT, "csv")
+            assert not save_as.called
+
+    def test_writer_keywords(self):
+        content = webio.make_response_from_dict(ADICT, "csv",
+                                                dest_delimiter=";")
+        eq_(content.splitlines()[0], "X;Y;Z")
+
+    def test_sheet_keywords_go_through_pyexcel(self):
+        assert not columns.is_supported("csv", {"sheet_name": "s"})
+        assert not columns.is_supported("xls", {})
+
+    def test_ndjson(self):
+        lines = webio.make_response_from_dict(
+            OrderedDict([("X", [1, 4]), ("Y", ["a"])]), "ndjson")
+        eq_([json.loads(line) for line in lines],
+            [{"X": 1, "Y": "a"}, {"X": 4, "Y": ""}])
+
+    def test_iget_rows(self):
+        eq_(list(columns.iget_rows(OrderedDict([("a", [1]), ("b", [])]))),
+            [["a", "b"], [1, ""]])
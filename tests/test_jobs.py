@@ -0,0 +1,166 @@
+import os
+import time
+import shutil
+import tempfile
+import threading
+
+import pyexcel as pe
+import pyexcel_webio as webio
+from pyexcel_webio import jobs
+from db import Session, Base, Signature, engine
+from nose.tools import raises, eq_
+
+
+def wait_for(export_jobs, job_id):
+    for _ in range(500):
+        status = export_jobs.status(job_id)
+        if status["state"] not in (jobs.QUEUED, jobs.RUNNING):
+            return status
+        time.sleep(0.01)
+    raise AssertionError("job %s did not finish" % job_id)
+
+
+class TestExportJobs:
+    def setUp(self):
+        self.response_func = webio.__excel_response_func__
+        webio.init_webio(
+            lambda content, content_type=None, status=200, file_name=None:
+            (content, content_type, file_name))
+        self.directory = tempfile.mkdtemp()
+        self.jobs = jobs.ExportJobs(self.directory, max_workers=1)
+
+    def tearDown(self):
+        self.jobs.shutdown()
+        webio.init_webio(self.response_func)
+        shutil.rmtree(self.directory)
+
+    def test_export(self):
+        job_id = self.jobs.submit(webio.make_response_from_array,
+                                  [[1, 2], [3, 4]], "csv", file_name="a")
+        status = wait_for(self.jobs, job_id)
+        eq_(status["state"], jobs.FINISHED)
+        content, content_type, file_name = self.jobs.make_response(job_id)
+        content = "".join(content)
+        eq_(content.replace("\r\n", "\n"), "1,2\n3,4\n")
+        eq_(content_type, "text/csv")
+        eq_(file_name, "a.csv")
+
+    def test_binary_export_survives_restart(self):
+        job_id = self.jobs.submit(webio.make_response_from_array,
+                                  [[1, 2]], "xls")
+        wait_for(self.jobs, job_id)
+        restarted = jobs.ExportJobs(self.directory)
+        try:
+            content = b"".join(
+                restarted.make_response(job_id, file_name="b")[0])
+        finally:
+            restarted.shutdown()
+        eq_(pe.get_array(file_type="xls", file_content=content), [[1, 2]])
+
+    def test_export_is_written_and_served_in_chunks(self):
+        chunks = [u"\u00e9" * 3, u"a,b\n"] * 3
+        job_id = self.jobs.submit(
+            lambda: webio._make_response(iter(chunks), "csv"))
+        wait_for(self.jobs, job_id)
+        original = jobs.CHUNK_SIZE
+        jobs.CHUNK_SIZE = 1
+        try:
+            content = list(self.jobs.make_response(job_id)[0])
+        finally:
+            jobs.CHUNK_SIZE = original
+        assert len(content) > 1
+        eq_("".join(content), "".join(chunks))
+
+    def test_failure(self):
+        def render():
+            raise ValueError("no data")
+        job_id = self.jobs.submit(render)
+        status = wait_for(self.jobs, job_id)
+        eq_(status["state"], jobs.FAILED)
+        eq_(status["error"], "ValueError: no data")
+
+    @raises(jobs.JobNotFinished)
+    def test_not_finished(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def render():
+            started.set()
+            release.wait(5)
+            return webio.make_response_from_array([[1]], "csv")
+        job_id = self.jobs.submit(render)
+        started.wait(5)
+        try:
+            eq_(self.jobs.status(job_id)["state"], jobs.RUNNING)
+            self.jobs.make_response(job_id)
+        finally:
+            release.set()
+
+    def test_cancel_queued(self):
+        release = threading.Event()
+        self.jobs.submit(release.wait, 5)
+        job_id = self.jobs.submit(webio.make_response_from_array,
+                                  [[1]], "csv")
+        self.jobs.cancel(job_id)
+        release.set()
+        eq_(self.jobs.status(job_id)["state"], jobs.CANCELLED)
+
+    def test_expired(self):
+        self.jobs.ttl = -1
+        job_id = self.jobs.submit(webio.make_response_from_array,
+                                  [[1]], "csv")
+        wait_for(self.jobs, job_id)
+        self.jobs.purge()
+        eq_(os.listdir(self.directory), [])
+        try:
+            self.jobs.status(job_id)
+            assert False, "job not expired"
+        except KeyError:
+            pass
+
+    @raises(KeyError)
+    def test_unknown_job(self):
+        self.jobs.status("../../etc/passwd")
+
+
+class TestTableExportJobs:
+    def setUp(self):
+        TestExportJobs.setUp(self)
+        Base.metadata.drop_all(engine)
+        Base.metadata.create_all(engine)
+        session = Session()
+        session.add_all([Signature(X=1, Y=2, Z=3), Signature(X=4, Y=5, Z=6)])
+        session.commit()
+        session.close()
+
+    def tearDown(self):
+        TestExportJobs.tearDown(self)
+
+    def test_table_progress(self):
+        session = Session()
+        job_id = self.jobs.submit(webio.make_response_from_a_table,
+                                  session, Signature, "csv")
+        status = wait_for(self.jobs, job_id)
+        session.close()
+        eq_(status["state"], jobs.FINISHED)
+        eq_(status["rows"], 2)
+        content = "".join(self.jobs.make_response(job_id)[0])
+        eq_(pe.get_array(file_type="csv", file_content=content),
+            [["X", "Y", "Z"], [1, 2, 3], [4, 5, 6]])
+
+    def test_watermark_is_kept(self):
+        session = Session()
+        job_id = self.jobs.submit(webio.make_response_from_a_table,
+                                  session, Signature, "csv", watermark="X")
+        status = wait_for(self.jobs, job_id)
+        session.close()
+        eq_(status["headers"], {webio.WATERMARK_HEADER: "4"})
+        webio.init_webio(lambda content, **keywords: {})
+        response = self.jobs.make_response(job_id)
+        eq_(response, {webio.WATERMARK_HEADER: "4"})
+        restarted = jobs.ExportJobs(self.directory)
+        try:
+            eq_(restarted.status(job_id)["headers"],
+                {webio.WATERMARK_HEADER: "4"})
+        finally:
+            restarted.shutdown()
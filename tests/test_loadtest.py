@@ -0,0 +1,40 @@
+from pyexcel_webio import loadtest
+from nose.tools import eq_
+
+
+def test_load_test():
+    load_test = loadtest.LoadTest(rows=20, file_types=["csv", "xls"])
+    results = load_test.run(concurrency_levels=[1, 3], requests=6)
+    eq_(len(results), 2 * 2 * (1 + len(loadtest.DOWNLOADS)))
+    for result in results:
+        eq_(result["requests"], 6)
+        assert result["throughput"] > 0
+        assert result["p50"] <= result["p95"] <= result["p99"]
+    report = loadtest.format_results(results)
+    assert "make_response_from_tables" in report
+
+
+def test_upload_input():
+    upload = loadtest.UploadInput({})
+    eq_(upload.get_file_tuple("missing"), (None, None))
+
+
+def test_percentile():
+    latencies = list(range(1, 101))
+    eq_(loadtest._percentile(latencies, 50), 50)
+    eq_(loadtest._percentile(latencies, 99), 99)
+    eq_(loadtest._percentile([], 99), 0.0)
+
+
+def test_rss_is_sampled_per_scenario():
+    sampler = loadtest._RssSampler()
+    sampler.stop()
+    if sampler.peak is not None:
+        assert sampler.peak > 0
+
+
+def test_lazy_responses_are_joined():
+    status, headers, body = loadtest._wsgi_response(
+        (chunk for chunk in [b"a,", u"b"]), "text/csv")
+    eq_(body, [b"a,b"])
+    eq_(headers[1], ("Content-Length", "3"))
@@ -0,0 +1,87 @@
+import io
+
+import pyexcel as pe
+import pyexcel_webio as webio
+from pyexcel_webio import ndjson
+from common import TestInput, TestExtendedInput
+from db import Session, Base, Signature, engine
+from nose.tools import raises, eq_
+
+CONTENT = b'{"X": 1, "Y": 2, "Z": 3}\n\n{"X": 4, "Y": 5, "Z": 6}\n'
+RECORDS = [{"X": 1, "Y": 2, "Z": 3}, {"X": 4, "Y": 5, "Z": 6}]
+
+
+class TestNDJSONInput:
+    def test_iget_records(self):
+        myinput = TestExtendedInput()
+        records = myinput.iget_records(
+            field_name=("ndjson", io.BytesIO(CONTENT)))
+        assert not isinstance(records, list)
+        eq_(list(records), RECORDS)
+
+    def test_get_records_from_text(self):
+        myinput = TestInput()
+        records = myinput.get_records(
+            file_type="ndjson", file_content=CONTENT.decode("utf-8"))
+        eq_(records, RECORDS)
+
+    def test_iget_array(self):
+        myinput = TestInput()
+        array = myinput.iget_array(
+            file_type="ndjson",
+            file_content=CONTENT + b'{"Z": 9, "W": 0}\n')
+        eq_(list(array), [["X", "Y", "Z"], [1, 2, 3], [4, 5, 6],
+                          ["", "", 9]])
+
+    @raises(ValueError)
+    def test_not_an_object(self):
+        myinput = TestInput()
+        myinput.get_records(file_type="ndjson", file_content=b"[1, 2]\n")
+
+    def test_isave_to_database(self):
+        Base.metadata.drop_all(engine)
+        Base.metadata.create_all(engine)
+        session = Session()
+        myinput = TestInput()
+        myinput.isave_to_database(file_type="ndjson", file_content=CONTENT,
+                                  session=session, table=Signature)
+        array = pe.get_array(session=session, table=Signature)
+        eq_(array, [["X", "Y", "Z"], [1, 2, 3], [4, 5, 6]])
+        session.close()
+
+
+class TestNDJSONResponse:
+    def setUp(self):
+        self.responses = []
+        self.response_func = webio.__excel_response_func__
+        webio.init_webio(self.collect_response)
+
+    def collect_response(self, content, content_type=None, status=200,
+                         file_name=None):
+        self.responses.append((content, content_type, file_name))
+
+    def tearDown(self):
+        webio.init_webio(self.response_func)
+
+    def test_make_response_from_records(self):
+        webio.make_response_from_records(RECORDS, "ndjson",
+                                         file_name="records")
+        content, content_type, file_name = self.responses[0]
+        eq_(content_type, ndjson.MIME_TYPE)
+        eq_(file_name, "records.ndjson")
+        eq_(list(content), [
+            b'{"X": 1, "Y": 2, "Z": 3}\n',
+            b'{"X": 4, "Y": 5, "Z": 6}\n'
+        ])
+
+    def test_make_response_from_query_sets(self):
+        Base.metadata.drop_all(engine)
+        Base.metadata.create_all(engine)
+        session = Session()
+        session.add(Signature(X=1, Y=2, Z=3))
+        session.commit()
+        query_sets = session.query(Signature).all()
+        webio.make_response_from_query_sets(
+            query_sets, ["X", "Z"], "ndjson", export_key="signatures")
+        eq_(self.responses[0][0], b'{"X": 1, "Z": 3}\n')
+        session.close()
@@ -0,0 +1,95 @@
+import io
+import os
+import shutil
+import tempfile
+
+import pyexcel as pe
+from pyexcel_webio import paging
+from common import TestInput, TestExtendedInput
+from nose.tools import eq_
+
+
+class TestIndexedUpload:
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.array = [["X", "Y"]] + [[i, "row %d" % i] for i in range(10)]
+        self.array[3][1] = "quoted\nnew line"
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_csv_upload(self):
+        content = pe.save_as(array=self.array, dest_file_type="csv").read()
+        myinput = TestExtendedInput()
+        upload = myinput.save_to_index(
+            self.directory, field_name=("csv", io.StringIO(content)))
+        self.verify(paging.IndexedUpload(self.directory, upload.upload_id))
+
+    def test_xls_upload(self):
+        content = pe.save_as(array=self.array, dest_file_type="xls").read()
+        myinput = TestInput()
+        upload = myinput.save_to_index(
+            self.directory, file_type="xls", file_content=content)
+        eq_(upload.file_type, "csv")
+        self.verify(upload)
+
+    def test_keywords_are_kept(self):
+        myinput = TestInput()
+        upload = myinput.save_to_index(
+            self.directory, file_type="csv",
+            file_content=b"X;Y\n1;2\n3;4\n", delimiter=";")
+        upload = paging.IndexedUpload(self.directory, upload.upload_id)
+        eq_(upload.get_array_page(1, 1), [[3, 4]])
+
+    def test_window_is_applied_once(self):
+        content = b"".join(b"%d,%d\n" % (i, i) for i in range(10))
+        upload = TestInput().save_to_index(
+            self.directory, file_type="csv", file_content=content,
+            start_row=1, row_limit=6)
+        upload = paging.IndexedUpload(self.directory, upload.upload_id)
+        eq_(upload.number_of_rows(), 5)
+        eq_(upload.get_array_page(0, 3), [[2, 2], [3, 3], [4, 4]])
+        eq_(upload.get_records_page(2, 2), [{1: 4}, {1: 5}])
+
+    def test_utf16(self):
+        content = u"X,Y\n1,\u00e9\n2,b\n".encode("utf-16")
+        upload = TestInput().save_to_index(
+            self.directory, file_type="csv", file_content=content,
+            encoding="utf-16")
+        eq_(upload.number_of_rows(), 2)
+        eq_(upload.get_records_page(0, 2),
+            [{"X": 1, "Y": u"\u00e9"}, {"X": 2, "Y": "b"}])
+
+    def test_invalid_upload_id(self):
+        upload = TestInput().save_to_index(
+            self.directory, file_type="csv", file_content=b"X\n1\n")
+        for upload_id in ("../" + upload.upload_id, upload.upload_id[:-1],
+                          upload.upload_id.upper(), None):
+            try:
+                paging.IndexedUpload(self.directory, upload_id)
+            except KeyError:
+                pass
+            else:
+                assert False, "KeyError expected for %r" % upload_id
+
+    def test_empty_upload(self):
+        upload = TestInput().save_to_index(
+            self.directory, file_type="csv", file_content=b"")
+        eq_(upload.number_of_rows(), 0)
+        eq_(upload.get_records_page(0, 10), [])
+
+    def test_delete(self):
+        upload = TestInput().save_to_index(
+            self.directory, file_type="csv", file_content=b"X\n1\n")
+        upload.delete()
+        eq_(os.listdir(self.directory), [])
+
+    def verify(self, upload):
+        eq_(upload.number_of_rows(), 10)
+        eq_(upload.get_array_page(0, 3), self.array[1:4])
+        eq_(upload.get_array_page(8, 5), self.array[9:])
+        eq_(upload.get_array_page(10, 5), [])
+        eq_(upload.get_records_page(2, 2), [
+            {"X": 2, "Y": "quoted\nnew line"},
+            {"X": 3, "Y": "row 3"}
+        ])
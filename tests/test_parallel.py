@@ -0,0 +1,202 @@
+import io
+import zipfile
+from collections import OrderedDict
+
+import pyexcel as pe
+import pyexcel_webio as webio
+from pyexcel_webio import parallel, xlsx, zipstream
+from common import TestInput, TestExtendedInput
+from db import Session, Base, Signature, engine
+from test_xlsx import read_xlsx
+from test_zipstream import read_zip
+from nose.tools import eq_
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+CSV_CONTENT = (
+    b'X,Y,Z\n'
+    b'1,"a\nmulti-line, quoted",3\n'
+    b'4,"say ""hi""\n",6\n'
+    b'7,8,9\n'
+    b'10,11,12\n'
+)
+EXPECTED = [
+    ["X", "Y", "Z"],
+    [1, "a\nmulti-line, quoted", 3],
+    [4, 'say "hi"\n', 6],
+    [7, 8, 9],
+    [10, 11, 12]
+]
+
+
+class TestSplitRecords:
+    def test_quoted_newlines_are_not_split(self):
+        ranges = parallel.split_records(CSV_CONTENT, 1)
+        chunks = [CSV_CONTENT[start:end] for start, end in ranges]
+        eq_(chunks, [
+            b'X,Y,Z\n',
+            b'1,"a\nmulti-line, quoted",3\n',
+            b'4,"say ""hi""\n",6\n',
+            b'7,8,9\n',
+            b'10,11,12\n'
+        ])
+
+    def test_ranges_cover_content(self):
+        content = CSV_CONTENT.decode("utf-8")
+        ranges = parallel.split_records(content, 20)
+        eq_("".join(content[start:end] for start, end in ranges),
+            content)
+
+    def test_no_trailing_newline(self):
+        eq_(parallel.split_records(b'a,b\n1,2', 1), [(0, 4), (4, 7)])
+
+    def test_is_supported(self):
+        assert parallel.is_supported(
+            {'file_type': 'csv', 'file_content': CSV_CONTENT})
+        assert parallel.is_supported({'file_name': 'upload.TSV'})
+        assert not parallel.is_supported(
+            {'file_type': 'xls', 'file_content': CSV_CONTENT})
+        assert parallel.is_supported(
+            {'file_type': 'csv', 'file_content': CSV_CONTENT,
+             'encoding': 'latin-1'})
+        assert not parallel.is_supported(
+            {'file_type': 'csv', 'file_content': CSV_CONTENT,
+             'encoding': 'utf-16'})
+
+
+class TestParallelParse:
+    def setUp(self):
+        self.min_chunk_size = parallel.MIN_CHUNK_SIZE
+        parallel.MIN_CHUNK_SIZE = 1
+
+    def tearDown(self):
+        parallel.MIN_CHUNK_SIZE = self.min_chunk_size
+
+    def test_get_array(self):
+        myinput = TestInput()
+        array = myinput.get_array(file_type='csv',
+                                  file_content=CSV_CONTENT, parallel=2)
+        eq_(array, EXPECTED)
+
+    def test_get_records(self):
+        myinput = TestExtendedInput()
+        records = myinput.get_records(
+            field_name=('csv', io.BytesIO(CSV_CONTENT)), parallel=2)
+        eq_(records, pe.get_records(file_type='csv',
+                                    file_content=CSV_CONTENT))
+
+    def test_utf16(self):
+        content = CSV_CONTENT.decode("utf-8").encode("utf-16")
+        array = TestInput().get_array(file_type='csv', file_content=content,
+                                      encoding='utf-16', parallel=2)
+        eq_(array, EXPECTED)
+
+    def test_numeric_header(self):
+        content = b"2019,name\n1,a\n"
+        records = TestInput().get_records(file_type='csv',
+                                          file_content=content, parallel=2)
+        eq_(records, pe.get_records(file_type='csv', file_content=content))
+        eq_(list(records[0].keys()), ["2019", "name"])
+
+    def test_window_applies_to_the_whole_file(self):
+        content = b"".join(b"%d,%d\n" % (i, i) for i in range(10))
+        for window in ({"start_row": 1}, {"row_limit": 2},
+                       {"start_row": 3, "row_limit": 4},
+                       {"start_column": 1}, {"skip_empty_rows": True}):
+            params = dict(window, file_type='csv', file_content=content)
+            eq_(parallel.get_array(params, 2), pe.get_array(**params))
+            eq_(list(parallel.iget_array(params, 2)),
+                list(pe.iget_array(**params)))
+            pe.free_resources()
+
+    def test_single_range_is_parsed_in_process(self):
+        parallel.MIN_CHUNK_SIZE = self.min_chunk_size
+        with mock.patch.object(parallel, "ProcessPoolExecutor") as pool:
+            array = parallel.get_array(
+                {'file_type': 'csv', 'file_content': CSV_CONTENT}, 8)
+        assert not pool.called
+        eq_(array, EXPECTED)
+
+    def test_workers_are_capped_by_ranges(self):
+        content = b"a\nb\n"
+        with mock.patch.object(parallel, "ProcessPoolExecutor",
+                               wraps=parallel.ProcessPoolExecutor) as pool:
+            parallel.get_array({'file_type': 'csv', 'file_content': content},
+                               8)
+        eq_(pool.call_args[1]["max_workers"], 2)
+
+    def test_fallback_for_other_file_types(self):
+        myinput = TestInput()
+        array = myinput.get_array(array=EXPECTED, parallel=2)
+        eq_(array, EXPECTED)
+
+    def test_isave_to_database(self):
+        Base.metadata.drop_all(engine)
+        Base.metadata.create_all(engine)
+        session = Session()
+        myinput = TestInput()
+        myinput.isave_to_database(
+            file_type='csv', file_content=b'X,Y,Z\n1,2,3\n4,5,6\n',
+            session=session, table=Signature, parallel=2)
+        array = pe.get_array(session=session, table=Signature)
+        eq_(array, [['X', 'Y', 'Z'], [1, 2, 3], [4, 5, 6]])
+        session.close()
+
+
+class TestParallelRendering:
+    def setUp(self):
+        self.response_func = webio.__excel_response_func__
+        webio.init_webio(lambda content, **keywords: content)
+        self.book = OrderedDict([
+            ("b", [["X", "Y"], [1, None], [2, "x,y"]]),
+            ("a", [["Z"], [3]]),
+        ])
+
+    def tearDown(self):
+        webio.init_webio(self.response_func)
+
+    def test_same_as_streamed(self):
+        for file_type in ("csvz", "tsvz"):
+            expected = read_zip(b"".join(
+                webio.make_response_from_book_dict(self.book, file_type,
+                                                   streamed=True)))
+            content = webio.make_response_from_book_dict(
+                self.book, file_type, parallel=2)
+            eq_(read_zip(content), expected)
+
+    def test_book_to_xlsx(self):
+        content = webio.make_response(pe.Book(self.book), "xlsx",
+                                      parallel=2)
+        names, sheets = read_xlsx(content)
+        eq_(names, ["b", "a"])
+        eq_(sheets["b"][2], [("A3", None, "2"),
+                             ("B3", "inlineStr", "x,y")])
+
+    def test_xlsx_overflow(self):
+        with mock.patch.object(xlsx, "MAX_ROWS", 2):
+            sheets = xlsx.split_sheets(self.book.items())
+        eq_([name for name, _ in sheets], ["b", "b (2)", "a"])
+        eq_(sheets[1][1], [[2, "x,y"]])
+
+    def test_tables(self):
+        Base.metadata.drop_all(engine)
+        Base.metadata.create_all(engine)
+        session = Session()
+        session.add_all([Signature(X=1, Y=2, Z=3)])
+        session.commit()
+        content = webio.make_response_from_tables(
+            session, [Signature], "csvz", parallel=2)
+        session.close()
+        eq_(read_zip(content), {"signature.csv": "X,Y,Z\r\n1,2,3\r\n"})
+
+    def test_assemble(self):
+        content = zipstream.assemble([
+            zipstream.deflate("a.csv", [b"1,2\r\n", b"3\r\n"]),
+            zipstream.deflate(u"\xe9.csv", [])])
+        archive = zipfile.ZipFile(io.BytesIO(content))
+        eq_(archive.testzip(), None)
+        eq_(archive.namelist(), ["a.csv", u"\xe9.csv"])
+        eq_(archive.read("a.csv"), b"1,2\r\n3\r\n")
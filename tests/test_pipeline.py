@@ -0,0 +1,70 @@
+import pyexcel as pe
+import pyexcel_webio as webio
+from pyexcel_webio import pipeline
+from db import Session, Base, Signature, engine
+from nose.tools import raises, eq_
+
+
+class TestIgetRows:
+    def test_rows_in_order(self):
+        rows = pipeline.iget_rows(iter(range(25)), batch_size=4,
+                                  max_batches=2)
+        eq_(list(rows), list(range(25)))
+
+    def test_no_rows(self):
+        eq_(list(pipeline.iget_rows([])), [])
+
+    @raises(ValueError)
+    def test_error_is_raised(self):
+        def broken():
+            yield 1
+            raise ValueError("database gone")
+        list(pipeline.iget_rows(broken(), batch_size=1))
+
+    def test_backpressure_and_early_stop(self):
+        fetched = []
+
+        def rows():
+            for index in range(1000):
+                fetched.append(index)
+                yield index
+
+        generator = pipeline.iget_rows(rows(), batch_size=10,
+                                       max_batches=2)
+        eq_(next(generator), 0)
+        generator.close()
+        # one batch consumed, two queued and one in hand at most
+        assert len(fetched) <= 40
+
+
+class TestPipelinedResponse:
+    def setUp(self):
+        self.responses = []
+        self.response_func = webio.__excel_response_func__
+        webio.init_webio(self.collect_response)
+        Base.metadata.drop_all(engine)
+        Base.metadata.create_all(engine)
+        self.session = Session()
+        self.session.add_all([Signature(X=i, Y=i + 1, Z=i + 2)
+                              for i in range(1, 8)])
+        self.session.commit()
+
+    def collect_response(self, content, content_type=None, status=200,
+                         file_name=None):
+        self.responses.append(content)
+
+    def tearDown(self):
+        self.session.close()
+        webio.init_webio(self.response_func)
+
+    def test_make_response_from_query_sets(self):
+        query_sets = self.session.query(Signature).order_by(Signature.X)
+        for file_type in ("csv", "xls"):
+            webio.make_response_from_query_sets(
+                query_sets, ["X", "Z"], file_type, pipelined=True,
+                batch_size=3)
+        expected = [["X", "Z"]] + [[i, i + 2] for i in range(1, 8)]
+        eq_(pe.get_array(file_type="csv", file_content=self.responses[0]),
+            expected)
+        eq_(pe.get_array(file_type="xls", file_content=self.responses[1]),
+            expected)
@@ -0,0 +1,104 @@
+import io
+import tracemalloc
+
+import pyexcel as pe
+import pyexcel_webio as webio
+from pyexcel_webio import profiling
+from common import TestInput, TestExtendedInput
+from nose.tools import eq_
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+class TestProfiling:
+    def setUp(self):
+        self.captures = []
+        self.response_func = webio.__excel_response_func__
+        webio.init_webio(webio.dummy_func)
+        profiling.init_profiling(self.captures.append)
+        self.data = [["X", "Y"], [1, 2], [3, 4]]
+
+    def tearDown(self):
+        profiling.init_profiling(None)
+        webio.init_webio(self.response_func)
+
+    def test_upload(self):
+        myinput = TestExtendedInput()
+        content = io.BytesIO(b"X,Y\n1,2\n3,4\n")
+        array = myinput.get_array(field_name=("csv", content))
+        eq_(array, self.data)
+        eq_(len(self.captures), 1)
+        capture = self.captures[0]
+        eq_(capture.name, "get_array")
+        eq_(capture.file_type, "csv")
+        eq_(capture.field_name, ("csv", content))
+        eq_(capture.rows, 3)
+        assert capture.peak_memory > 0
+        eq_(capture.profile, None)
+
+    def test_download(self):
+        profiling.init_profiling(self.captures.append, profile_rate=1.0)
+        webio.make_response_from_array(self.data, "csv")
+        capture = self.captures[0]
+        eq_(capture.name, "make_response_from_array")
+        eq_(capture.file_type, "csv")
+        eq_(capture.rows, 3)
+        assert "function calls" in capture.profile
+
+    def test_lazy_download(self):
+        profiling.init_profiling(self.captures.append, profile_rate=1.0)
+        webio.init_webio(lambda content, **keywords: content)
+        content = webio.make_response_from_records(
+            [{"X": 1}, {"X": 2}], "ndjson")
+        eq_(self.captures, [])
+        eq_(b"".join(content), b'{"X": 1}\n{"X": 2}\n')
+        capture = self.captures[0]
+        eq_(capture.name, "make_response_from_records")
+        eq_(capture.file_type, "ndjson")
+        eq_(capture.rows, 2)
+        assert "dumps" in capture.profile
+
+    def test_sampling(self):
+        profiling.init_profiling(self.captures.append, sample_rate=0)
+        TestInput().get_records(array=self.data)
+        eq_(self.captures, [])
+
+    def test_broken_sink(self):
+        def sink(capture):
+            raise ValueError("boom")
+        profiling.init_profiling(sink)
+        eq_(TestInput().get_array(array=self.data), self.data)
+
+    def test_tracing_already_on(self):
+        tracemalloc.start()
+        try:
+            TestInput().get_array(array=self.data)
+            assert self.captures[0].peak_memory > 0
+            assert tracemalloc.is_tracing()
+            with mock.patch.object(profiling, "tracemalloc",
+                                   mock.Mock(wraps=tracemalloc,
+                                             spec=["is_tracing", "start",
+                                                   "stop",
+                                                   "get_traced_memory"])):
+                TestInput().get_array(array=self.data)
+            eq_(self.captures[1].peak_memory, None)
+            assert tracemalloc.is_tracing()
+        finally:
+            tracemalloc.stop()
+
+    def test_off_by_default(self):
+        profiling.init_profiling(None)
+        TestInput().get_array(array=self.data)
+        eq_(self.captures, [])
+
+
+def test_count_rows():
+    eq_(profiling.count_rows([[1], [2]]), 2)
+    eq_(profiling.count_rows({"X": [1, 4], "Y": [2, 5]}), 2)
+    eq_(profiling.count_rows({"a": [[1], [2]], "b": [[3]]}), 3)
+    eq_(profiling.count_rows(pe.Sheet([[1], [2]])), 2)
+    eq_(profiling.count_rows(pe.Book({"a": [[1]], "b": [[2], [3]]})), 3)
+    eq_(profiling.count_rows(None), None)
@@ -0,0 +1,111 @@
+import io
+
+import pyexcel as pe
+from pyexcel_webio import receiving
+from common import TestInput
+from db import Session, Base, Signature, engine
+from nose.tools import eq_
+
+CONTENT = b"X,Y,Z\n1,2,3\n4,5,6\n7,8,9\n"
+
+
+class Body(io.RawIOBase):
+    """A request body, received a piece at a time"""
+    def __init__(self, content, piece_size=4):
+        self.pieces = [content[start:start + piece_size]
+                       for start in range(0, len(content), piece_size)]
+        self.received = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.received == len(self.pieces):
+            return 0
+        piece = self.pieces[self.received]
+        size = min(len(buffer), len(piece))
+        buffer[:size] = piece[:size]
+        if size < len(piece):
+            self.pieces[self.received] = piece[size:]
+        else:
+            self.received += 1
+        return size
+
+
+class TestReceiving:
+    def test_is_receiving(self):
+        assert receiving.is_receiving(
+            {"file_type": "csv", "file_stream": Body(CONTENT)})
+        assert not receiving.is_receiving(
+            {"file_type": "csv", "file_stream": io.BytesIO(CONTENT)})
+        assert not receiving.is_receiving(
+            {"file_type": "xls", "file_stream": Body(CONTENT)})
+        assert not receiving.is_receiving(
+            {"file_type": "csv", "file_stream": Body(CONTENT),
+             "encoding": "utf-16"})
+
+    def test_blocks_end_outside_quotes(self):
+        content = b'a,b\n1,"x\ny"\n2,"z"\n3,w'
+        blocks = list(receiving.iget_blocks(Body(content, 3), 3))
+        eq_(b"".join(blocks), content)
+        eq_(blocks[1:3], [b'1,"x\ny"\n', b'2,"z"\n'])
+
+    def test_text_blocks(self):
+        blocks = list(receiving.iget_blocks(
+            io.StringIO(u"a,b\n1,2\n"), 5))
+        eq_(blocks, [u"a,b\n", u"1,2\n"])
+
+    def test_rows_before_the_end(self):
+        body = Body(CONTENT)
+        rows = receiving.iget_array(
+            {"file_type": "csv", "file_stream": body}, 4)
+        eq_(next(rows), ["X", "Y", "Z"])
+        assert body.received < len(body.pieces)
+        eq_(list(rows), [[1, 2, 3], [4, 5, 6], [7, 8, 9]])
+
+    def test_window_spans_blocks(self):
+        content = b"".join(b"%d\n" % number for number in range(10))
+        for window in ({"start_row": 2}, {"row_limit": 3},
+                       {"start_row": 4, "row_limit": 5},
+                       {"skip_row_func": lambda index, start, limit:
+                        -1 if index % 3 else 0}):
+            rows = receiving.iget_array(
+                dict(window, file_type="csv", file_stream=Body(content)), 6)
+            expected = list(pe.iget_array(
+                file_type="csv", file_content=content, **window))
+            pe.free_resources()
+            eq_(list(rows), expected)
+
+    def test_iget_records(self):
+        records = TestInput().iget_records(file_type="csv",
+                                           file_stream=Body(CONTENT))
+        eq_(list(records), [
+            {"X": 1, "Y": 2, "Z": 3}, {"X": 4, "Y": 5, "Z": 6},
+            {"X": 7, "Y": 8, "Z": 9}])
+
+    def test_iget_array_of_tsv(self):
+        rows = TestInput().iget_array(
+            file_type="tsv", file_stream=Body(b"a\tb\n1\t2\n"))
+        eq_(list(rows), [["a", "b"], [1, 2]])
+
+    def test_ndjson(self):
+        body = Body(b'{"X": 1}\n{"X": 2}\n')
+        records = TestInput().iget_records(file_type="ndjson",
+                                           file_stream=body)
+        eq_(list(records), [{"X": 1}, {"X": 2}])
+
+
+class TestReceivingIngest:
+    def setUp(self):
+        Base.metadata.drop_all(engine)
+        Base.metadata.create_all(engine)
+        self.session = Session()
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_isave_to_database(self):
+        TestInput().isave_to_database(
+            session=self.session, table=Signature, file_type="csv",
+            file_stream=Body(CONTENT))
+        eq_(self.session.query(Signature).count(), 3)
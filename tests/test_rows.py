@@ -0,0 +1,69 @@
+import io
+
+from pyexcel_webio import rows
+from common import TestInput, TestExtendedInput
+from nose.tools import raises, eq_
+
+CONTENT = b"X,Y,Z\n1,2,3\n4,5,6\n"
+
+
+class TestCompactRows:
+    def test_get_records_as_records(self):
+        myinput = TestInput()
+        records = myinput.get_records(file_type="csv", file_content=CONTENT,
+                                      row_type="record")
+        eq_(records, [(1, 2, 3), (4, 5, 6)])
+        eq_(records[1]["Y"], 5)
+        eq_(records[1][1], 5)
+        eq_(records[0].get("W", 0), 0)
+        eq_(records[0].keys(), ["X", "Y", "Z"])
+        eq_(records[0]._asdict(), {"X": 1, "Y": 2, "Z": 3})
+        assert type(records[0]) is type(records[1])
+        assert not hasattr(records[0], "__dict__")
+
+    def test_iget_records_as_namedtuples(self):
+        myinput = TestExtendedInput()
+        records = myinput.iget_records(
+            field_name=("csv", io.BytesIO(CONTENT)), row_type="namedtuple")
+        assert not isinstance(records, list)
+        records = list(records)
+        eq_(records[1].Z, 6)
+        eq_(records[0]._fields, ("X", "Y", "Z"))
+
+    def test_parallel(self):
+        myinput = TestInput()
+        records = myinput.get_records(file_type="csv", file_content=CONTENT,
+                                      row_type="record", parallel=2)
+        eq_([record._asdict() for record in records],
+            [{"X": 1, "Y": 2, "Z": 3}, {"X": 4, "Y": 5, "Z": 6}])
+
+    def test_ndjson(self):
+        myinput = TestInput()
+        records = myinput.get_records(
+            file_type="ndjson", file_content=b'{"X": 1, "Y": 2}\n',
+            row_type="record")
+        eq_(records[0]["Y"], 2)
+
+    def test_numeric_header(self):
+        records = TestInput().get_records(
+            file_type="csv", file_content=b"2019,name\n1,a\n",
+            row_type="record")
+        dicts = TestInput().get_records(
+            file_type="csv", file_content=b"2019,name\n1,a\n")
+        eq_(records[0]["2019"], 1)
+        eq_(records[0]._asdict(), dict(dicts[0]))
+
+    def test_uneven_rows(self):
+        eq_(list(rows.iget_rows([["a", "b"], [1], [1, 2, 3]], "record")),
+            [(1, ""), (1, 2)])
+
+    def test_invalid_names(self):
+        row_class = rows.make_row_class(["a b", "class", 3], "namedtuple")
+        eq_(row_class._fields, ("_0", "_1", "_2"))
+
+    def test_empty(self):
+        eq_(list(rows.iget_rows([], "record")), [])
+
+    @raises(ValueError)
+    def test_unknown_row_type(self):
+        rows.make_row_class(["a"], "object")
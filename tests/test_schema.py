@@ -0,0 +1,116 @@
+import pyexcel_webio as webio
+from pyexcel_webio import schema
+from pyexcel_webio.schema import Column, Schema
+from common import TestInput
+from db import Session, Base, Signature, engine
+from nose.tools import raises, eq_
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+CONTENT = b"X,Y,Z\n1,2,3\n4,5,6\n7,8,9\n"
+SCHEMA = Schema([Column("X", int), Column("Y", int), Column("Z", int)])
+
+
+class TestSchema:
+    def test_compile(self):
+        convert = SCHEMA.compile(["Z", "X", "Y"])
+        eq_(convert(["3", 1, "2"]), (1, 2, 3))
+
+    def test_source_and_default(self):
+        columns = Schema([
+            Column("X", int, source="id"),
+            Column("Y", float, default=0.0),
+            Column("Z", default="none")])
+        convert = columns.compile(["id", "Y"])
+        eq_(convert(["1", ""]), (1, 0.0, "none"))
+        eq_(convert(["1"]), (1, 0.0, "none"))
+        eq_(convert([2, "1.5"]), (2, 1.5, "none"))
+
+    def test_callable_type(self):
+        columns = Schema([Column("X", lambda value: value.upper())])
+        eq_(columns.compile(["X"])(["a"]), ("A",))
+
+    def test_nullable(self):
+        convert = SCHEMA.compile(["X", "Y"])
+        eq_(convert([1, None]), (1, None, None))
+
+    @raises(ValueError)
+    def test_not_nullable(self):
+        columns = Schema([Column("X", int, nullable=False)])
+        columns.compile(["X"])([""])
+
+    @raises(ValueError)
+    def test_missing_column(self):
+        columns = Schema([Column("X", int, nullable=False)])
+        columns.compile(["Y"])
+
+
+class TestSchemaIngest:
+    def setUp(self):
+        Base.metadata.drop_all(engine)
+        Base.metadata.create_all(engine)
+        self.session = Session()
+
+    def tearDown(self):
+        self.session.close()
+
+    def rows(self):
+        return [tuple(row) for row in self.session.query(
+            Signature.X, Signature.Y, Signature.Z).order_by(Signature.X)]
+
+    def test_save_to_database(self):
+        count = TestInput().save_to_database(
+            session=self.session, table=Signature, schema=SCHEMA,
+            file_type="csv", file_content=CONTENT)
+        eq_(count, 3)
+        eq_(self.rows(), [(1, 2, 3), (4, 5, 6), (7, 8, 9)])
+
+    def test_isave_to_database(self):
+        with mock.patch.object(schema, "BATCH_SIZE", 2):
+            count = TestInput().isave_to_database(
+                session=self.session, table=Signature, schema=SCHEMA,
+                file_type="csv", file_content=CONTENT)
+        eq_(count, 3)
+        eq_(self.rows(), [(1, 2, 3), (4, 5, 6), (7, 8, 9)])
+
+    def test_save_to_database_commits_once(self):
+        with mock.patch.object(schema, "BATCH_SIZE", 2):
+            with mock.patch.object(self.session, "commit",
+                                   wraps=self.session.commit) as commit:
+                TestInput().save_to_database(
+                    session=self.session, table=Signature, schema=SCHEMA,
+                    file_type="csv", file_content=CONTENT)
+        eq_(commit.call_count, 1)
+
+    def test_isave_to_database_commits_every_batch(self):
+        with mock.patch.object(schema, "BATCH_SIZE", 2):
+            with mock.patch.object(self.session, "commit",
+                                   wraps=self.session.commit) as commit:
+                TestInput().isave_to_database(
+                    session=self.session, table=Signature, schema=SCHEMA,
+                    file_type="csv", file_content=CONTENT)
+        eq_(commit.call_count, 2)
+
+    def test_isave_to_database_with_cancel(self):
+        TestInput().isave_to_database(
+            session=self.session, table=Signature, schema=SCHEMA,
+            file_type="csv", file_content=CONTENT,
+            cancel=webio.cancellation.CancelToken())
+        eq_(len(self.rows()), 3)
+
+    def test_empty(self):
+        count = schema.insert(self.session, Signature, SCHEMA, [])
+        eq_(count, 0)
+
+    def test_bad_row(self):
+        try:
+            TestInput().save_to_database(
+                session=self.session, table=Signature, schema=SCHEMA,
+                file_type="csv", file_content=b"X,Y,Z\n1,2,3\n4,five,6\n")
+        except ValueError as error:
+            eq_(str(error).startswith("Row 2: column 'Y'"), True)
+        else:
+            assert False, "ValueError expected"
@@ -0,0 +1,76 @@
+import asyncio
+import threading
+
+from pyexcel_webio import sinks
+from common import TestInput
+from nose.tools import raises, eq_
+
+CONTENT = "X,Y\n" + "".join("%d,%d\n" % (i, i * 2) for i in range(10))
+
+
+class TestStreamTo:
+    def setUp(self):
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def sink(self, batch):
+        with self.lock:
+            self.batches.append(batch)
+
+    def test_function_sink(self):
+        summary = TestInput().stream_to(
+            self.sink, batch_size=4, file_type="csv", file_content=CONTENT)
+        eq_(summary, sinks.StreamSummary(rows=10, batches=3, retries=0))
+        eq_([len(batch) for batch in self.batches], [4, 4, 2])
+        eq_(self.batches[0][1], {"X": 1, "Y": 2})
+
+    def test_max_in_flight(self):
+        in_flight = []
+        most = []
+
+        def sink(batch):
+            with self.lock:
+                in_flight.append(batch)
+                most.append(len(in_flight))
+            threading.Event().wait(0.01)
+            with self.lock:
+                in_flight.remove(batch)
+
+        summary = sinks.stream_to(range(20), sink, batch_size=2,
+                                  max_in_flight=3)
+        eq_(summary.rows, 20)
+        eq_(summary.batches, 10)
+        assert max(most) <= 3
+
+    def test_retries(self):
+        failures = [ValueError("busy"), ValueError("busy")]
+
+        def sink(batch):
+            if failures:
+                raise failures.pop()
+            self.sink(batch)
+
+        summary = sinks.stream_to(range(5), sink, batch_size=5, retries=2)
+        eq_(summary, sinks.StreamSummary(rows=5, batches=1, retries=2))
+
+    @raises(ValueError)
+    def test_retries_exhausted(self):
+        def sink(batch):
+            raise ValueError("down")
+        sinks.stream_to(range(5), sink, max_in_flight=2, retries=1)
+
+    def test_coroutine_sink(self):
+        async def sink(batch):
+            await asyncio.sleep(0)
+            self.batches.append(batch)
+
+        summary = sinks.stream_to(range(7), sink, batch_size=3,
+                                  max_in_flight=2)
+        eq_(summary.rows, 7)
+        eq_(sorted(sum(self.batches, [])), list(range(7)))
+
+    @raises(ValueError)
+    def test_coroutine_sink_error(self):
+        async def sink(batch):
+            raise ValueError("down")
+        sinks.stream_to(range(7), sink, batch_size=3)
@@ -1,4 +1,6 @@
 import os
+import mmap
+import tempfile
 import sys
 from unittest import TestCase
 import pyexcel as pe
@@ -201,6 +203,35 @@ class TestExcelInputInMultiDict:
         myinput = TestExtendedInput()
         myinput.get_sheet(field_name=('xls', None))
 
+    def test_spooled_path(self):
+        myinput = TestExtendedInput()
+        params = myinput.get_params(field_name=('xls', self.testfile))
+        assert isinstance(params['file_content'], mmap.mmap)
+        eq_(myinput.get_array(field_name=('xls', self.testfile)),
+            self.data)
+
+    def test_spooled_stream(self):
+        class FileStorage(object):
+            def __init__(self, stream):
+                self.stream = stream
+
+        myinput = TestExtendedInput()
+        with tempfile.TemporaryFile() as f:
+            f.write(b"X,Y\n1,2\n")
+            params = myinput.get_params(field_name=('csv', FileStorage(f)))
+            assert isinstance(params['file_content'], mmap.mmap)
+            eq_(myinput.get_records(field_name=('csv', FileStorage(f)),
+                                    parallel=2),
+                [{"X": 1, "Y": 2}])
+
+    def test_in_memory_spool_stays_in_memory(self):
+        myinput = TestExtendedInput()
+        with tempfile.SpooledTemporaryFile(max_size=1024) as f:
+            f.write(b"X,Y\n1,2\n")
+            params = myinput.get_params(field_name=('csv', f))
+            eq_(params['file_content'], b"X,Y\n1,2\n")
+            assert not f._rolled
+
 
 class TestExcelInputOnBook(TestCase):
     def setUp(self):
@@ -418,3 +449,161 @@ class TestBookResponseFromDataBase:
         expected.update({
             'signature2': [['A', 'B', 'C'], [1, 2, 3], [4, 5, 6]]})
         assert book.to_dict() == expected
+
+
+class TestSelectionFromDataBase:
+    def setUp(self):
+        Base.metadata.drop_all(engine)
+        Base.metadata.create_all(engine)
+        self.session = Session()
+        self.session.add_all([
+            Signature(X=1, Y=2, Z=3), Signature(X=4, Y=5, Z=6),
+            Signature(X=7, Y=8, Z=9),
+            Signature2(A=1, B=2, C=3), Signature2(A=4, B=5, C=6)])
+        self.session.commit()
+
+    def test_make_response_from_a_table(self):
+        webio.make_response_from_a_table(
+            self.session, Signature, "xls", file_name=FILE_NAME,
+            columns=["Z", "X"], filter=Signature.X > 1,
+            order_by=Signature.X.desc())
+        sheet = pe.get_sheet(file_name=OUTPUT)
+        eq_(sheet.name, "signature")
+        eq_(sheet.to_array(), [["Z", "X"], [9, 7], [6, 4]])
+
+    def test_writer_keywords_with_columns(self):
+        response_func = webio.__excel_response_func__
+        webio.init_webio(lambda content, **keywords: content)
+        try:
+            content = webio.make_response_from_a_table(
+                self.session, Signature, "csv", columns=["X", "Y"],
+                filter=Signature.X < 7, dest_delimiter=";")
+        finally:
+            webio.init_webio(response_func)
+        eq_(content.split(), ["X;Y", "1;2", "4;5"])
+
+    def test_make_response_from_tables(self):
+        webio.make_response_from_tables(
+            self.session, [Signature, Signature2], "xls",
+            file_name=FILE_NAME, columns=[["X"], None],
+            filters=[Signature.X < 7, Signature2.A > 1])
+        book = pe.get_book(file_name=OUTPUT)
+        eq_(book["signature"].to_array(), [["X"], [1], [4]])
+        eq_(book["signature2"].to_array(), [["A", "B", "C"], [4, 5, 6]])
+
+    def test_filters_in_snapshot_key(self):
+        store = webio.cache.SnapshotStore()
+        for limit in (2, 5):
+            webio.make_response_from_a_table(
+                self.session, Signature, "xls", file_name=FILE_NAME,
+                filter=Signature.X < limit, snapshot_store=store)
+        eq_(len(store._snapshots), 2)
+
+    def tearDown(self):
+        self.session.close()
+        if os.path.exists(OUTPUT):
+            os.unlink(OUTPUT)
+
+
+class Response(object):
+    def __init__(self, content, **keywords):
+        self.content = content
+        self.headers = {}
+
+
+class TestDeltaExport:
+    def setUp(self):
+        Base.metadata.drop_all(engine)
+        Base.metadata.create_all(engine)
+        self.session = Session()
+        self.session.add_all([
+            Signature(X=4, Y=5, Z=6), Signature(X=1, Y=2, Z=3)])
+        self.session.commit()
+        self.response_func = webio.__excel_response_func__
+        webio.init_webio(Response)
+
+    def export(self, since):
+        response = webio.make_response_from_a_table(
+            self.session, Signature, "csv", watermark="X", since=since)
+        return response.content, response.headers[webio.WATERMARK_HEADER]
+
+    def test_delta_export(self):
+        content, watermark = self.export(None)
+        eq_(content.split(), ["X,Y,Z", "1,2,3", "4,5,6"])
+        eq_(watermark, "4")
+        self.session.add(Signature(X=7, Y=8, Z=9))
+        self.session.commit()
+        content, watermark = self.export(4)
+        eq_(content.split(), ["X,Y,Z", "4,5,6", "7,8,9"])
+        eq_(watermark, "7")
+        content, watermark = self.export(7)
+        eq_(content.split(), ["X,Y,Z", "7,8,9"])
+        eq_(watermark, "7")
+
+    def test_rows_at_the_watermark_are_not_missed(self):
+        response = webio.make_response_from_a_table(
+            self.session, Signature, "csv", watermark="Y")
+        eq_(response.headers[webio.WATERMARK_HEADER], "5")
+        self.session.add(Signature(X=7, Y=5, Z=0))
+        self.session.commit()
+        response = webio.make_response_from_a_table(
+            self.session, Signature, "csv", watermark="Y", since=5)
+        eq_(response.content.split(), ["X,Y,Z", "4,5,6", "7,5,0"])
+        eq_(response.headers[webio.WATERMARK_HEADER], "5")
+
+    def test_empty_table(self):
+        self.session.query(Signature).delete()
+        self.session.commit()
+        content, watermark = self.export(None)
+        eq_(watermark, "")
+
+    def test_delta_export_with_filter(self):
+        response = webio.make_response_from_a_table(
+            self.session, Signature, "csv", watermark="X", since=0,
+            filter=Signature.Y < 5)
+        eq_(response.content.split(), ["X,Y,Z", "1,2,3"])
+        eq_(response.headers[webio.WATERMARK_HEADER], "1")
+
+    def test_header_on_item_assignment_responses(self):
+        response = {}
+        webio._set_header(response, "X", 1)
+        eq_(response, {"X": "1"})
+        webio._set_header(None, "X", 1)
+
+    def tearDown(self):
+        self.session.close()
+        webio.init_webio(self.response_func)
+
+
+class TestConcurrentTables:
+    def setUp(self):
+        Base.metadata.drop_all(engine)
+        Base.metadata.create_all(engine)
+        self.session = Session()
+        self.session.add_all([
+            Signature(X=1, Y=2, Z=3), Signature(X=4, Y=5, Z=6),
+            Signature2(A=1, B=2, C=3), Signature2(A=4, B=5, C=6)])
+        self.session.commit()
+        self.sessions = []
+
+    def session_factory(self):
+        session = Session()
+        self.sessions.append(session)
+        return session
+
+    def test_make_response_from_tables(self):
+        webio.make_response_from_tables(
+            self.session, [Signature2, Signature], "xls",
+            file_name=FILE_NAME, session_factory=self.session_factory,
+            max_workers=2, filters=[None, Signature.X > 1])
+        eq_(len(self.sessions), 2)
+        book = pe.get_book(file_name=OUTPUT)
+        eq_(book.sheet_names(), ["signature2", "signature"])
+        eq_(book["signature2"].to_array(),
+            [["A", "B", "C"], [1, 2, 3], [4, 5, 6]])
+        eq_(book["signature"].to_array(), [["X", "Y", "Z"], [4, 5, 6]])
+
+    def tearDown(self):
+        self.session.close()
+        if os.path.exists(OUTPUT):
+            os.unlink(OUTPUT)
@@ -0,0 +1,109 @@
+import io
+import zipfile
+import datetime
+import tracemalloc
+from xml.etree import ElementTree
+
+import pyexcel as pe
+import pyexcel_webio as webio
+from pyexcel_webio import xlsx
+from db import Session, Base, Signature, engine
+from nose.tools import eq_
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+MAIN = "{%s}" % xlsx._MAIN
+
+
+def read_xlsx(content):
+    """Read the sheets back as {name: [[(reference, type, text)]]}"""
+    if not isinstance(content, bytes):
+        content = b"".join(content)
+    book = zipfile.ZipFile(io.BytesIO(content))
+    workbook = ElementTree.fromstring(book.read("xl/workbook.xml"))
+    names = [sheet.get("name") for sheet in workbook.iter(MAIN + "sheet")]
+    sheets = {}
+    for number, name in enumerate(names, 1):
+        sheet = ElementTree.fromstring(
+            book.read("xl/worksheets/sheet%d.xml" % number))
+        sheets[name] = [
+            [(cell.get("r"), cell.get("t"), "".join(cell.itertext()))
+             for cell in row]
+            for row in sheet.iter(MAIN + "row")
+        ]
+    return names, sheets
+
+
+class TestWriteOnlyXlsx:
+    def test_cells(self):
+        rows = [["name", "count", "ok", "when", "day", "blank"],
+                ["a<b & \x01c", 3, True, datetime.datetime(1900, 1, 1, 12),
+                 datetime.date(1900, 1, 1), None]]
+        names, sheets = read_xlsx(xlsx.render([("sheet", rows)]))
+        eq_(names, ["sheet"])
+        eq_(sheets["sheet"][1], [
+            ("A2", "inlineStr", "a<b & c"), ("B2", None, "3"),
+            ("C2", "b", "1"), ("D2", None, "2.5"), ("E2", None, "2")])
+
+    def test_overflow_into_more_sheets(self):
+        rows = ([index] for index in range(5))
+        with mock.patch.object(xlsx, "MAX_ROWS", 2):
+            names, sheets = read_xlsx(
+                xlsx.render([("data", rows), ("data", [[1]])]))
+        eq_(names, ["data", "data (2)", "data (3)", "data (4)"])
+        eq_(sheets["data (3)"], [[("A1", None, "4")]])
+
+    def test_sheet_names(self):
+        names, _ = read_xlsx(xlsx.render([("a/b" + "x" * 40, [])]))
+        eq_(names, ["a_b" + "x" * 28])
+        names, _ = read_xlsx(xlsx.render([]))
+        eq_(names, ["pyexcel_sheet1"])
+
+    def test_memory_does_not_grow_with_rows(self):
+        def peak(count):
+            rows = (["row %d" % index, index, index * 0.5]
+                    for index in range(count))
+            tracemalloc.start()
+            try:
+                for _ in xlsx.render([("data", rows)], spool_size=1024):
+                    pass
+                return tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+        small, large = peak(2000), peak(20000)
+        assert large < small * 2, (small, large)
+
+
+class TestWriteOnlyResponses:
+    def setUp(self):
+        self.response_func = webio.__excel_response_func__
+        webio.init_webio(lambda content, **keywords: content)
+
+    def tearDown(self):
+        webio.init_webio(self.response_func)
+
+    def test_make_response_with_a_book(self):
+        book = pe.Book({"one": [[1, 2]], "two": [["x"]]})
+        names, sheets = read_xlsx(
+            webio.make_response(book, "xlsx", write_only=True))
+        eq_(names, ["one", "two"])
+        eq_(sheets["two"], [[("A1", "inlineStr", "x")]])
+
+    def test_make_response_from_query_sets(self):
+        Base.metadata.drop_all(engine)
+        Base.metadata.create_all(engine)
+        session = Session()
+        session.add_all([Signature(X=1, Y=2, Z=3), Signature(X=4, Y=5, Z=6)])
+        session.commit()
+        for pipelined in (False, True):
+            content = webio.make_response_from_query_sets(
+                session.query(Signature), ["X", "Z"], "xlsx",
+                write_only=True, pipelined=pipelined, sheet_name="sig")
+            names, sheets = read_xlsx(content)
+            eq_(names, ["sig"])
+            eq_([[cell[2] for cell in row] for row in sheets["sig"]],
+                [["X", "Z"], ["1", "3"], ["4", "6"]])
+        session.close()
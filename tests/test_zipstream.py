@@ -0,0 +1,117 @@
+import io
+import zipfile
+from collections import OrderedDict
+
+import pyexcel_webio as webio
+from pyexcel_webio import zipstream
+from db import Session, Base, Signature, Signature2, engine
+from nose.tools import eq_
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+def read_zip(content):
+    if not isinstance(content, bytes):
+        content = b"".join(content)
+    archive = zipfile.ZipFile(io.BytesIO(content))
+    return OrderedDict(
+        (info.filename, archive.read(info.filename).decode("utf-8"))
+        for info in archive.infolist())
+
+
+class TestZipStream:
+    def test_entries(self):
+        chunks = list(zipstream.render(
+            [("a", [[1, None, "x,y"]]), ("b", ([i] for i in range(3000)))],
+            "csvz", chunk_size=10))
+        assert len(chunks) > 1
+        entries = read_zip(chunks)
+        eq_(list(entries.keys()), ["a.csv", "b.csv"])
+        eq_(entries["a.csv"], '1,,"x,y"\r\n')
+        eq_(entries["b.csv"].splitlines()[-1], "2999")
+
+    def test_sheets_are_written_as_they_are_asked_for(self):
+        produced = []
+
+        def sheets():
+            for name in ("a", "b"):
+                produced.append(name)
+                yield name, [[name] * 100] * 100
+        chunks = zipstream.render(sheets(), "tsvz", chunk_size=1)
+        first = next(chunks)
+        eq_(produced, ["a"])
+        entries = read_zip([first] + list(chunks))
+        eq_(produced, ["a", "b"])
+        eq_(entries["b.tsv"].splitlines()[0], "\t".join(["b"] * 100))
+
+    def test_is_supported(self):
+        assert zipstream.is_supported("csvz", {"dest_delimiter": ";",
+                                               "dest_encoding": "utf-8"})
+        assert not zipstream.is_supported("csvz", {"dest_foo": 1})
+        assert not zipstream.is_supported("csvz", {"delimiter": ";"})
+        assert not zipstream.is_supported("xlsx", {})
+
+    def test_encoding(self):
+        content = b"".join(zipstream.render(
+            [("a", [[u"\xe9"]])], "csvz", dest_encoding="latin-1"))
+        archive = zipfile.ZipFile(io.BytesIO(content))
+        eq_(archive.read("a.csv"), b"\xe9\r\n")
+
+    def test_data_descriptors(self):
+        content = b"".join(zipstream.render([("a", [[1]])], "csvz"))
+        info = zipfile.ZipFile(io.BytesIO(content)).infolist()[0]
+        eq_(info.flag_bits & 0x08, 0x08)
+
+
+class TestStreamedResponses:
+    def setUp(self):
+        self.response_func = webio.__excel_response_func__
+        webio.init_webio(lambda content, **keywords: content)
+
+    def tearDown(self):
+        webio.init_webio(self.response_func)
+
+    def test_book_dict(self):
+        content = webio.make_response_from_book_dict(
+            {"b": [[1, 2]], "a": [["x"]]}, "csvz", streamed=True)
+        assert not isinstance(content, bytes)
+        entries = read_zip(content)
+        eq_(list(entries.keys()), ["a.csv", "b.csv"])
+        eq_(entries["b.csv"], "1,2\r\n")
+
+    def test_book_dict_is_bytes_by_default(self):
+        book = {"b": [[1, 2]], "a": [["x"]]}
+        content = webio.make_response_from_book_dict(book, "csvz")
+        assert isinstance(content, bytes)
+        eq_(read_zip(content), read_zip(webio.make_response_from_book_dict(
+            book, "csvz", streamed=True)))
+
+    def test_dest_encoding(self):
+        content = webio.make_response_from_book_dict(
+            {"a": [["x"]]}, "csvz", streamed=True, dest_encoding="utf-8")
+        eq_(read_zip(content)["a.csv"], "x\r\n")
+
+    def test_other_keywords_are_not_streamed(self):
+        with mock.patch("pyexcel.save_book_as",
+                        return_value=b"saved") as save_book_as:
+            content = webio.make_response_from_book_dict(
+                {"a": [["x"]]}, "csvz", streamed=True, dest_foo=1)
+        eq_(content, b"saved")
+        eq_(save_book_as.call_args[1]["dest_foo"], 1)
+
+    def test_tables(self):
+        Base.metadata.drop_all(engine)
+        Base.metadata.create_all(engine)
+        session = Session()
+        session.add_all([Signature(X=1, Y=2, Z=3), Signature2(A=4, B=5, C=6)])
+        session.commit()
+        content = webio.make_response_from_tables(
+            session, [Signature, Signature2], "csvz", streamed=True,
+            columns=[["Z", "X"], None])
+        entries = read_zip(content)
+        session.close()
+        eq_(entries["signature.csv"], "Z,X\r\n3,1\r\n")
+        eq_(entries["signature2.csv"], "A,B,C\r\n4,5,6\r\n")